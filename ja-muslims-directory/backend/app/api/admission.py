@@ -0,0 +1,281 @@
+"""
+Rate limiting and admission control for the API.
+
+Each request under ``API_V1_STR`` falls into a route class: ``login`` (password
+logins), ``analytics`` (dashboard and statistics computations) or ``default``.
+``AdmissionMiddleware`` then applies two checks.
+
+- Token buckets, one per route class and client (``rate_limit_client``):
+  the IP address for logins, the user a valid bearer token was issued to for
+  everything else, and the IP address for requests without one. The raw
+  ``Authorization`` header never picks a bucket, so made-up tokens cannot
+  buy a fresh one.
+  ``RATE_LIMITS`` gives each class ``[requests per minute, burst]``. Buckets are
+  kept in memory per worker. ``RATE_LIMIT_BACKEND=redis`` shares them through
+  ``REDIS_URL`` instead.
+- Concurrency limits per class, tenant and worker. ``CONCURRENCY_LIMITS`` gives
+  ``[running, queued]``. A request over the limit waits in a FIFO queue for
+  up to ``ADMISSION_QUEUE_TIMEOUT_SECONDS``. When the queue is full, or the
+  wait times out, it gets 429 straight away, before it can take a threadpool
+  thread.
+
+Rejected requests get 429 with ``Retry-After``. Counters for rejections and
+queue waits are served by ``GET /admission/metrics``.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from app.core.config import settings
+from app.core.tenancy import tenant_scoped
+from app.api.deps import token_subject
+
+logger = logging.getLogger(__name__)
+
+# Long-lived streams would hold a concurrency slot for as long as they are open
+_UNLIMITED_SUFFIXES = ("/stream",)
+
+# Buckets refilled to full are dropped once there are this many
+_MAX_BUCKETS = 100_000
+
+_REDIS_TOKEN_BUCKET = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    api = settings.API_V1_STR
+    if not path.startswith(api + "/"):
+        return None
+    if method == "POST" and path == f"{api}/auth/login":
+        return "login"
+    if path.startswith(f"{api}/analytics/"):
+        return "analytics"
+    return "default"
+
+
+def rate_limit_client(route: str, headers: Headers, host: str) -> str:
+    """The client whose bucket a request of ``route`` takes a token from."""
+    if route != "login":
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        user = token_subject(token) if scheme.lower() == "bearer" and token else None
+        if user is not None:
+            return f"user:{user}"
+    return f"ip:{host}"
+
+
+class MemoryBuckets:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # key -> (tokens, last refill)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Take a token; returns 0 if one was available, else the seconds until there is one."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._buckets) >= _MAX_BUCKETS:
+                self._buckets = {
+                    k: (tokens, ts) for k, (tokens, ts) in self._buckets.items()
+                    if tokens + (now - ts) * rate < burst
+                }
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class RedisBuckets:
+    def __init__(self, url: str) -> None:
+        import redis.asyncio
+        self._client = redis.asyncio.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        try:
+            wait = await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()])
+        except Exception:
+            # Fail open: an unreachable Redis must not take the API down with it
+            logger.exception("Rate limit backend unavailable")
+            return 0.0
+        return float(wait)
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimit:
+    """At most ``limit`` holders; up to ``max_queue`` more wait in FIFO order."""
+
+    def __init__(self, limit: int, max_queue: int) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> float:
+        """Wait for a slot and return the seconds waited; raises ``Rejected`` if the queue is full or the wait times out."""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                raise Rejected("queue_full")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            # Otherwise the slot was already handed over; _grant passes it on
+            raise Rejected("queue_timeout")
+        return time.monotonic() - start
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    # The slot goes straight to the waiter, so active stays the same
+                    waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+                    return
+            self.active -= 1
+
+    def _grant(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # Timed out in the meantime: hand the slot to the next in line
+            self.release()
+        else:
+            waiter.set_result(None)
+
+
+class AdmissionMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, float]] = {}
+
+    def record(self, route: str, outcome: str, waited: float = 0.0) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(route, {
+                "admitted": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0,
+                "queued": 0, "queue_wait_seconds_total": 0.0, "queue_wait_seconds_max": 0.0,
+            })
+            counts[outcome] += 1
+            if waited:
+                counts["queued"] += 1
+                counts["queue_wait_seconds_total"] += waited
+                counts["queue_wait_seconds_max"] = max(counts["queue_wait_seconds_max"], waited)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {route: dict(counts) for route, counts in self._counts.items()}
+
+
+metrics = AdmissionMetrics()
+# tenant_scoped(route) -> limit; every tenant has its own slots, so a busy
+# tenant never queues another tenant's requests
+concurrency_limits: Dict[str, ConcurrencyLimit] = {}
+_limits_lock = threading.Lock()
+
+
+def concurrency_limit(route: str) -> Optional[ConcurrencyLimit]:
+    """The current tenant's concurrency limit for ``route``, if it has one."""
+    if route not in settings.CONCURRENCY_LIMITS:
+        return None
+    key = tenant_scoped(route)
+    with _limits_lock:
+        if key not in concurrency_limits:
+            limit, max_queue = settings.CONCURRENCY_LIMITS[route]
+            concurrency_limits[key] = ConcurrencyLimit(int(limit), int(max_queue))
+        return concurrency_limits[key]
+
+
+def admission_metrics() -> Dict[str, Dict[str, float]]:
+    """The current tenant's counters, by route class."""
+    prefix = tenant_scoped("")
+    snapshot = {
+        key[len(prefix):]: counts for key, counts in metrics.snapshot().items() if key.startswith(prefix)
+    }
+    for key, limit in list(concurrency_limits.items()):
+        if key.startswith(prefix):
+            snapshot.setdefault(key[len(prefix):], {}).update(running=limit.active, waiting=limit.queued)
+    return snapshot
+
+
+def _too_many_requests(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+        self.enabled = settings.RATE_LIMIT_ENABLED
+        self.buckets = RedisBuckets(settings.REDIS_URL) if settings.RATE_LIMIT_BACKEND == "redis" else MemoryBuckets()
+
+    async def __call__(self, scope, receive, send) -> None:
+        route = route_class(scope.get("method", ""), scope["path"]) if scope["type"] == "http" else None
+        if not self.enabled or route is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        limits = settings.RATE_LIMITS.get(route)
+        if limits:
+            per_minute, burst = limits
+            client = rate_limit_client(route, Headers(scope=scope), (scope.get("client") or ("",))[0])
+            wait = await self.buckets.take(tenant_scoped(f"{route}:{client}"), per_minute / 60, burst)
+            if wait:
+                metrics.record(tenant_scoped(route), "rate_limited")
+                await _too_many_requests("Too many requests", wait)(scope, receive, send)
+                return
+
+        limit = concurrency_limit(route)
+        if limit is None or scope["path"].endswith(_UNLIMITED_SUFFIXES):
+            metrics.record(tenant_scoped(route), "admitted")
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            waited = await limit.acquire(settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+        except Rejected as rejected:
+            metrics.record(tenant_scoped(route), rejected.reason)
+            await _too_many_requests("Server busy, try again shortly", settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)(
+                scope, receive, send
+            )
+            return
+        metrics.record(tenant_scoped(route), "admitted", waited)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
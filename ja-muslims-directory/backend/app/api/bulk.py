@@ -0,0 +1,184 @@
+"""
+Set-based bulk updates shared by the ``PATCH /<entity>/bulk`` endpoints.
+
+Every item is validated against the entity's update schema and foreign keys
+are checked with one ``IN`` query per column. If anything is invalid the
+request fails with the per-item errors and nothing is written. Otherwise rows
+sharing the same values are updated with a single ``UPDATE ... WHERE id IN``
+and everything commits in one transaction. The updates go through the ORM
+session, so table versions and change listeners fire as for single updates;
+the sync feed and the audit trail are recorded explicitly because bulk
+updates bypass flush.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.audit import AUDITED_TABLES, audit_change, record_audit
+from app.db.sync import SYNCED_TABLES, record_changes
+from app.schemas.bulk import BulkUpdateRequest
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(ids), settings.BATCH_CHUNK_SIZE):
+        yield ids[start:start + settings.BATCH_CHUNK_SIZE]
+
+
+def _existing_ids(db: Session, table, ids: Iterable[int]) -> set:
+    ids = list(set(ids))
+    found = set()
+    for chunk in _chunks(ids):
+        found.update(db.execute(select(table.c.id).where(table.c.id.in_(chunk))).scalars())
+    return found
+
+
+def _record_audit(db: Session, table, groups: Iterable[Tuple[dict, List[int]]]) -> None:
+    """Audit entries for the rows about to be updated, with their current values as ``before``."""
+    for values, ids in groups:
+        columns = [table.c[name] for name in values]
+        for chunk in _chunks(ids):
+            rows = db.execute(select(table.c.id, *columns).where(table.c.id.in_(chunk)))
+            entries = []
+            for row_id, *before in rows:
+                changes = {
+                    name: audit_change(name, old, values[name])
+                    for name, old in zip(values, before) if old != values[name]
+                }
+                if changes:
+                    entries.append((table.name, row_id, "update", changes))
+            record_audit(db, entries)
+
+
+def _validate_values(values: Dict[str, Any], update_schema: Type[BaseModel], allowed: set) -> Tuple[dict, list]:
+    unknown = [key for key in values if key not in allowed]
+    if unknown:
+        return {}, [{"loc": [key], "msg": "Unknown or read-only field", "type": "unknown_field"} for key in unknown]
+    try:
+        validated = update_schema.model_validate(values)
+    except ValidationError as e:
+        return {}, jsonable_encoder(e.errors(include_url=False))
+    return validated.model_dump(exclude_unset=True), []
+
+
+def _filter_ids(
+    db: Session, model: Any, update_schema: Type[BaseModel], filters: Dict[str, Any], allowed: set
+) -> List[int]:
+    unknown = [key for key in filters if key not in allowed and key != "id"]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Cannot filter on: {', '.join(unknown)}")
+
+    def coerce(key: str, value: Any) -> Any:
+        # Run filter values through the schema so e.g. enum strings become enum members
+        if key == "id" or value is None:
+            return value
+        try:
+            return getattr(update_schema.model_validate({key: value}), key)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors(include_url=False)))
+
+    query = select(model.id)
+    for key, value in filters.items():
+        column = getattr(model, key)
+        if isinstance(value, list):
+            query = query.where(column.in_([coerce(key, item) for item in value]))
+        elif value is None:
+            query = query.where(column.is_(None))
+        else:
+            query = query.where(column == coerce(key, value))
+    return list(db.execute(query.order_by(model.id)).scalars())
+
+
+def apply_bulk_update(
+    db: Session,
+    model: Any,
+    update_schema: Type[BaseModel],
+    bulk_in: BulkUpdateRequest,
+    exclude: Iterable[str] = (),
+    before_update: Optional[Callable[[Session, List[int]], None]] = None,
+    after_update: Optional[Callable[[Session, List[int]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    ``before_update(db, ids)`` runs just before the UPDATEs and
+    ``after_update(db, ids)`` just before the commit, for derived data that
+    flush listeners would otherwise maintain.
+    """
+    mapper = inspect(model)
+    columns = set(mapper.column_attrs.keys())
+    allowed = (set(update_schema.model_fields) & columns) - set(exclude)
+
+    # Normalise both request forms to a list of (id, values)
+    errors = []
+    updates: List[Tuple[int, dict]] = []
+    if bulk_in.items is not None and bulk_in.filter is None and bulk_in.values is None:
+        if len(bulk_in.items) > settings.BATCH_MAX_IDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many items (maximum is {settings.BATCH_MAX_IDS})"
+            )
+        for index, item in enumerate(bulk_in.items):
+            values, item_errors = _validate_values(item.values, update_schema, allowed)
+            if item_errors:
+                errors.append({"index": index, "id": item.id, "errors": item_errors})
+            updates.append((item.id, values))
+        found = _existing_ids(db, model.__table__, [row_id for row_id, _ in updates])
+        for index, (row_id, _) in enumerate(updates):
+            if row_id not in found:
+                errors.append({"index": index, "id": row_id, "errors": [{"msg": "Not found", "type": "not_found"}]})
+    elif bulk_in.items is None and bulk_in.filter and bulk_in.values:
+        values, value_errors = _validate_values(bulk_in.values, update_schema, allowed)
+        if value_errors:
+            raise HTTPException(status_code=422, detail=[{"index": None, "errors": value_errors}])
+        updates = [(row_id, values) for row_id in _filter_ids(db, model, update_schema, bulk_in.filter, allowed)]
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Send either 'items', or a non-empty 'filter' together with 'values'"
+        )
+
+    # Referenced rows must exist (SQLite does not enforce foreign keys by default)
+    for column_name in allowed:
+        column = model.__table__.c[column_name]
+        if not column.foreign_keys:
+            continue
+        referenced = {values[column_name] for _, values in updates if values.get(column_name) is not None}
+        if not referenced:
+            continue
+        target = next(iter(column.foreign_keys)).column.table
+        missing = referenced - _existing_ids(db, target, referenced)
+        for index, (row_id, values) in enumerate(updates):
+            if values.get(column_name) in missing:
+                errors.append({
+                    "index": index if bulk_in.items is not None else None,
+                    "id": row_id,
+                    "errors": [{"loc": [column_name], "msg": f"Referenced {target.name} row not found", "type": "not_found"}]
+                })
+
+    if errors:
+        errors.sort(key=lambda error: (error["index"] is None, error["index"] or 0))
+        raise HTTPException(status_code=422, detail=errors)
+
+    # One UPDATE ... WHERE id IN (...) per distinct set of values
+    groups: Dict[tuple, Tuple[dict, List[int]]] = {}
+    for row_id, values in updates:
+        if values:
+            key = tuple(sorted(values.items()))
+            groups.setdefault(key, (values, []))[1].append(row_id)
+    if before_update and groups:
+        before_update(db, sorted({row_id for _, ids in groups.values() for row_id in ids}))
+    if settings.AUDIT_ENABLED and model.__tablename__ in AUDITED_TABLES:
+        _record_audit(db, model.__table__, groups.values())
+    updated_ids = []
+    for values, ids in groups.values():
+        for chunk in _chunks(ids):
+            db.query(model).filter(model.id.in_(chunk)).update(values, synchronize_session=False)
+        updated_ids.extend(ids)
+
+    if model.__tablename__ in SYNCED_TABLES:
+        record_changes(db, model.__tablename__, sorted(set(updated_ids)))
+    if after_update and updated_ids:
+        after_update(db, sorted(set(updated_ids)))
+    db.commit()
+    return {"updated": len(set(updated_ids)), "ids": sorted(set(updated_ids))}
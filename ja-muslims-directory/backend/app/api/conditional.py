@@ -0,0 +1,99 @@
+"""
+Conditional GET support driven by the per-table change versions.
+
+``conditional_get(*tables)`` is a route dependency: it derives a weak ETag and
+Last-Modified from the versions of the tables a response is built from and
+answers 304 straight away when the client's copy is current, before the
+endpoint queries or serializes anything. The headers for a fresh response are
+left on ``request.state`` and added by ``CacheHeadersMiddleware``, so they
+also reach endpoints that return a ``Response`` directly.
+"""
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+from app.api import deps
+from app.db.base import get_db
+from app.db.versioning import get_table_versions
+from app.models.user import User
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [part.strip() for part in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    # Weak comparison: W/"x" and "x" are the same validator
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+def _not_modified_since(if_modified_since: str, last_modified) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since is None or last_modified is None:
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_get(*tables: str) -> Callable[..., None]:
+    def check_not_modified(
+        request: Request,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(deps.get_current_active_user),
+    ) -> None:
+        versions = get_table_versions(db, tables)
+        validator = "|".join(
+            [request.url.path, request.url.query]
+            + [f"{table}:{versions[table][0]}" for table in tables]
+        )
+        etag = 'W/"%s"' % hashlib.sha1(validator.encode()).hexdigest()
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        timestamps = [updated_at for _, updated_at in versions.values() if updated_at]
+        last_modified = max(timestamps).replace(tzinfo=timezone.utc) if timestamps else None
+        if last_modified:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = _etag_matches(if_none_match, etag)
+        else:
+            if_modified_since = request.headers.get("if-modified-since")
+            not_modified = bool(if_modified_since) and _not_modified_since(if_modified_since, last_modified)
+        if not_modified:
+            raise HTTPException(status_code=304, headers=headers)
+
+        request.state.cache_headers = headers
+    return check_not_modified
+
+
+class CacheHeadersMiddleware:
+    """Attach the validators computed by ``conditional_get`` to 200 responses."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_headers(message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                cache_headers: Optional[dict] = scope.get("state", {}).get("cache_headers")
+                if cache_headers:
+                    headers = MutableHeaders(scope=message)
+                    for name, value in cache_headers.items():
+                        if name not in headers:
+                            headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
@@ -1,14 +1,34 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from typing import Generator, List, Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.revocation import is_revoked
+from app.core.tenancy import current_tenant
+from app.db.audit import AUDIT_USER
 from app.db.base import get_db
 from app.models.user import User
 from app.schemas.token import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False
+)
+
+def token_subject(token: str) -> Optional[str]:
+    """The e-mail of the user a valid, unrevoked access token was issued to; None for any other token."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    # Each tenant has its own users; a token only works for the tenant that issued it
+    if payload.get("tenant", settings.DEFAULT_TENANT) != current_tenant().slug:
+        return None
+    # In memory: a Bloom filter miss is the common case and needs no I/O
+    if is_revoked(payload.get("jti")):
+        return None
+    return payload.get("sub")
 
 def get_current_user(
     db: Session = Depends(get_db),
@@ -19,18 +39,16 @@ def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+    email = token_subject(token)
+    if email is None:
         raise credentials_exception
+    token_data = TokenData(email=email)
     
     user = db.query(User).filter(User.email == token_data.email).first()
     if user is None:
         raise credentials_exception
+    # Writes on this session are audited as this user's
+    db.info[AUDIT_USER] = user.id
     return user
 
 def get_current_active_user(
@@ -40,6 +58,14 @@ def get_current_active_user(
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+def get_current_active_user_for_stream(
+    db: Session = Depends(get_db),
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None),
+) -> User:
+    # Browsers' EventSource cannot set headers, so streams also accept ?access_token=
+    return get_current_active_user(get_current_user(db, token or access_token or ""))
+
 def get_current_active_superuser(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -47,4 +73,23 @@ def get_current_active_superuser(
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+def check_batch_ids(ids: List[int]) -> List[int]:
+    if not ids:
+        raise HTTPException(status_code=400, detail="At least one ID is required")
+    if len(ids) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many IDs requested (maximum is {settings.BATCH_MAX_IDS})"
+        )
+    return ids
+
+def get_batch_ids(
+    ids: str = Query(..., description="Comma-separated list of IDs, e.g. 1,2,3")
+) -> List[int]:
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="IDs must be comma-separated integers")
+    return check_batch_ids(parsed)
@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Type
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """
+    Parse a ``fields=a,b,c`` query value against the endpoint's response schema.
+
+    Returns None when no fieldset was requested. ``id`` is always included so
+    clients can key the trimmed rows.
+    """
+    if not fields:
+        return None
+    requested = list(dict.fromkeys(part.strip() for part in fields.split(",") if part.strip()))
+    unknown = [field for field in requested if field not in schema.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" in schema.model_fields and "id" not in requested:
+        requested.insert(0, "id")
+    return requested
+
+
+def load_columns(model: Any, fields: Sequence[str], *required: str) -> Any:
+    """
+    Build a ``load_only`` option for the requested fields that are columns on
+    ``model``, plus any ``required`` columns (e.g. foreign keys needed to
+    compute a derived field). Unrequested columns are not SELECTed.
+    """
+    column_keys = set(inspect(model).column_attrs.keys())
+    names = [name for name in dict.fromkeys([*fields, *required]) if name in column_keys]
+    return load_only(*[getattr(model, name) for name in names])
+
+
+@lru_cache(maxsize=256)
+def trimmed_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    definitions = {
+        name: (schema.model_fields[name].annotation, schema.model_fields[name])
+        for name in fields
+    }
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions
+    )
+
+
+def _pick(obj: Any, fields: Sequence[str], computed: dict) -> dict:
+    data = {}
+    for field in fields:
+        if isinstance(obj, dict):
+            data[field] = obj.get(field)
+        elif field in computed:
+            data[field] = computed[field](obj)
+        else:
+            data[field] = getattr(obj, field)
+    return data
+
+
+def sparse_response(
+    schema: Type[BaseModel],
+    fields: Sequence[str],
+    data: Any,
+    **computed: Callable[[Any], Any],
+) -> JSONResponse:
+    """
+    Serialize ``data`` (an ORM object, dict, or list of either) with only the
+    requested fields. Fields that are not plain attributes of an ORM object are
+    produced by the ``computed`` callables, which only run when that field was
+    requested; dict rows are taken as already computed.
+    """
+    model = trimmed_schema(schema, tuple(fields))
+    if isinstance(data, list):
+        content = [
+            model.model_validate(_pick(row, fields, computed)).model_dump(mode="json")
+            for row in data
+        ]
+    else:
+        content = model.model_validate(_pick(data, fields, computed)).model_dump(mode="json")
+    return JSONResponse(content=content)
@@ -0,0 +1,322 @@
+"""
+``Idempotency-Key`` support for the create endpoints.
+
+A client that may retry a create (a flaky mobile connection) sends the same
+``Idempotency-Key`` header with every attempt. ``IdempotencyMiddleware`` runs
+the first attempt and keeps its response for ``IDEMPOTENCY_TTL_SECONDS``;
+later attempts get that response again, marked ``Idempotent-Replayed: true``,
+without running the endpoint. Only ``IDEMPOTENT_ROUTES`` take part, and a key
+belongs to the signed-in user who sent it.
+
+- Coalescing: the first attempt claims the key before it runs. Attempts that
+  arrive while it is still running wait up to ``IDEMPOTENCY_WAIT_SECONDS`` for
+  its response instead of running the endpoint a second time; if it takes
+  longer they get 409 with ``Retry-After``. A claim whose request never
+  finishes (a killed worker) lapses after ``IDEMPOTENCY_LOCK_SECONDS``.
+- Mismatches: reusing a key for a different request (another path or body)
+  gets 422.
+- What is kept: responses below 500, except 401, 403 and 429, which say
+  nothing about the create. After a server error or an exception the claim is
+  released, so the next attempt runs the endpoint again.
+
+Keys are kept in memory per worker. ``IDEMPOTENCY_BACKEND=redis`` shares them
+through ``REDIS_URL``, so a retry that lands on another worker is coalesced
+too; if Redis is unreachable, requests run as if they had no key.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from app.api.deps import token_subject
+from app.core.config import settings
+from app.core.tenancy import tenant_scoped
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = "idempotent-replayed"
+
+# Relative to API_V1_STR
+IDEMPOTENT_ROUTES = (
+    re.compile(r"/members/"),
+    re.compile(r"/life-events/"),
+    re.compile(r"/businesses/"),
+    re.compile(r"/restaurants/\d+/menu"),
+)
+
+_KEY = re.compile(r"^[\x21-\x7e]{1,255}$")
+# Responses that did not get as far as the endpoint's work
+_NOT_STORED = {401, 403, 429}
+# Completed keys kept by a worker; the oldest go first
+_MAX_RECORDS = 100_000
+# How often a retry checks on a key claimed by another worker
+_REDIS_POLL_SECONDS = 0.1
+
+_REDIS_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+def is_idempotent_route(method: str, path: str) -> bool:
+    api = settings.API_V1_STR
+    if method != "POST" or not path.startswith(api + "/"):
+        return False
+    return any(route.fullmatch(path[len(api):]) for route in IDEMPOTENT_ROUTES)
+
+
+def request_fingerprint(method: str, path: str, headers: Headers, body: bytes) -> str:
+    content_type = headers.get("content-type", "")
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if match:
+        # Clients pick a new multipart boundary for every attempt
+        body = body.replace(match.group(1).encode("latin-1"), b"")
+        content_type = content_type[:match.start()]
+    digest = hashlib.sha256(f"{method} {path}\n{content_type}\n".encode("latin-1"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class MemoryIdempotencyStore:
+    """
+    Records are ``{"fingerprint", "claim"}`` while the first attempt runs and
+    ``{"fingerprint", "status", "headers", "body"}`` once it has a response.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # key -> (expires at, record)
+        self._records: Dict[str, Tuple[float, dict]] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[Optional[str], Optional[dict]]:
+        """Claim ``key``: ``(claim, None)`` if this request should run, else ``(None, record)``."""
+        now = time.monotonic()
+        with self._lock:
+            expires, record = self._records.get(key, (0.0, None))
+            if record is not None and expires > now:
+                return None, record
+            claim = uuid.uuid4().hex
+            self._records[key] = (now + settings.IDEMPOTENCY_LOCK_SECONDS, {"fingerprint": fingerprint, "claim": claim})
+            return claim, None
+
+    async def complete(self, key: str, claim: str, record: dict) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._records) >= _MAX_RECORDS:
+                self._records = {k: v for k, v in self._records.items() if v[0] > now}
+                while len(self._records) >= _MAX_RECORDS:
+                    del self._records[next(iter(self._records))]
+            self._records.pop(key, None)
+            self._records[key] = (now + settings.IDEMPOTENCY_TTL_SECONDS, record)
+            self._wake(key)
+
+    async def release(self, key: str, claim: str) -> None:
+        with self._lock:
+            _, record = self._records.get(key, (0.0, {}))
+            if record.get("claim") == claim:
+                del self._records[key]
+            self._wake(key)
+
+    async def wait(self, key: str, timeout: float) -> None:
+        """Return when ``key`` is completed or released, or after ``timeout``."""
+        waiter = asyncio.get_running_loop().create_future()
+        with self._lock:
+            _, record = self._records.get(key, (0.0, {}))
+            if "claim" not in record:
+                return
+            self._waiters.setdefault(key, []).append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(key, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(key, None)
+
+    def _wake(self, key: str) -> None:
+        for waiter in self._waiters.pop(key, []):
+            waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RedisIdempotencyStore:
+    def __init__(self, url: str) -> None:
+        import redis.asyncio
+        self._client = redis.asyncio.Redis.from_url(url)
+        self._release = self._client.register_script(_REDIS_RELEASE)
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[Optional[str], Optional[dict]]:
+        claim = uuid.uuid4().hex
+        pending = json.dumps({"fingerprint": fingerprint, "claim": claim})
+        while True:
+            if await self._client.set(self._key(key), pending, nx=True, px=int(settings.IDEMPOTENCY_LOCK_SECONDS * 1000)):
+                return claim, None
+            raw = await self._client.get(self._key(key))
+            # Otherwise it expired or was released in between: try again
+            if raw is not None:
+                record = json.loads(raw)
+                if "body" in record:
+                    record["body"] = base64.b64decode(record["body"])
+                return None, record
+
+    async def complete(self, key: str, claim: str, record: dict) -> None:
+        stored = dict(record, body=base64.b64encode(record["body"]).decode("ascii"))
+        await self._client.set(self._key(key), json.dumps(stored), ex=settings.IDEMPOTENCY_TTL_SECONDS)
+
+    async def release(self, key: str, claim: str) -> None:
+        pending = await self._client.get(self._key(key))
+        if pending is not None and json.loads(pending).get("claim") == claim:
+            await self._release(keys=[self._key(key)], args=[pending])
+
+    async def wait(self, key: str, timeout: float) -> None:
+        # The claim may be held by another worker, which has no way to wake this one
+        await asyncio.sleep(min(timeout, _REDIS_POLL_SECONDS))
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"idempotency:{key}"
+
+
+def _error(status_code: int, detail: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
+
+
+async def _replay(record: dict, send) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+    headers.append((REPLAYED_HEADER.encode(), b"true"))
+    await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+    await send({"type": "http.response.body", "body": record["body"]})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+        self.enabled = settings.IDEMPOTENCY_ENABLED
+        self.store = (
+            RedisIdempotencyStore(settings.REDIS_URL)
+            if settings.IDEMPOTENCY_BACKEND == "redis" else MemoryIdempotencyStore()
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not (
+            self.enabled
+            and scope["type"] == "http"
+            and is_idempotent_route(scope["method"], scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        authorization = headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        # Without a key, or without a valid token (the endpoint will refuse it), there is nothing to keep
+        user = token_subject(token) if idempotency_key and scheme.lower() == "bearer" else None
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+        if not _KEY.match(idempotency_key):
+            await _error(400, "Idempotency-Key must be 1 to 255 visible ASCII characters")(scope, receive, send)
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        fingerprint = request_fingerprint(scope["method"], scope["path"], headers, body)
+        key = tenant_scoped(f"{hashlib.sha256(user.encode()).hexdigest()}:{idempotency_key}")
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        try:
+            while True:
+                claim, record = await self.store.claim(key, fingerprint)
+                if claim is not None or "status" in record or record["fingerprint"] != fingerprint:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                await self.store.wait(key, remaining)
+        except Exception:
+            # Fail open: an unreachable store must not take the create endpoints down with it
+            logger.exception("Idempotency store unavailable")
+            claim, record = None, None
+
+        if record is not None:
+            if record["fingerprint"] != fingerprint:
+                await _error(422, "Idempotency-Key was already used for a different request")(scope, receive, send)
+            elif "status" not in record:
+                await _error(
+                    409, "A request with this Idempotency-Key is still being processed",
+                    {"Retry-After": str(max(1, round(settings.IDEMPOTENCY_WAIT_SECONDS)))},
+                )(scope, receive, send)
+            else:
+                await _replay(record, send)
+            return
+
+        replayed = False
+
+        async def replay_body():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        if claim is None:
+            await self.app(scope, replay_body, send)
+            return
+
+        response: dict = {}
+        response_body = []
+
+        async def send_and_keep(message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    (name.decode("latin-1"), value.decode("latin-1")) for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+                status = response["status"]
+                if not message.get("more_body") and status < 500 and status not in _NOT_STORED:
+                    # Kept before the last chunk goes out: a client that drops the
+                    # connection now will retry, and must get this response
+                    try:
+                        await self.store.complete(key, claim, {
+                            "fingerprint": fingerprint, "status": status,
+                            "headers": response["headers"], "body": b"".join(response_body),
+                        })
+                        response["stored"] = True
+                    except Exception:
+                        logger.exception("Keeping the response for an Idempotency-Key failed")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, send_and_keep)
+        finally:
+            if not response.get("stored"):
+                try:
+                    await self.store.release(key, claim)
+                except Exception:
+                    logger.exception("Releasing Idempotency-Key failed")
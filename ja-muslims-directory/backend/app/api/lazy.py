@@ -0,0 +1,69 @@
+"""
+Routers that are imported on first use.
+
+A ``LazyRouter`` stands in the app's route table for one endpoint module. It
+matches every path under its prefix. On the first request it imports the
+module in a worker thread and splices the module's routes in at its own
+position. The request is then dispatched again, this time to the real routes.
+Workers that never serve a module skip its import and route building.
+"""
+import importlib
+from typing import List, Tuple
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+from app.core.startup import phase
+
+
+class LazyRouter(BaseRoute):
+    def __init__(self, app: FastAPI, module: str, prefix: str, tags: List[str]) -> None:
+        self.app = app
+        self.module = module
+        self.prefix = prefix
+        self.tags = tags
+        self.loaded = False
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path == self.prefix or path.startswith(self.prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.loaded:
+            with phase(f"import router {self.prefix}"):
+                module = await run_in_threadpool(importlib.import_module, self.module)
+            self.install(module)
+        await self.app.router(scope, receive, send)
+
+    def load(self) -> None:
+        if not self.loaded:
+            with phase(f"import router {self.prefix}"):
+                module = importlib.import_module(self.module)
+            self.install(module)
+
+    def install(self, module) -> None:
+        # Runs on the event loop thread without awaiting, so no request sees a half-spliced table
+        if self.loaded:
+            return
+        with phase(f"include router {self.prefix}"):
+            routes = self.app.router.routes
+            before = len(routes)
+            self.app.include_router(module.router, prefix=self.prefix, tags=self.tags)
+            added = routes[before:]
+            del routes[before:]
+            index = routes.index(self)
+            routes[index:index + 1] = added
+            self.loaded = True
+            self.app.openapi_schema = None
+
+
+def load_all(app: FastAPI) -> None:
+    for route in list(app.router.routes):
+        if isinstance(route, LazyRouter):
+            route.load()
@@ -1,13 +1,35 @@
-from fastapi import APIRouter
-from app.api.v1.endpoints import auth, users, members, life_events, analytics, businesses, restaurants, masjids, educations
+import importlib
+from fastapi import FastAPI
+from app.api.lazy import LazyRouter
+from app.core.config import settings
+from app.core.startup import phase
 
-api_router = APIRouter()
-api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
-api_router.include_router(users.router, prefix="/users", tags=["users"])
-api_router.include_router(members.router, prefix="/members", tags=["members"])
-api_router.include_router(life_events.router, prefix="/life-events", tags=["life-events"])
-api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
-api_router.include_router(businesses.router, prefix="/businesses", tags=["businesses"])
-api_router.include_router(restaurants.router, prefix="/restaurants", tags=["restaurants"])
-api_router.include_router(masjids.router, prefix="/masjids", tags=["masjids"])
-api_router.include_router(educations.router, prefix="/educations", tags=["educations"])
\ No newline at end of file
+# (endpoint module, prefix, tags)
+ROUTERS = [
+    ("auth", "/auth", ["auth"]),
+    ("users", "/users", ["users"]),
+    ("members", "/members", ["members"]),
+    ("life_events", "/life-events", ["life-events"]),
+    ("analytics", "/analytics", ["analytics"]),
+    ("businesses", "/businesses", ["businesses"]),
+    ("restaurants", "/restaurants", ["restaurants"]),
+    ("masjids", "/masjids", ["masjids"]),
+    ("educations", "/educations", ["educations"]),
+    ("admission", "/admission", ["admission"]),
+    ("reports", "/reports", ["reports"]),
+    ("audit", "/audit", ["audit"]),
+    ("search", "/search", ["search"]),
+]
+
+
+def include_routers(app: FastAPI, prefix: str) -> None:
+    """Mount the v1 routers, as placeholders loaded on first use when ``LAZY_ROUTERS`` is set."""
+    for name, router_prefix, tags in ROUTERS:
+        module = f"app.api.v1.endpoints.{name}"
+        if settings.LAZY_ROUTERS:
+            app.router.routes.append(LazyRouter(app, module, prefix + router_prefix, tags))
+        else:
+            with phase(f"import router {prefix}{router_prefix}"):
+                router = importlib.import_module(module).router
+            with phase(f"include router {prefix}{router_prefix}"):
+                app.include_router(router, prefix=prefix + router_prefix, tags=tags)
@@ -0,0 +1,14 @@
+from typing import Any, Dict
+from fastapi import APIRouter, Depends
+from app.api import deps
+from app.api.admission import admission_metrics
+from app.models.user import User as UserModel
+
+router = APIRouter()
+
+@router.get("/metrics", response_model=Dict[str, Any])
+def read_admission_metrics(
+    current_user: UserModel = Depends(deps.get_current_active_superuser),
+) -> Any:
+    # Counters are per worker process
+    return admission_metrics()
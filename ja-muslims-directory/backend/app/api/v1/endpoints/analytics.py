@@ -1,112 +1,55 @@
-from typing import Any, Dict
-from fastapi import APIRouter, Depends
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from datetime import date
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from app.api import deps
 from app.db.base import get_db
-from app.models.member import Member as MemberModel, MaritalStatus
-from app.models.life_event import LifeEvent as LifeEventModel, EventType
+from app.models.member import Member as MemberModel, Gender, MaritalStatus
 from app.models.business import Business as BusinessModel, BusinessCategory
 from app.models.user import User as UserModel
-from datetime import date
+from app.services.cohorts import age_pyramid, conversion_cohorts, get_frame, marital_transitions, salary_percentiles
+from app.services.dashboard import compute_dashboard, get_dashboard_feed
+from app.services.demographics import AGE_GROUPS, DIMENSIONS, EDUCATIONS, query_cube
+from app.services.rollups import CONVERSION, EVENT_TYPES, month_start, trend_counts
 
 router = APIRouter()
 
+MAX_TREND_MONTHS = 1200
+
 @router.get("/dashboard", response_model=Dict[str, Any])
 def get_dashboard_analytics(
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    total_members = db.query(MemberModel).count()
-    active_members = db.query(MemberModel).filter(MemberModel.date_of_death == None).count()
-    deceased_members = db.query(MemberModel).filter(MemberModel.date_of_death != None).count()
-    
-    marital_status_distribution = dict(
-        db.query(MemberModel.marital_status, func.count(MemberModel.id))
-        .group_by(MemberModel.marital_status)
-        .all()
-    )
-    
-    current_year = date.today().year
-    conversions_this_year = db.query(MemberModel).filter(
-        extract('year', MemberModel.date_of_conversion) == current_year
-    ).count()
-    
-    recent_events = db.query(LifeEventModel).order_by(
-        LifeEventModel.event_date.desc()
-    ).limit(10).all()
-    
-    event_type_distribution = dict(
-        db.query(LifeEventModel.event_type, func.count(LifeEventModel.id))
-        .group_by(LifeEventModel.event_type)
-        .all()
-    )
-    
-    age_groups = {
-        "0-18": 0,
-        "19-30": 0,
-        "31-45": 0,
-        "46-60": 0,
-        "60+": 0
-    }
-    
-    members = db.query(MemberModel).filter(MemberModel.date_of_death == None).all()
-    for member in members:
-        age = (date.today() - member.date_of_birth).days // 365
-        if age <= 18:
-            age_groups["0-18"] += 1
-        elif age <= 30:
-            age_groups["19-30"] += 1
-        elif age <= 45:
-            age_groups["31-45"] += 1
-        elif age <= 60:
-            age_groups["46-60"] += 1
-        else:
-            age_groups["60+"] += 1
-    
-    # Business analytics
-    total_businesses = db.query(BusinessModel).count()
-    active_businesses = db.query(BusinessModel).filter(BusinessModel.is_active == True).count()
-    
-    business_category_distribution = dict(
-        db.query(BusinessModel.category, func.count(BusinessModel.id))
-        .group_by(BusinessModel.category)
-        .all()
+    return compute_dashboard(db)
+
+@router.get("/dashboard/stream")
+async def stream_dashboard_analytics(
+    request: Request,
+    current_user: UserModel = Depends(deps.get_current_active_user_for_stream),
+) -> StreamingResponse:
+    """
+    Server-Sent Events: one ``snapshot`` event with the full dashboard, then
+    ``delta`` events carrying only the keys that changed after writes.
+    """
+    async def events():
+        async for message in get_dashboard_feed().subscribe():
+            if await request.is_disconnected():
+                break
+            if message is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    
-    halal_certified_businesses = db.query(BusinessModel).filter(
-        BusinessModel.halal_certified == True
-    ).count()
-    
-    zakat_accepting_businesses = db.query(BusinessModel).filter(
-        BusinessModel.accepts_zakat == True
-    ).count()
-    
-    return {
-        "total_members": total_members,
-        "active_members": active_members,
-        "deceased_members": deceased_members,
-        "total_businesses": total_businesses,
-        "active_businesses": active_businesses,
-        "halal_certified_businesses": halal_certified_businesses,
-        "zakat_accepting_businesses": zakat_accepting_businesses,
-        "marital_status_distribution": marital_status_distribution,
-        "conversions_this_year": conversions_this_year,
-        "age_distribution": age_groups,
-        "business_category_distribution": {
-            cat.value: count for cat, count in business_category_distribution.items()
-        },
-        "event_type_distribution": event_type_distribution,
-        "recent_events": [
-            {
-                "id": event.id,
-                "event_type": event.event_type.value,
-                "event_date": event.event_date.isoformat(),
-                "member_id": event.member_id
-            }
-            for event in recent_events
-        ]
-    }
 
 @router.get("/members/statistics", response_model=Dict[str, Any])
 def get_member_statistics(
@@ -126,15 +69,9 @@ def get_member_statistics(
         MemberModel.date_of_death == None
     ).count() / total_active_members * 100 if total_active_members > 0 else 0
     
-    conversions_by_year = dict(
-        db.query(
-            extract('year', MemberModel.date_of_conversion),
-            func.count(MemberModel.id)
-        )
-        .filter(MemberModel.date_of_conversion != None)
-        .group_by(extract('year', MemberModel.date_of_conversion))
-        .all()
-    )
+    conversions_by_year = defaultdict(int)
+    for (period, _), count in sorted(trend_counts(db, [CONVERSION], date.min, date.max).items()):
+        conversions_by_year[period.year] += count
     
     # Business ownership statistics
     members_with_businesses = db.query(func.count(func.distinct(BusinessModel.owner_id))).scalar()
@@ -151,9 +88,127 @@ def get_member_statistics(
         "employment_rate": employment_rate,
         "business_ownership_rate": business_ownership_rate,
         "members_with_businesses": members_with_businesses,
-        "conversions_by_year": conversions_by_year,
+        "conversions_by_year": dict(conversions_by_year),
         "top_business_categories": [
             {"category": cat.value, "count": count} 
             for cat, count in top_business_categories
         ]
-    }
\ No newline at end of file
+    }
+
+@router.get("/cohorts/age-pyramid", response_model=Dict[str, Any])
+def get_age_pyramid(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    return age_pyramid(get_frame(db), date.today())
+
+@router.get("/cohorts/conversions", response_model=List[Dict[str, Any]])
+def get_conversion_cohorts(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    return conversion_cohorts(get_frame(db))
+
+@router.get("/cohorts/salaries", response_model=Dict[str, Any])
+def get_salary_percentiles(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    return salary_percentiles(get_frame(db))
+
+@router.get("/cohorts/marital-transitions", response_model=List[Dict[str, Any]])
+def get_marital_transitions(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    return marital_transitions(get_frame(db))
+
+def _period_label(month: date, granularity: str) -> str:
+    if granularity == "year":
+        return str(month.year)
+    if granularity == "quarter":
+        return f"{month.year}-Q{(month.month - 1) // 3 + 1}"
+    return f"{month.year}-{month.month:02d}"
+
+@router.get("/trends", response_model=Dict[str, Any])
+def get_event_trends(
+    db: Session = Depends(get_db),
+    event_type: Optional[List[str]] = Query(None, description=f"Any of: {', '.join(EVENT_TYPES)}. Default: all"),
+    start: Optional[date] = Query(None, description="Default: 11 months before end"),
+    end: Optional[date] = Query(None, description="Default: today"),
+    granularity: str = Query("month", pattern="^(month|quarter|year)$"),
+    parish: Optional[str] = None,
+    masjid_id: Optional[int] = None,
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    event_types = event_type or EVENT_TYPES
+    unknown = sorted(set(event_types) - set(EVENT_TYPES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event types: {', '.join(unknown)}")
+    end = end or date.today()
+    start = start or date(end.year - (end.month <= 11), (end.month - 12) % 12 + 1, 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end.year - start.year) * 12 + end.month - start.month >= MAX_TREND_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range too long (maximum is {MAX_TREND_MONTHS} months)")
+    
+    # Rollups are monthly, so the range covers the whole months of start and end
+    labels = []
+    month = month_start(start)
+    while month <= end:
+        label = _period_label(month, granularity)
+        if not labels or labels[-1] != label:
+            labels.append(label)
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    
+    index = {label: i for i, label in enumerate(labels)}
+    series = {name: [0] * len(labels) for name in event_types}
+    for (period, name), count in trend_counts(db, event_types, start, end, parish, masjid_id).items():
+        series[name][index[_period_label(period, granularity)]] += count
+    
+    return {
+        "granularity": granularity,
+        "start": month_start(start),
+        "end": end,
+        "periods": labels,
+        "series": series,
+    }
+
+@router.get("/demographics", response_model=Dict[str, Any])
+def get_demographics(
+    db: Session = Depends(get_db),
+    parish: Optional[List[str]] = Query(None),
+    masjid_id: Optional[List[int]] = Query(None, description="0 for members without a masjid"),
+    gender: Optional[List[str]] = Query(None),
+    age_group: Optional[List[str]] = Query(None, description=f"Any of: {', '.join(AGE_GROUPS)}"),
+    marital_status: Optional[List[str]] = Query(None, description="A marital status, or unknown"),
+    education: Optional[List[str]] = Query(None, description=f"Any of: {', '.join(EDUCATIONS)}"),
+    group_by: Optional[List[str]] = Query(None, description=f"Any of: {', '.join(DIMENSIONS)}"),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Living members from the demographics cube: filter on any dimensions
+    (several values of one dimension are alternatives) and break the count
+    down by ``group_by``. Ages are those reached this calendar year.
+    """
+    allowed = {
+        "gender": [g.value for g in Gender],
+        "age_group": list(AGE_GROUPS),
+        "marital_status": [s.value for s in MaritalStatus] + ["unknown"],
+        "education": list(EDUCATIONS),
+        "group_by": list(DIMENSIONS),
+    }
+    given = {
+        "gender": gender, "age_group": age_group, "marital_status": marital_status,
+        "education": education, "group_by": group_by,
+    }
+    for name, values in given.items():
+        unknown = sorted(set(values or []) - set(allowed[name]))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown {name} values: {', '.join(unknown)}")
+    
+    filters = {
+        "parish": parish, "masjid": masjid_id, "gender": gender, "age_group": age_group,
+        "marital_status": marital_status, "education": education,
+    }
+    return query_cube(db, filters, group_by or [])
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app import models
+from app.api import deps
+from app.db.audit import AUDITED_TABLES, audit_log
+from app.schemas.audit import AuditEntry as AuditEntrySchema, AuditStatus
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[AuditEntrySchema])
+def read_audit_log(
+    db: Session = Depends(deps.get_db),
+    table_name: Optional[str] = Query(None, description="Entity table, e.g. members"),
+    row_id: Optional[int] = Query(None, description="Entity id; needs table_name"),
+    user_id: Optional[int] = Query(None),
+    action: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> List[AuditEntrySchema]:
+    """
+    Recorded writes, newest first. Entity filters use the (table, row, time)
+    index and user filters the (user, time) one. Entries are written in the
+    background, so the latest writes may take ``AUDIT_FLUSH_MS`` to appear.
+    """
+    if table_name is not None and table_name not in AUDITED_TABLES:
+        raise HTTPException(status_code=400, detail=f"{table_name!r} is not audited")
+    if row_id is not None and table_name is None:
+        raise HTTPException(status_code=400, detail="row_id needs table_name")
+
+    query = db.query(models.AuditEntry)
+    if table_name is not None:
+        query = query.filter(models.AuditEntry.table_name == table_name)
+    if row_id is not None:
+        query = query.filter(models.AuditEntry.row_id == row_id)
+    if user_id is not None:
+        query = query.filter(models.AuditEntry.user_id == user_id)
+    if action is not None:
+        query = query.filter(models.AuditEntry.action == action)
+    if since is not None:
+        query = query.filter(models.AuditEntry.changed_at >= since)
+    if until is not None:
+        query = query.filter(models.AuditEntry.changed_at < until)
+    entries = (
+        query.order_by(models.AuditEntry.changed_at.desc(), models.AuditEntry.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return [
+        AuditEntrySchema(
+            id=entry.id,
+            table_name=entry.table_name,
+            row_id=entry.row_id,
+            action=entry.action,
+            changes=json.loads(entry.changes),
+            user_id=entry.user_id,
+            changed_at=entry.changed_at,
+        )
+        for entry in entries
+    ]
+
+
+@router.get("/status", response_model=AuditStatus)
+def read_audit_status(
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> AuditStatus:
+    """
+    The background audit writer's queue and counters since the process started.
+    """
+    return AuditStatus(queue_depth=audit_log.depth(), **audit_log.stats)
@@ -1,16 +1,30 @@
 from datetime import timedelta
-from typing import Any
+from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError, jwt
 from sqlalchemy.orm import Session
+from app.api.deps import oauth2_scheme_optional
 from app.core.config import settings
+from app.core.revocation import revoke_access_token
 from app.core.security import create_access_token, verify_password
+from app.core.tenancy import current_tenant
 from app.db.base import get_db
 from app.models.user import User
-from app.schemas.token import Token
+from app.schemas.token import RefreshRequest, Token
+from app.services.refresh_tokens import (
+    InvalidRefreshToken, issue_refresh_token, revoke_refresh_token, rotate_refresh_token
+)
 
 router = APIRouter()
 
+def _access_token(user: User) -> str:
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return create_access_token(
+        # Bound to the tenant the user belongs to (see deps.get_current_user)
+        data={"sub": user.email, "tenant": current_tenant().slug}, expires_delta=access_token_expires
+    )
+
 @router.post("/login", response_model=Token)
 def login(
     db: Session = Depends(get_db),
@@ -23,8 +37,41 @@ def login(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    _, refresh_token = issue_refresh_token(db, user)
+    db.commit()
+    return {"access_token": _access_token(user), "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/refresh", response_model=Token)
+def refresh(
+    body: RefreshRequest,
+    db: Session = Depends(get_db)
+) -> Any:
+    # No password hashing here: an HMAC check and a lookup by token ID
+    try:
+        user, refresh_token = rotate_refresh_token(db, body.refresh_token)
+    except InvalidRefreshToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    db.commit()
+    return {"access_token": _access_token(user), "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout")
+def logout(
+    body: RefreshRequest,
+    db: Session = Depends(get_db),
+    token: Optional[str] = Depends(oauth2_scheme_optional)
+) -> Any:
+    revoke_refresh_token(db, body.refresh_token)
+    db.commit()
+    if token:
+        # Also end the access token the client is logging out with, rather than letting it run out
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            payload = {}
+        if payload.get("jti") and payload.get("exp"):
+            revoke_access_token(db, payload["jti"], payload["exp"])
+    return {"detail": "Logged out"}
@@ -1,17 +1,40 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from sqlalchemy import or_
 from app.api import deps
+from app.api.bulk import apply_bulk_update
+from app.api.conditional import conditional_get
+from app.api.fields import load_columns, parse_fields, sparse_response
 from app.db.base import get_db
+from app.db.batch import fetch_by_ids
+from app.db.sync import sync_page
+from app.models.archive import ArchivedBusiness
 from app.models.business import Business as BusinessModel
 from app.models.member import Member as MemberModel
 from app.models.user import User as UserModel
+from app.schemas.batch import BatchRequest, BatchResponse
+from app.schemas.bulk import BulkUpdateRequest, BulkUpdateResult
+from app.schemas.sync import SyncPage
 from app.schemas.business import Business, BusinessCreate, BusinessUpdate, BusinessWithOwner
+from app.services.archive import paginate_with_archive
 
 router = APIRouter()
 
-@router.get("/", response_model=List[BusinessWithOwner])
+def _business_with_owner(business: BusinessModel) -> dict:
+    return {
+        **business.__dict__,
+        "owner_name": business.owner.muslim_name if business.owner else None,
+        "owner_phone": business.owner.phone_number if business.owner else None
+    }
+
+OWNER_FIELDS = {
+    "owner_name": lambda business: business.owner.muslim_name if business.owner else None,
+    "owner_phone": lambda business: business.owner.phone_number if business.owner else None,
+}
+
+@router.get("/", response_model=List[BusinessWithOwner],
+            dependencies=[Depends(conditional_get("businesses", "members"))])
 def read_businesses(
     db: Session = Depends(get_db),
     skip: int = 0,
@@ -19,41 +42,59 @@ def read_businesses(
     search: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    include_archived: bool = Query(False, description="Also return archived businesses, after the others"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    query = db.query(BusinessModel).join(MemberModel)
+    selected = parse_fields(fields, BusinessWithOwner)
     
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            or_(
-                BusinessModel.name.ilike(search_filter),
-                BusinessModel.description.ilike(search_filter),
-                BusinessModel.phone_number.ilike(search_filter),
-                MemberModel.muslim_name.ilike(search_filter),
-                MemberModel.phone_number.ilike(search_filter)
+    def businesses_query(model: Any):
+        # The owner of an archived business may be archived too, hence the outer join
+        if model is BusinessModel:
+            query = db.query(model).join(MemberModel)
+        else:
+            query = db.query(model).outerjoin(MemberModel, MemberModel.id == model.owner_id)
+        if selected:
+            query = query.options(load_columns(model, selected))
+            if OWNER_FIELDS.keys() & set(selected):
+                # Owner is already joined for search; populate it from the same row
+                query = query.options(
+                    contains_eager(model.owner).load_only(
+                        MemberModel.muslim_name, MemberModel.phone_number
+                    )
+                )
+        
+        if search:
+            search_filter = f"%{search}%"
+            query = query.filter(
+                or_(
+                    model.name.ilike(search_filter),
+                    model.description.ilike(search_filter),
+                    model.phone_number.ilike(search_filter),
+                    MemberModel.muslim_name.ilike(search_filter),
+                    MemberModel.phone_number.ilike(search_filter)
+                )
             )
-        )
+        
+        if category:
+            query = query.filter(model.category == category)
+        
+        if is_active is not None:
+            query = query.filter(model.is_active == is_active)
+        return query
     
-    if category:
-        query = query.filter(BusinessModel.category == category)
-    
-    if is_active is not None:
-        query = query.filter(BusinessModel.is_active == is_active)
+    if include_archived:
+        businesses = paginate_with_archive(
+            businesses_query(BusinessModel), businesses_query(ArchivedBusiness), skip, limit
+        )
+    else:
+        businesses = businesses_query(BusinessModel).offset(skip).limit(limit).all()
     
-    businesses = query.offset(skip).limit(limit).all()
+    if selected:
+        return sparse_response(BusinessWithOwner, selected, businesses, **OWNER_FIELDS)
     
     # Add owner details to response
-    result = []
-    for business in businesses:
-        business_dict = {
-            **business.__dict__,
-            "owner_name": business.owner.muslim_name if business.owner else None,
-            "owner_phone": business.owner.phone_number if business.owner else None
-        }
-        result.append(business_dict)
-    
-    return result
+    return [_business_with_owner(business) for business in businesses]
 
 @router.post("/", response_model=Business)
 def create_business(
@@ -73,23 +114,64 @@ def create_business(
     db.refresh(business)
     return business
 
-@router.get("/{business_id}", response_model=BusinessWithOwner)
+@router.get("/batch", response_model=BatchResponse[BusinessWithOwner])
+def read_businesses_batch(
+    db: Session = Depends(get_db),
+    ids: List[int] = Depends(deps.get_batch_ids),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    businesses, missing = fetch_by_ids(db, BusinessModel, ids, joinedload(BusinessModel.owner))
+    return {"items": [_business_with_owner(b) for b in businesses], "missing": missing}
+
+@router.post("/batch", response_model=BatchResponse[BusinessWithOwner])
+def read_businesses_batch_post(
+    *,
+    db: Session = Depends(get_db),
+    batch_in: BatchRequest,
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    ids = deps.check_batch_ids(batch_in.ids)
+    businesses, missing = fetch_by_ids(db, BusinessModel, ids, joinedload(BusinessModel.owner))
+    return {"items": [_business_with_owner(b) for b in businesses], "missing": missing}
+
+@router.get("/sync", response_model=SyncPage[Business])
+def sync_businesses(
+    db: Session = Depends(get_db),
+    since: int = Query(0, ge=0, description="Sync token (next_since) from the previous page"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    return sync_page(db, BusinessModel, since, limit)
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+def bulk_update_businesses(
+    *,
+    db: Session = Depends(get_db),
+    bulk_in: BulkUpdateRequest,
+    current_user: UserModel = Depends(deps.get_current_active_superuser),
+) -> Any:
+    return apply_bulk_update(db, BusinessModel, BusinessUpdate, bulk_in)
+
+@router.get("/{business_id}", response_model=BusinessWithOwner,
+            dependencies=[Depends(conditional_get("businesses", "members"))])
 def read_business(
     *,
     db: Session = Depends(get_db),
     business_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    business = db.query(BusinessModel).filter(BusinessModel.id == business_id).first()
+    selected = parse_fields(fields, BusinessWithOwner)
+    query = db.query(BusinessModel)
+    if selected:
+        query = query.options(load_columns(BusinessModel, selected, "owner_id"))
+    business = query.filter(BusinessModel.id == business_id).first()
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    result = {
-        **business.__dict__,
-        "owner_name": business.owner.muslim_name if business.owner else None,
-        "owner_phone": business.owner.phone_number if business.owner else None
-    }
-    return result
+    if selected:
+        return sparse_response(BusinessWithOwner, selected, business, **OWNER_FIELDS)
+    return _business_with_owner(business)
 
 @router.put("/{business_id}", response_model=Business)
 def update_business(
@@ -1,17 +1,27 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 
 from app import models
 from app.api import deps
+from app.api.bulk import apply_bulk_update
+from app.api.fields import load_columns, parse_fields, sparse_response
+from app.db.batch import fetch_by_ids
+from app.db.sync import sync_page
+from app.models.archive import ArchivedEducation
 from app.models.education import Education
 from app.models.member import Member
+from app.schemas.batch import BatchRequest, BatchResponse
+from app.schemas.bulk import BulkUpdateRequest, BulkUpdateResult
+from app.schemas.sync import SyncPage
 from app.schemas.education import (
     EducationCreate,
     EducationUpdate,
     Education as EducationSchema,
     EducationWithMember
 )
+from app.services.archive import paginate_with_archive
+from app.services.demographics import bulk_education_update
 
 router = APIRouter()
 
@@ -22,17 +32,31 @@ def read_educations(
     skip: int = 0,
     limit: int = 100,
     member_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    include_archived: bool = Query(False, description="Also return educations of archived members, after the others"),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> List[EducationSchema]:
     """
     Retrieve educations. Optionally filter by member_id.
     """
-    query = db.query(Education)
+    selected = parse_fields(fields, EducationSchema)
     
-    if member_id:
-        query = query.filter(Education.member_id == member_id)
+    def educations_query(model):
+        query = db.query(model)
+        if selected:
+            query = query.options(load_columns(model, selected))
+        if member_id:
+            query = query.filter(model.member_id == member_id)
+        return query
     
-    educations = query.offset(skip).limit(limit).all()
+    if include_archived:
+        educations = paginate_with_archive(
+            educations_query(Education), educations_query(ArchivedEducation), skip, limit
+        )
+    else:
+        educations = educations_query(Education).offset(skip).limit(limit).all()
+    if selected:
+        return sparse_response(EducationSchema, selected, educations)
     return educations
 
 
@@ -61,19 +85,83 @@ def create_education(
     return education
 
 
+@router.get("/batch", response_model=BatchResponse[EducationSchema])
+def read_educations_batch(
+    db: Session = Depends(deps.get_db),
+    ids: List[int] = Depends(deps.get_batch_ids),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> BatchResponse[EducationSchema]:
+    """
+    Get several education records by ID in a single query.
+    """
+    educations, missing = fetch_by_ids(db, Education, ids)
+    return {"items": educations, "missing": missing}
+
+
+@router.post("/batch", response_model=BatchResponse[EducationSchema])
+def read_educations_batch_post(
+    *,
+    db: Session = Depends(deps.get_db),
+    batch_in: BatchRequest,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> BatchResponse[EducationSchema]:
+    """
+    Get several education records by ID, with the IDs sent in the request body.
+    """
+    ids = deps.check_batch_ids(batch_in.ids)
+    educations, missing = fetch_by_ids(db, Education, ids)
+    return {"items": educations, "missing": missing}
+
+
+@router.get("/sync", response_model=SyncPage[EducationSchema])
+def sync_educations(
+    db: Session = Depends(deps.get_db),
+    since: int = Query(0, ge=0, description="Sync token (next_since) from the previous page"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> SyncPage[EducationSchema]:
+    """
+    Education records created, updated or deleted since the given sync token.
+    """
+    return sync_page(db, Education, since, limit)
+
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+def bulk_update_educations(
+    *,
+    db: Session = Depends(deps.get_db),
+    bulk_in: BulkUpdateRequest,
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> BulkUpdateResult:
+    """
+    Update many education records in one transaction, either per item or by filter.
+    """
+    cube = bulk_education_update()
+    return apply_bulk_update(
+        db, Education, EducationUpdate, bulk_in, before_update=cube.before, after_update=cube.after
+    )
+
+
 @router.get("/{education_id}", response_model=EducationSchema)
 def read_education(
     *,
     db: Session = Depends(deps.get_db),
     education_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> EducationSchema:
     """
     Get education by ID.
     """
-    education = db.query(Education).filter(Education.id == education_id).first()
+    selected = parse_fields(fields, EducationSchema)
+    query = db.query(Education)
+    if selected:
+        query = query.options(load_columns(Education, selected))
+    education = query.filter(Education.id == education_id).first()
     if not education:
         raise HTTPException(status_code=404, detail="Education not found")
+    if selected:
+        return sparse_response(EducationSchema, selected, education)
     return education
 
 
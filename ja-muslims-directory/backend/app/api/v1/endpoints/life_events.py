@@ -2,10 +2,19 @@ from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.api.bulk import apply_bulk_update
+from app.api.fields import load_columns, parse_fields, sparse_response
 from app.db.base import get_db
+from app.db.sync import sync_page
+from app.db.writer import run_write
+from app.models.archive import ArchivedLifeEvent
 from app.models.life_event import LifeEvent as LifeEventModel, EventType
 from app.models.user import User as UserModel
+from app.schemas.bulk import BulkUpdateRequest, BulkUpdateResult
+from app.schemas.sync import SyncPage
 from app.schemas.life_event import LifeEvent, LifeEventCreate, LifeEventUpdate
+from app.services.archive import paginate_with_archive
+from app.services.rollups import bulk_event_update
 
 router = APIRouter()
 
@@ -16,15 +25,30 @@ def read_life_events(
     limit: int = 100,
     member_id: Optional[int] = Query(None),
     event_type: Optional[EventType] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    include_archived: bool = Query(False, description="Also return events of archived members, after the others"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    query = db.query(LifeEventModel)
-    if member_id:
-        query = query.filter(LifeEventModel.member_id == member_id)
-    if event_type:
-        query = query.filter(LifeEventModel.event_type == event_type)
+    selected = parse_fields(fields, LifeEvent)
+    
+    def events_query(model: Any):
+        query = db.query(model)
+        if selected:
+            query = query.options(load_columns(model, selected))
+        if member_id:
+            query = query.filter(model.member_id == member_id)
+        if event_type:
+            query = query.filter(model.event_type == event_type)
+        return query
     
-    life_events = query.offset(skip).limit(limit).all()
+    if include_archived:
+        life_events = paginate_with_archive(
+            events_query(LifeEventModel), events_query(ArchivedLifeEvent), skip, limit
+        )
+    else:
+        life_events = events_query(LifeEventModel).offset(skip).limit(limit).all()
+    if selected:
+        return sparse_response(LifeEvent, selected, life_events)
     return life_events
 
 @router.post("/", response_model=LifeEvent)
@@ -34,22 +58,55 @@ def create_life_event(
     life_event_in: LifeEventCreate,
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    life_event = LifeEventModel(**life_event_in.dict(), created_by=current_user.id)
-    db.add(life_event)
-    db.commit()
-    db.refresh(life_event)
-    return life_event
+    created_by = current_user.id
+    
+    def create(session: Session) -> LifeEventModel:
+        life_event = LifeEventModel(**life_event_in.dict(), created_by=created_by)
+        session.add(life_event)
+        session.flush()
+        session.refresh(life_event)
+        return life_event
+    
+    return run_write(db, create)
+
+@router.get("/sync", response_model=SyncPage[LifeEvent])
+def sync_life_events(
+    db: Session = Depends(get_db),
+    since: int = Query(0, ge=0, description="Sync token (next_since) from the previous page"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    return sync_page(db, LifeEventModel, since, limit)
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+def bulk_update_life_events(
+    *,
+    db: Session = Depends(get_db),
+    bulk_in: BulkUpdateRequest,
+    current_user: UserModel = Depends(deps.get_current_active_superuser),
+) -> Any:
+    rollups = bulk_event_update()
+    return apply_bulk_update(
+        db, LifeEventModel, LifeEventUpdate, bulk_in, before_update=rollups.before, after_update=rollups.after
+    )
 
 @router.get("/{life_event_id}", response_model=LifeEvent)
 def read_life_event(
     *,
     db: Session = Depends(get_db),
     life_event_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    life_event = db.query(LifeEventModel).filter(LifeEventModel.id == life_event_id).first()
+    selected = parse_fields(fields, LifeEvent)
+    query = db.query(LifeEventModel)
+    if selected:
+        query = query.options(load_columns(LifeEventModel, selected))
+    life_event = query.filter(LifeEventModel.id == life_event_id).first()
     if not life_event:
         raise HTTPException(status_code=404, detail="Life event not found")
+    if selected:
+        return sparse_response(LifeEvent, selected, life_event)
     return life_event
 
 @router.put("/{life_event_id}", response_model=LifeEvent)
@@ -1,10 +1,15 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_, func
 
 from app import models
 from app.api import deps
+from app.api.bulk import apply_bulk_update
+from app.api.conditional import conditional_get
+from app.api.fields import load_columns, parse_fields, sparse_response
+from app.db.batch import fetch_by_ids
+from app.db.sync import sync_page
 from app.models.masjid import Masjid, MasjidType
 from app.models.member import Member
 from app.schemas.masjid import (
@@ -13,27 +18,95 @@ from app.schemas.masjid import (
     Masjid as MasjidSchema,
     MasjidWithRelations
 )
+from app.schemas.batch import BatchRequest, BatchResponse
+from app.schemas.bulk import BulkUpdateRequest, BulkUpdateResult
+from app.schemas.sync import SyncPage
 from app.schemas.member import Member as MemberSchema
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[MasjidWithRelations])
+def _masjid_with_relations(masjid: Masjid, affiliated_count: int) -> MasjidWithRelations:
+    masjid_dict = {
+        "id": masjid.id,
+        "name": masjid.name,
+        "type": masjid.type,
+        "address": masjid.address,
+        "city": masjid.city,
+        "parish": masjid.parish,
+        "postal_code": masjid.postal_code,
+        "phone": masjid.phone,
+        "email": masjid.email,
+        "website": masjid.website,
+        "imam_id": masjid.imam_id,
+        "established_year": masjid.established_year,
+        "capacity": masjid.capacity,
+        "facilities": masjid.facilities,
+        "prayer_times_info": masjid.prayer_times_info,
+        "jummah_time": masjid.jummah_time,
+        "activities": masjid.activities,
+        "created_at": masjid.created_at,
+        "updated_at": masjid.updated_at,
+        "imam": masjid.imam,
+        "shura_members": masjid.shura_members,
+        "affiliated_members_count": affiliated_count
+    }
+    return MasjidWithRelations(**masjid_dict)
+
+
+def _masjid_load_options(selected: Optional[List[str]]) -> list:
+    if not selected:
+        return [joinedload(Masjid.imam), joinedload(Masjid.shura_members)]
+    # Only join the relationships the fieldset asks for
+    options = [load_columns(Masjid, selected)]
+    if "imam" in selected:
+        options.append(joinedload(Masjid.imam))
+    if "shura_members" in selected:
+        options.append(joinedload(Masjid.shura_members))
+    return options
+
+
+def _affiliated_counts(db: Session, masjids: List[Masjid]) -> Dict[int, int]:
+    """Affiliated members per masjid id, in one grouped count instead of one per row."""
+    if not masjids:
+        return {}
+    return dict(
+        db.query(Member.masjid_id, func.count(Member.id))
+        .filter(Member.masjid_id.in_([m.id for m in masjids]))
+        .group_by(Member.masjid_id)
+        .all()
+    )
+
+
+def _sparse_masjids(db: Session, selected: List[str], data):
+    counts = {}
+    if "affiliated_members_count" in selected:
+        counts = _affiliated_counts(db, data if isinstance(data, list) else [data])
+    return sparse_response(
+        MasjidWithRelations, selected, data,
+        affiliated_members_count=lambda masjid: counts.get(masjid.id, 0)
+    )
+
+
+@router.get(
+    "/",
+    response_model=List[MasjidWithRelations],
+    dependencies=[Depends(conditional_get("masjids", "members"))]
+)
 def read_masjids(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     masjid_type: Optional[MasjidType] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> List[MasjidWithRelations]:
     """
     Retrieve masjids with their relations.
     """
-    query = db.query(Masjid).options(
-        joinedload(Masjid.imam),
-        joinedload(Masjid.shura_members)
-    )
+    selected = parse_fields(fields, MasjidWithRelations)
+    query = db.query(Masjid).options(*_masjid_load_options(selected))
     
     if search:
         query = query.filter(
@@ -50,40 +123,12 @@ def read_masjids(
     
     masjids = query.offset(skip).limit(limit).all()
     
+    if selected:
+        return _sparse_masjids(db, selected, masjids)
+    
     # Convert to response model with counts
-    result = []
-    for masjid in masjids:
-        affiliated_count = db.query(func.count(Member.id)).filter(
-            Member.masjid_id == masjid.id
-        ).scalar()
-        
-        masjid_dict = {
-            "id": masjid.id,
-            "name": masjid.name,
-            "type": masjid.type,
-            "address": masjid.address,
-            "city": masjid.city,
-            "parish": masjid.parish,
-            "postal_code": masjid.postal_code,
-            "phone": masjid.phone,
-            "email": masjid.email,
-            "website": masjid.website,
-            "imam_id": masjid.imam_id,
-            "established_year": masjid.established_year,
-            "capacity": masjid.capacity,
-            "facilities": masjid.facilities,
-            "prayer_times_info": masjid.prayer_times_info,
-            "jummah_time": masjid.jummah_time,
-            "activities": masjid.activities,
-            "created_at": masjid.created_at,
-            "updated_at": masjid.updated_at,
-            "imam": masjid.imam,
-            "shura_members": masjid.shura_members,
-            "affiliated_members_count": affiliated_count
-        }
-        result.append(MasjidWithRelations(**masjid_dict))
-    
-    return result
+    affiliated_counts = _affiliated_counts(db, masjids)
+    return [_masjid_with_relations(masjid, affiliated_counts.get(masjid.id, 0)) for masjid in masjids]
 
 
 @router.post("/", response_model=MasjidSchema)
@@ -114,55 +159,108 @@ def create_masjid(
     return masjid
 
 
-@router.get("/{masjid_id}", response_model=MasjidWithRelations)
+def _read_masjids_batch(db: Session, ids: List[int]) -> dict:
+    masjids, missing = fetch_by_ids(
+        db, Masjid, ids,
+        joinedload(Masjid.imam),
+        joinedload(Masjid.shura_members)
+    )
+    
+    affiliated_counts = _affiliated_counts(db, masjids)
+    
+    return {
+        "items": [
+            _masjid_with_relations(masjid, affiliated_counts.get(masjid.id, 0))
+            for masjid in masjids
+        ],
+        "missing": missing
+    }
+
+
+@router.get("/batch", response_model=BatchResponse[MasjidWithRelations])
+def read_masjids_batch(
+    db: Session = Depends(deps.get_db),
+    ids: List[int] = Depends(deps.get_batch_ids),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> BatchResponse[MasjidWithRelations]:
+    """
+    Get several masjids by ID with their relations.
+    """
+    return _read_masjids_batch(db, ids)
+
+
+@router.post("/batch", response_model=BatchResponse[MasjidWithRelations])
+def read_masjids_batch_post(
+    *,
+    db: Session = Depends(deps.get_db),
+    batch_in: BatchRequest,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> BatchResponse[MasjidWithRelations]:
+    """
+    Get several masjids by ID, with the IDs sent in the request body.
+    """
+    return _read_masjids_batch(db, deps.check_batch_ids(batch_in.ids))
+
+
+@router.get("/sync", response_model=SyncPage[MasjidSchema])
+def sync_masjids(
+    db: Session = Depends(deps.get_db),
+    since: int = Query(0, ge=0, description="Sync token (next_since) from the previous page"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> SyncPage[MasjidSchema]:
+    """
+    Masjids created, updated or deleted since the given sync token.
+    """
+    return sync_page(db, Masjid, since, limit)
+
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+def bulk_update_masjids(
+    *,
+    db: Session = Depends(deps.get_db),
+    bulk_in: BulkUpdateRequest,
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> BulkUpdateResult:
+    """
+    Update many masjids in one transaction, either per item or by filter.
+    Shura members cannot be changed in bulk.
+    """
+    return apply_bulk_update(db, Masjid, MasjidUpdate, bulk_in)
+
+
+@router.get(
+    "/{masjid_id}",
+    response_model=MasjidWithRelations,
+    dependencies=[Depends(conditional_get("masjids", "members"))]
+)
 def read_masjid(
     *,
     db: Session = Depends(deps.get_db),
     masjid_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> MasjidWithRelations:
     """
     Get masjid by ID with all relations.
     """
+    selected = parse_fields(fields, MasjidWithRelations)
     masjid = db.query(Masjid).options(
-        joinedload(Masjid.imam),
-        joinedload(Masjid.shura_members)
+        *_masjid_load_options(selected)
     ).filter(Masjid.id == masjid_id).first()
     
     if not masjid:
         raise HTTPException(status_code=404, detail="Masjid not found")
     
+    if selected:
+        return _sparse_masjids(db, selected, masjid)
+    
     # Get affiliated members count
     affiliated_count = db.query(func.count(Member.id)).filter(
         Member.masjid_id == masjid.id
     ).scalar()
     
-    masjid_dict = {
-        "id": masjid.id,
-        "name": masjid.name,
-        "type": masjid.type,
-        "address": masjid.address,
-        "city": masjid.city,
-        "parish": masjid.parish,
-        "postal_code": masjid.postal_code,
-        "phone": masjid.phone,
-        "email": masjid.email,
-        "website": masjid.website,
-        "imam_id": masjid.imam_id,
-        "established_year": masjid.established_year,
-        "capacity": masjid.capacity,
-        "facilities": masjid.facilities,
-        "prayer_times_info": masjid.prayer_times_info,
-        "jummah_time": masjid.jummah_time,
-        "activities": masjid.activities,
-        "created_at": masjid.created_at,
-        "updated_at": masjid.updated_at,
-        "imam": masjid.imam,
-        "shura_members": masjid.shura_members,
-        "affiliated_members_count": affiliated_count
-    }
-    
-    return MasjidWithRelations(**masjid_dict)
+    return _masjid_with_relations(masjid, affiliated_count)
 
 
 @router.put("/{masjid_id}", response_model=MasjidSchema)
@@ -1,36 +1,79 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session, raiseload, selectinload
 from sqlalchemy import or_
 from app.api import deps
+from app.api.bulk import apply_bulk_update
+from app.api.fields import load_columns, parse_fields, sparse_response
+from app.core.config import settings
 from app.db.base import get_db
+from app.db.batch import fetch_by_ids
+from app.db.sync import sync_page
+from app.db.writer import run_write
+from app.models.archive import ArchivedMember
 from app.models.member import Member as MemberModel
 from app.models.user import User as UserModel
-from app.schemas.member import Member, MemberCreate, MemberUpdate, MemberWithRelations
+from app.schemas.batch import BatchRequest, BatchResponse
+from app.schemas.bulk import BulkUpdateRequest, BulkUpdateResult
+from app.schemas.dedupe import DuplicateCheckResult
+from app.schemas.sync import SyncPage
+from app.schemas.member import Member, MemberCreate, MemberUpdate, MemberWithRelations, MemberProfile
+from app.services.archive import paginate_with_archive
+from app.services.match_keys import refresh_match_keys
+from app.services import demographics, rollups
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Profile section name -> Member relationship attributes it needs.
+# Each relationship is loaded with one selectinload query.
+PROFILE_SECTIONS = {
+    "life_events": ["life_events"],
+    "educations": ["educations"],
+    "businesses": ["businesses"],
+    "spouse": ["spouse"],
+    "masjid": ["masjid"],
+    "roles": ["imam_of_masjid", "shura_member_of_masjids"],
+}
+
 @router.get("/", response_model=List[Member])
 def read_members(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    include_archived: bool = Query(False, description="Also return archived members, after the others"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    query = db.query(MemberModel)
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            or_(
-                MemberModel.muslim_name.ilike(search_filter),
-                MemberModel.legal_name.ilike(search_filter),
-                MemberModel.email.ilike(search_filter),
-                MemberModel.phone_number.ilike(search_filter)
+    selected = parse_fields(fields, Member)
+    
+    def members_query(model: Any):
+        query = db.query(model)
+        if selected:
+            query = query.options(load_columns(model, selected))
+        if search:
+            search_filter = f"%{search}%"
+            query = query.filter(
+                or_(
+                    model.muslim_name.ilike(search_filter),
+                    model.legal_name.ilike(search_filter),
+                    model.email.ilike(search_filter),
+                    model.phone_number.ilike(search_filter)
+                )
             )
-        )
-    members = query.offset(skip).limit(limit).all()
+        return query
+    
+    if include_archived:
+        members = paginate_with_archive(members_query(MemberModel), members_query(ArchivedMember), skip, limit)
+    else:
+        members = members_query(MemberModel).offset(skip).limit(limit).all()
+    if selected:
+        return sparse_response(Member, selected, members)
     return members
 
 @router.post("/", response_model=Member)
@@ -38,26 +81,173 @@ def create_member(
     *,
     db: Session = Depends(get_db),
     member_in: MemberCreate,
+    reject_duplicates: bool = Query(False, description="Fail with 409 if the member looks like an existing one"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    member = MemberModel(**member_in.dict(), created_by=current_user.id)
-    db.add(member)
-    db.commit()
-    db.refresh(member)
-    return member
+    if reject_duplicates:
+        # Loads NumPy, which plain creates never need
+        from app.services.dedupe import find_matches
+        matches = find_matches(db, [member_in.dict()])[0]
+        if matches:
+            raise HTTPException(
+                status_code=409,
+                detail={"msg": "Possible duplicate of existing members", "matches": jsonable_encoder(matches)}
+            )
+    created_by = current_user.id
+    
+    def create(session: Session) -> MemberModel:
+        member = MemberModel(**member_in.dict(), created_by=created_by)
+        session.add(member)
+        session.flush()
+        session.refresh(member)
+        return member
+    
+    return run_write(db, create)
+
+@router.get("/batch", response_model=BatchResponse[Member])
+def read_members_batch(
+    db: Session = Depends(get_db),
+    ids: List[int] = Depends(deps.get_batch_ids),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    members, missing = fetch_by_ids(db, MemberModel, ids)
+    return {"items": members, "missing": missing}
+
+@router.post("/batch", response_model=BatchResponse[Member])
+def read_members_batch_post(
+    *,
+    db: Session = Depends(get_db),
+    batch_in: BatchRequest,
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    ids = deps.check_batch_ids(batch_in.ids)
+    members, missing = fetch_by_ids(db, MemberModel, ids)
+    return {"items": members, "missing": missing}
+
+@router.get("/sync", response_model=SyncPage[Member])
+def sync_members(
+    db: Session = Depends(get_db),
+    since: int = Query(0, ge=0, description="Sync token (next_since) from the previous page"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    return sync_page(db, MemberModel, since, limit)
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+def bulk_update_members(
+    *,
+    db: Session = Depends(get_db),
+    bulk_in: BulkUpdateRequest,
+    current_user: UserModel = Depends(deps.get_current_active_superuser),
+) -> Any:
+    aggregates = [rollups.bulk_member_update(), demographics.bulk_member_update()]
+    
+    def before_update(db: Session, ids: List[int]) -> None:
+        for aggregate in aggregates:
+            aggregate.before(db, ids)
+    
+    def after_update(db: Session, ids: List[int]) -> None:
+        refresh_match_keys(db, ids)
+        for aggregate in aggregates:
+            aggregate.after(db, ids)
+    
+    return apply_bulk_update(
+        db, MemberModel, MemberUpdate, bulk_in, before_update=before_update, after_update=after_update
+    )
+
+@router.post("/duplicates/check", response_model=List[DuplicateCheckResult])
+def check_member_duplicates(
+    *,
+    db: Session = Depends(get_db),
+    members_in: List[MemberCreate] = Body(...),
+    threshold: Optional[float] = Query(None, ge=0, le=1),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    if len(members_in) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many records (maximum is {settings.BATCH_MAX_IDS})"
+        )
+    from app.services.dedupe import find_matches
+    matches = find_matches(db, [member_in.dict() for member_in in members_in], threshold)
+    return [{"index": index, "matches": record_matches} for index, record_matches in enumerate(matches)]
 
 @router.get("/{member_id}", response_model=MemberWithRelations)
 def read_member(
     *,
     db: Session = Depends(get_db),
     member_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    include_archived: bool = Query(False, description="Look in the archive if the member is not found"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    member = db.query(MemberModel).filter(MemberModel.id == member_id).first()
+    selected = parse_fields(fields, MemberWithRelations)
+    models = [MemberModel, ArchivedMember] if include_archived else [MemberModel]
+    member = None
+    for model in models:
+        query = db.query(model)
+        if selected:
+            query = query.options(load_columns(model, selected))
+        member = query.filter(model.id == member_id).first()
+        if member:
+            break
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
+    if selected:
+        return sparse_response(MemberWithRelations, selected, member)
     return member
 
+@router.get("/{member_id}/profile", response_model=MemberProfile)
+def read_member_profile(
+    *,
+    db: Session = Depends(get_db),
+    member_id: int,
+    include: Optional[str] = Query(
+        None,
+        description="Comma-separated sections to include: " + ", ".join(PROFILE_SECTIONS)
+    ),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    if include:
+        sections = [part.strip() for part in include.split(",") if part.strip()]
+        unknown = [section for section in sections if section not in PROFILE_SECTIONS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown profile sections: {', '.join(unknown)}"
+            )
+    else:
+        sections = list(PROFILE_SECTIONS)
+    
+    # Relationships that were not requested raise instead of lazy-loading,
+    # so the number of queries stays fixed at 1 + one per requested relationship
+    loaders = [
+        selectinload(getattr(MemberModel, attr))
+        for section in sections
+        for attr in PROFILE_SECTIONS[section]
+    ]
+    member = db.query(MemberModel).options(*loaders, raiseload("*")).filter(
+        MemberModel.id == member_id
+    ).first()
+    if not member:
+        raise HTTPException(status_code=404, detail="Member not found")
+    
+    profile = Member.model_validate(member).model_dump()
+    if "life_events" in sections:
+        profile["life_events"] = member.life_events
+    if "educations" in sections:
+        profile["educations"] = member.educations
+    if "businesses" in sections:
+        profile["businesses"] = member.businesses
+    if "spouse" in sections:
+        profile["spouse"] = member.spouse
+    if "masjid" in sections:
+        profile["masjid"] = member.masjid
+    if "roles" in sections:
+        profile["imam_of_masjids"] = member.imam_of_masjid
+        profile["shura_member_of_masjids"] = member.shura_member_of_masjids
+    return profile
+
 @router.put("/{member_id}/debug")
 async def debug_update_member(
     *,
@@ -66,15 +256,12 @@ async def debug_update_member(
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
     body = await request.body()
-    print(f"=== DEBUG UPDATE MEMBER {member_id} ===")
-    print(f"Raw body: {body}")
     try:
-        import json
         data = json.loads(body)
-        print(f"Parsed JSON: {data}")
+        logger.debug("Debug update parsed", extra={"member_id": member_id, "fields": sorted(data)})
         return {"status": "success", "data": data}
     except Exception as e:
-        print(f"Error parsing JSON: {e}")
+        logger.debug("Debug update body is not JSON", extra={"member_id": member_id, "error": type(e).__name__})
         return {"status": "error", "error": str(e)}
 
 @router.put("/{member_id}", response_model=Member)
@@ -86,34 +273,29 @@ def update_member(
     member_in: MemberUpdate,
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
-    print(f"=== UPDATE MEMBER {member_id} ===")
     try:
-        # Log raw request body
-        print(f"Raw request content: {member_in}")
-        
         member = db.query(MemberModel).filter(MemberModel.id == member_id).first()
         if not member:
             raise HTTPException(status_code=404, detail="Member not found")
         
         update_data = member_in.dict(exclude_unset=True)
-        print(f"Update data: {update_data}")
+        # Field names only; the values are personal data (the audit log has them)
+        logger.debug("Updating member", extra={"member_id": member_id, "fields": sorted(update_data)})
         
         for field, value in update_data.items():
             if hasattr(member, field):
-                print(f"Setting {field} = {value}")
                 setattr(member, field, value)
             else:
-                print(f"Warning: Field {field} not found on member model")
+                logger.warning("Unknown member field in update", extra={"member_id": member_id, "field": field})
         
         db.add(member)
         db.commit()
         db.refresh(member)
-        print("Member updated successfully")
         return member
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error updating member: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Updating member failed", extra={"member_id": member_id})
         raise HTTPException(status_code=422, detail=f"{type(e).__name__}: {str(e)}")
 
 @router.delete("/{member_id}")
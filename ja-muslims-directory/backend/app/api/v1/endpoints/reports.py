@@ -0,0 +1,126 @@
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app import models
+from app.api import deps
+from app.schemas.report import Report as ReportSchema, ReportList, ReportRequest, ReportTypeInfo
+from app.services.report_formats import FORMATS
+from app.services.reports import REPORT_TYPES, content_path, request_report
+
+router = APIRouter()
+
+RECENT_REPORTS = 50
+
+
+def _report_schema(request: Request, report: models.Report) -> ReportSchema:
+    download_url = None
+    if report.status == "done":
+        download_url = str(request.url_for("download_report", report_id=report.id))
+    return ReportSchema(
+        id=report.id,
+        name=report.name,
+        format=report.format,
+        params=json.loads(report.params),
+        status=report.status,
+        content_hash=report.content_hash,
+        size=report.size,
+        error=report.error,
+        created_at=report.created_at,
+        completed_at=report.completed_at,
+        download_url=download_url,
+    )
+
+
+@router.get("/", response_model=ReportList)
+def list_reports(
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_active_user)
+):
+    """
+    Available report types and the most recently requested reports.
+    """
+    reports = db.query(models.Report).order_by(models.Report.id.desc()).limit(RECENT_REPORTS).all()
+    return ReportList(
+        types=[
+            ReportTypeInfo(name=name, title=report_type.title, formats=sorted(FORMATS), tables=list(report_type.tables))
+            for name, report_type in REPORT_TYPES.items()
+        ],
+        reports=[_report_schema(request, report) for report in reports],
+    )
+
+
+@router.post("/", response_model=ReportSchema)
+def create_report(
+    report_in: ReportRequest,
+    request: Request,
+    response: Response,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_active_user)
+):
+    """
+    Request a report. If one was already generated or queued from the same
+    data, that report is returned; otherwise a new one is queued (202) and
+    rendered in the background.
+    """
+    if report_in.name not in REPORT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown report {report_in.name!r}")
+    if report_in.format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {report_in.format!r}")
+    report, queued = request_report(
+        db, report_in.name, report_in.format, {"year": report_in.year}, requested_by=current_user.id
+    )
+    if queued:
+        response.status_code = 202
+    return _report_schema(request, report)
+
+
+@router.get("/{report_id}", response_model=ReportSchema)
+def read_report(
+    report_id: int,
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_active_user)
+):
+    """
+    A report's generation status.
+    """
+    report = db.get(models.Report, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return _report_schema(request, report)
+
+
+@router.get("/{report_id}/download", name="download_report")
+def download_report(
+    report_id: int,
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_active_user)
+):
+    """
+    The generated file. Stored files never change, so the content hash is a
+    strong ETag and clients may cache the download indefinitely.
+    """
+    report = db.get(models.Report, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if report.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report is {report.status}")
+
+    etag = f'"{report.content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    path = content_path(report.content_hash, report.format)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Report file is missing; request the report again")
+    return FileResponse(
+        path,
+        media_type=FORMATS[report.format][1],
+        filename=f"{report.name}-{json.loads(report.params)['year']}.{report.format}",
+        headers=headers,
+    )
@@ -1,6 +1,6 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import or_
 import os
 import shutil
@@ -8,8 +8,16 @@ from datetime import datetime
 
 from app import models
 from app.api import deps
+from app.api.bulk import apply_bulk_update
+from app.api.conditional import conditional_get
+from app.api.fields import load_columns, parse_fields, sparse_response
+from app.db.batch import fetch_by_ids
+from app.db.sync import sync_page
 from app.models.restaurant import Restaurant, RestaurantMenu
 from app.models.business import Business, BusinessCategory
+from app.schemas.batch import BatchRequest, BatchResponse
+from app.schemas.bulk import BulkUpdateRequest, BulkUpdateResult
+from app.schemas.sync import SyncPage
 from app.schemas.restaurant import (
     RestaurantCreate, 
     RestaurantUpdate, 
@@ -21,21 +29,72 @@ from app.schemas.restaurant import (
 router = APIRouter()
 
 
-@router.get("/", response_model=List[RestaurantWithBusiness])
+def _restaurant_with_business(restaurant: Restaurant) -> RestaurantWithBusiness:
+    rest_dict = {
+        "id": restaurant.id,
+        "name": restaurant.name,
+        "address": restaurant.address,
+        "parish": restaurant.parish,
+        "phone": restaurant.phone,
+        "email": restaurant.email,
+        "website": restaurant.website,
+        "is_halal_certified": restaurant.is_halal_certified,
+        "has_halal_options": restaurant.has_halal_options,
+        "has_vegetarian_options": restaurant.has_vegetarian_options,
+        "has_vegan_options": restaurant.has_vegan_options,
+        "cuisine_types": restaurant.cuisine_types,
+        "opening_hours": restaurant.opening_hours,
+        "description": restaurant.description,
+        "business_id": restaurant.business_id,
+        "created_at": restaurant.created_at,
+        "updated_at": restaurant.updated_at,
+        "menu_files": restaurant.menu_files,
+        "business_name": restaurant.business.name if restaurant.business else None,
+        "owner_name": restaurant.business.owner.legal_name if restaurant.business and restaurant.business.owner else None
+    }
+    return RestaurantWithBusiness(**rest_dict)
+
+
+BUSINESS_FIELDS = {
+    "business_name": lambda restaurant: restaurant.business.name if restaurant.business else None,
+    "owner_name": lambda restaurant: (
+        restaurant.business.owner.legal_name
+        if restaurant.business and restaurant.business.owner else None
+    ),
+}
+
+
+def _restaurant_load_options(selected: Optional[List[str]]) -> list:
+    if not selected:
+        return [joinedload(Restaurant.business).joinedload(Business.owner)]
+    # business_id is always needed to de-duplicate business-sourced rows
+    options = [load_columns(Restaurant, selected, "business_id")]
+    if BUSINESS_FIELDS.keys() & set(selected):
+        options.append(joinedload(Restaurant.business).joinedload(Business.owner))
+    if "menu_files" in selected:
+        options.append(selectinload(Restaurant.menu_files))
+    return options
+
+
+@router.get(
+    "/",
+    response_model=List[RestaurantWithBusiness],
+    dependencies=[Depends(conditional_get("restaurants", "restaurant_menus", "businesses", "members"))]
+)
 def read_restaurants(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     halal_only: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> List[RestaurantWithBusiness]:
     """
     Retrieve restaurants, including Muslim-owned restaurants from businesses.
     """
-    query = db.query(Restaurant).options(
-        joinedload(Restaurant.business).joinedload(Business.owner)
-    )
+    selected = parse_fields(fields, RestaurantWithBusiness)
+    query = db.query(Restaurant).options(*_restaurant_load_options(selected))
     
     if search:
         query = query.filter(
@@ -67,30 +126,9 @@ def read_restaurants(
     result = []
     restaurant_business_ids = {r.business_id for r in restaurants if r.business_id}
     
-    for restaurant in restaurants:
-        rest_dict = {
-            "id": restaurant.id,
-            "name": restaurant.name,
-            "address": restaurant.address,
-            "parish": restaurant.parish,
-            "phone": restaurant.phone,
-            "email": restaurant.email,
-            "website": restaurant.website,
-            "is_halal_certified": restaurant.is_halal_certified,
-            "has_halal_options": restaurant.has_halal_options,
-            "has_vegetarian_options": restaurant.has_vegetarian_options,
-            "has_vegan_options": restaurant.has_vegan_options,
-            "cuisine_types": restaurant.cuisine_types,
-            "opening_hours": restaurant.opening_hours,
-            "description": restaurant.description,
-            "business_id": restaurant.business_id,
-            "created_at": restaurant.created_at,
-            "updated_at": restaurant.updated_at,
-            "menu_files": restaurant.menu_files,
-            "business_name": restaurant.business.name if restaurant.business else None,
-            "owner_name": restaurant.business.owner.legal_name if restaurant.business and restaurant.business.owner else None
-        }
-        result.append(RestaurantWithBusiness(**rest_dict))
+    if not selected:
+        for restaurant in restaurants:
+            result.append(_restaurant_with_business(restaurant))
     
     # Add restaurant businesses not in restaurants table
     for business in restaurant_businesses:
@@ -123,8 +161,12 @@ def read_restaurants(
                 search.lower() in business.parish.lower()
             )):
                 if not halal_only or business.halal_certified:
-                    result.append(RestaurantWithBusiness(**rest_dict))
+                    result.append(rest_dict if selected else RestaurantWithBusiness(**rest_dict))
     
+    if selected:
+        return sparse_response(
+            RestaurantWithBusiness, selected, restaurants + result, **BUSINESS_FIELDS
+        )
     return result
 
 
@@ -145,48 +187,103 @@ def create_restaurant(
     return restaurant
 
 
-@router.get("/{restaurant_id}", response_model=RestaurantWithBusiness)
+def _read_restaurants_batch(db: Session, ids: List[int]) -> dict:
+    restaurants, missing = fetch_by_ids(
+        db, Restaurant, ids,
+        joinedload(Restaurant.business).joinedload(Business.owner),
+        joinedload(Restaurant.menu_files)
+    )
+    return {
+        "items": [_restaurant_with_business(restaurant) for restaurant in restaurants],
+        "missing": missing
+    }
+
+
+@router.get("/batch", response_model=BatchResponse[RestaurantWithBusiness])
+def read_restaurants_batch(
+    db: Session = Depends(deps.get_db),
+    ids: List[int] = Depends(deps.get_batch_ids),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> BatchResponse[RestaurantWithBusiness]:
+    """
+    Get several restaurants by ID.
+    """
+    return _read_restaurants_batch(db, ids)
+
+
+@router.post("/batch", response_model=BatchResponse[RestaurantWithBusiness])
+def read_restaurants_batch_post(
+    *,
+    db: Session = Depends(deps.get_db),
+    batch_in: BatchRequest,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> BatchResponse[RestaurantWithBusiness]:
+    """
+    Get several restaurants by ID, with the IDs sent in the request body.
+    """
+    return _read_restaurants_batch(db, deps.check_batch_ids(batch_in.ids))
+
+
+@router.get("/sync", response_model=SyncPage[RestaurantSchema])
+def sync_restaurants(
+    db: Session = Depends(deps.get_db),
+    since: int = Query(0, ge=0, description="Sync token (next_since) from the previous page"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> SyncPage[RestaurantSchema]:
+    """
+    Restaurants created, updated or deleted since the given sync token.
+    """
+    return sync_page(db, Restaurant, since, limit, selectinload(Restaurant.menu_files))
+
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+def bulk_update_restaurants(
+    *,
+    db: Session = Depends(deps.get_db),
+    bulk_in: BulkUpdateRequest,
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> BulkUpdateResult:
+    """
+    Update many restaurants in one transaction, either per item or by filter.
+    """
+    return apply_bulk_update(db, Restaurant, RestaurantUpdate, bulk_in)
+
+
+@router.get(
+    "/{restaurant_id}",
+    response_model=RestaurantWithBusiness,
+    dependencies=[Depends(conditional_get("restaurants", "restaurant_menus", "businesses", "members"))]
+)
 def read_restaurant(
     *,
     db: Session = Depends(deps.get_db),
     restaurant_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> RestaurantWithBusiness:
     """
     Get restaurant by ID.
     """
-    restaurant = db.query(Restaurant).options(
-        joinedload(Restaurant.business).joinedload(Business.owner),
-        joinedload(Restaurant.menu_files)
-    ).filter(Restaurant.id == restaurant_id).first()
+    selected = parse_fields(fields, RestaurantWithBusiness)
+    if selected:
+        options = _restaurant_load_options(selected)
+    else:
+        options = [
+            joinedload(Restaurant.business).joinedload(Business.owner),
+            joinedload(Restaurant.menu_files)
+        ]
+    restaurant = db.query(Restaurant).options(*options).filter(
+        Restaurant.id == restaurant_id
+    ).first()
     
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
     
-    rest_dict = {
-        "id": restaurant.id,
-        "name": restaurant.name,
-        "address": restaurant.address,
-        "parish": restaurant.parish,
-        "phone": restaurant.phone,
-        "email": restaurant.email,
-        "website": restaurant.website,
-        "is_halal_certified": restaurant.is_halal_certified,
-        "has_halal_options": restaurant.has_halal_options,
-        "has_vegetarian_options": restaurant.has_vegetarian_options,
-        "has_vegan_options": restaurant.has_vegan_options,
-        "cuisine_types": restaurant.cuisine_types,
-        "opening_hours": restaurant.opening_hours,
-        "description": restaurant.description,
-        "business_id": restaurant.business_id,
-        "created_at": restaurant.created_at,
-        "updated_at": restaurant.updated_at,
-        "menu_files": restaurant.menu_files,
-        "business_name": restaurant.business.name if restaurant.business else None,
-        "owner_name": restaurant.business.owner.legal_name if restaurant.business and restaurant.business.owner else None
-    }
+    if selected:
+        return sparse_response(RestaurantWithBusiness, selected, restaurant, **BUSINESS_FIELDS)
     
-    return RestaurantWithBusiness(**rest_dict)
+    return _restaurant_with_business(restaurant)
 
 
 @router.put("/{restaurant_id}", response_model=RestaurantSchema)
@@ -0,0 +1,32 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app import models
+from app.api import deps
+from app.db.base import get_db
+from app.schemas.typeahead import TypeaheadMatch
+from app.services.typeahead import INDEXED, get_index
+
+router = APIRouter()
+
+
+@router.get("/typeahead", response_model=List[TypeaheadMatch])
+def typeahead(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: Optional[List[str]] = Query(None, alias="type", description="member, business or masjid; repeat for several"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> List[TypeaheadMatch]:
+    """
+    Members (by Muslim or legal name), businesses and masjids whose name
+    starts with ``q``, or has words starting with each word of ``q``, for
+    pickers that search as the user types. Served from an in-memory index;
+    ``detail`` is a member's legal name, a business's category or a
+    masjid's parish.
+    """
+    unknown = set(types or ()) - set(INDEXED)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown type: {', '.join(sorted(unknown))}")
+    return get_index(db).search(q, types, limit)
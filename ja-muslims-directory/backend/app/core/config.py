@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "JA Muslims Directory"
@@ -7,12 +7,118 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     
     DATABASE_URL: str = "sqlite:///./ja_muslims.db"
+    # Read replicas for GET requests, as a JSON list of URLs
+    DATABASE_REPLICA_URLS: List[str] = []
+    # Clients read from the primary for this long after a write
+    REPLICA_STICKY_SECONDS: int = 10
+    REPLICA_CHECK_INTERVAL_SECONDS: int = 5
+    REPLICA_MAX_LAG_SECONDS: int = 30
+    
+    # Communities served by this deployment, as JSON {slug: {"name", "database_url",
+    # "replica_urls", "schema", "hosts"}}; empty means one tenant from the settings above
+    # (see app/core/tenancy.py)
+    TENANTS: Dict[str, Dict[str, Any]] = {}
+    DEFAULT_TENANT: str = "default"
+    
+    # SQLite write coordination (see app/db/sqlite.py)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_BUSY_TIMEOUT_SECONDS: float = 5.0
+    SQLITE_BEGIN_IMMEDIATE: bool = True
+    SQLITE_WRITE_RETRIES: int = 5
+    # Funnel create endpoints through one writer thread per process with group commit
+    SQLITE_WRITER_QUEUE: bool = False
+    WRITER_MAX_BATCH: int = 64
+    WRITER_MAX_WAIT_MS: int = 2
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # A just-rotated refresh token presented again within this window (e.g. two
+    # tabs refreshing at once) is refused without revoking its family
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 10
+    # Revoked access tokens are checked in memory (see app/core/revocation.py)
+    REVOCATION_BLOOM_CAPACITY: int = 100_000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    # How often each worker picks up revocations made by the others
+    REVOCATION_SYNC_SECONDS: float = 2.0
     
     REDIS_URL: Optional[str] = None
     
+    # Admission control (see app/api/admission.py)
+    RATE_LIMIT_ENABLED: bool = True
+    # "memory" (per worker) or "redis" (shared through REDIS_URL)
+    RATE_LIMIT_BACKEND: str = "memory"
+    # Route class -> [requests per minute, burst], per signed-in user or per IP
+    RATE_LIMITS: Dict[str, List[float]] = {"login": [10, 5], "analytics": [60, 10], "default": [1200, 200]}
+    # Route class -> [running at once, waiting in line], per worker
+    CONCURRENCY_LIMITS: Dict[str, List[int]] = {"analytics": [2, 16]}
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    
+    # Idempotency-Key support for create endpoints (see app/api/idempotency.py)
+    IDEMPOTENCY_ENABLED: bool = True
+    # "memory" (per worker) or "redis" (shared through REDIS_URL)
+    IDEMPOTENCY_BACKEND: str = "memory"
+    # How long a key's response is replayed to retries
+    IDEMPOTENCY_TTL_SECONDS: int = 86_400
+    # A key claimed by a request that never finished (a killed worker) is freed after this
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0
+    # How long a retry waits for the request it repeats before getting 409
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0
+    
+    # Batch fetch-by-IDs endpoints
+    BATCH_MAX_IDS: int = 500
+    BATCH_CHUNK_SIZE: int = 200
+    
+    # Delta sync: tombstones older than this are purged by `python -m app.db.sync` (see app/db/sync.py)
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 90
+    
+    # Duplicate member detection: pairs scoring at least this are reported
+    DEDUPE_THRESHOLD: float = 0.6
+    
+    # Static public directory listings (see app/services/directory_snapshots.py)
+    SNAPSHOTS_ENABLED: bool = True
+    SNAPSHOT_DIR: str = "snapshots"
+    SNAPSHOT_DEBOUNCE_SECONDS: float = 2.0
+    SNAPSHOT_KEEP_VERSIONS: int = 3
+    
+    # Generated community reports (see app/services/reports.py)
+    REPORT_DIR: str = "reports"
+    REPORT_WORKERS: int = 1
+    # Run the schedule below in this process; enable it on exactly one process of the deployment
+    REPORT_SCHEDULER_ENABLED: bool = False
+    # "name:format" entries requested for the current year every REPORT_SCHEDULE_SECONDS (0 disables)
+    REPORT_SCHEDULE: List[str] = ["annual:pdf", "annual:xlsx"]
+    REPORT_SCHEDULE_SECONDS: float = 3600.0
+    
+    # Archival of deceased members and inactive businesses (see app/services/archive.py)
+    ARCHIVE_DECEASED_AFTER_DAYS: int = 365
+    ARCHIVE_INACTIVE_BUSINESS_AFTER_DAYS: int = 730
+    
+    # Audit trail of writes, written in batches by a background thread (see app/db/audit.py)
+    AUDIT_ENABLED: bool = True
+    AUDIT_QUEUE_SIZE: int = 10_000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_MS: int = 200
+    # How long a commit waits for room in a full queue before writing its entries itself
+    AUDIT_ENQUEUE_TIMEOUT_SECONDS: float = 1.0
+    
+    # Logging through a background thread (see app/core/logs.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # or "text"
+    LOG_QUEUE_SIZE: int = 10_000
+    # Per logger and message, per second: records kept in full, then the fraction of the rest kept
+    LOG_SAMPLE_BURST: int = 20
+    LOG_SAMPLE_RATE: float = 0.01
+    LOG_REDACT_FIELDS: List[str] = [
+        "password", "hashed_password", "token", "access_token", "refresh_token", "authorization",
+        "email", "phone_number", "date_of_birth", "present_address", "permanent_address", "salary", "body",
+    ]
+    
+    # Import each API router on its first request instead of at startup
+    LAZY_ROUTERS: bool = True
+    # Log startup phase timings after the first response (see app/core/startup.py)
+    PROFILE_STARTUP: bool = False
+    
     FIRST_SUPERUSER_EMAIL: str = "admin@jamuslims.com"
     FIRST_SUPERUSER_PASSWORD: str = "changeme"
     
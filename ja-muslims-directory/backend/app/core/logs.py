@@ -0,0 +1,244 @@
+"""
+Non-blocking structured logging.
+
+``configure_logging`` gives the root logger a single ``QueueHandler``. A
+request thread only samples the record, stamps it with the request id and
+tenant and puts it on a bounded in-memory queue; it never formats, never
+writes and never waits. A ``QueueListener`` thread formats records (JSON
+lines, or text with ``LOG_FORMAT=text``), redacts them and writes them to
+stderr. If the queue is full the record is dropped and counted rather than
+stalling the request.
+
+- Request ids: ``RequestIdMiddleware`` takes ``X-Request-ID`` from the
+  request (or makes one up), returns it on the response and keeps it in a
+  context variable that every record logged while handling the request
+  carries.
+- Sampling: warnings and below are rate limited per logger and message
+  template. The first ``LOG_SAMPLE_BURST`` records of a template in a second
+  are kept, after that only a ``LOG_SAMPLE_RATE`` fraction (marked with
+  ``sample_rate``). A flood of identical validation errors costs a few lines
+  per second. Errors are never sampled.
+- Redaction: values of fields named in ``LOG_REDACT_FIELDS`` are replaced,
+  at any depth of the structured ``extra`` data, and e-mail addresses, phone
+  numbers and bearer tokens are masked in messages.
+
+Log structured data through ``extra``, e.g.
+``logger.info("Member updated", extra={"member_id": 1, "fields": ["notes"]})``.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+from app.core.config import settings
+from app.core.tenancy import current_tenant
+
+REQUEST_ID_HEADER = "x-request-id"
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+REDACTED = "[redacted]"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_MESSAGE_SCRUBBERS = (
+    (re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"), "[email]"),
+    (re.compile(r"(?i)bearer\s+[A-Za-z0-9._~+/=-]+"), "Bearer [token]"),
+    (re.compile(r"(?<!\w)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]\d{4}(?!\w)"), "[phone]"),
+)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """Give each request an id, returned as ``X-Request-ID`` and carried by its log records."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_with_id(message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep ``burst`` records per logger and message template a second, then a ``rate`` fraction of the rest."""
+
+    def __init__(self, burst: int, rate: float) -> None:
+        super().__init__()
+        self.burst = burst
+        self.rate = rate
+        self._windows: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, str(record.msg))
+        second = int(time.monotonic())
+        with self._lock:
+            window, count = self._windows.get(key, (second, 0))
+            if window != second:
+                window, count = second, 0
+                if len(self._windows) > 10_000:
+                    self._windows.clear()
+            self._windows[key] = (window, count + 1)
+        if count < self.burst:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        return False
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Freeze the message (its arguments may change later) and add the
+        # request context; formatting and redaction happen on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.request_id = _request_id.get()
+        record.tenant = current_tenant().slug
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _redact(value: Any, fields: frozenset) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in fields else _redact(item, fields)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact(item, fields) for item in value]
+    return value
+
+
+def scrub_message(message: str) -> str:
+    for pattern, replacement in _MESSAGE_SCRUBBERS:
+        message = pattern.sub(replacement, message)
+    return message
+
+
+def _extras(record: logging.LogRecord, fields: frozenset) -> Dict[str, Any]:
+    return {
+        key: REDACTED if key.lower() in fields else _redact(value, fields)
+        for key, value in vars(record).items()
+        if key not in _RECORD_ATTRIBUTES and key not in ("request_id", "tenant")
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redact_fields) -> None:
+        super().__init__()
+        self.redact_fields = frozenset(field.lower() for field in redact_fields)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": scrub_message(record.getMessage()),
+            "request_id": getattr(record, "request_id", None),
+            "tenant": getattr(record, "tenant", None),
+            **_extras(record, self.redact_fields),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(JsonFormatter):
+    def format(self, record: logging.LogRecord) -> str:
+        extras = _extras(record, self.redact_fields)
+        line = (
+            f"{datetime.fromtimestamp(record.created).isoformat(sep=' ', timespec='milliseconds')} "
+            f"{record.levelname:<7} [{getattr(record, 'request_id', None) or '-'}] {record.name}: "
+            f"{scrub_message(record.getMessage())}"
+        )
+        if extras:
+            line += " " + json.dumps(extras, default=str)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[_NonBlockingQueueHandler] = None
+
+
+def configure_logging(stream=None) -> None:
+    """Route the root logger through the queue to ``stream`` (stderr); safe to call more than once."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stderr)
+    formatter = TextFormatter if settings.LOG_FORMAT == "text" else JsonFormatter
+    output.setFormatter(formatter(settings.LOG_REDACT_FIELDS))
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = _NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_BURST, settings.LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out whatever is still queued and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
@@ -0,0 +1,68 @@
+"""
+Minimal publish/subscribe used to push server-side events to clients.
+
+``InProcessBroker`` fans messages out to subscribers in this process only.
+When ``REDIS_URL`` is configured, ``RedisBroker`` relays them through Redis
+pub/sub so every uvicorn worker sees writes made by the others.
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Set, Tuple
+from app.core.config import settings
+
+
+class InProcessBroker:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(self, channel: str, message: dict) -> None:
+        """Thread-safe; may be called from sync request handlers."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[dict]:
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(entry)
+        try:
+            while True:
+                yield await entry[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(entry)
+
+
+class RedisBroker:
+    def __init__(self, url: str) -> None:
+        import redis
+        self._url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel: str, message: dict) -> None:
+        self._client.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel: str) -> AsyncIterator[dict]:
+        import redis.asyncio
+        client = redis.asyncio.Redis.from_url(self._url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for raw in pubsub.listen():
+                if raw["type"] == "message":
+                    yield json.loads(raw["data"])
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+            await client.close()
+
+
+@lru_cache()
+def get_broker():
+    if settings.REDIS_URL:
+        return RedisBroker(settings.REDIS_URL)
+    return InProcessBroker()
@@ -0,0 +1,207 @@
+"""
+Access token revocation without I/O on the request path.
+
+Access tokens carry a ``jti``. ``revoke_access_token`` stores the revoked jti
+in ``revoked_tokens`` until the token's own expiry. It then announces the
+revocation on Redis (when ``REDIS_URL`` is set) and adds it to this
+process's ``RevocationList``.
+
+``RevocationList`` is a Bloom filter with an exact dict behind it. The
+common case, a token that was never revoked, is answered by the Bloom filter
+alone. Only a Bloom hit, which is a real revocation or a rare false positive,
+looks at the dict. Each worker keeps its list in sync on a background
+thread. Every ``REVOCATION_SYNC_SECONDS`` the thread reads new
+``revoked_tokens`` rows by ``seq`` from each tenant database the worker has
+opened, which is the local stand-in for Redis. With Redis, the thread also
+applies announcements as they arrive. Expired entries are pruned and the
+filter is rebuilt from what is left, because a Bloom filter cannot forget a
+key.
+"""
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.pubsub import get_broker
+from app.core.tenancy import current_tenant
+from app.db.tenants import TenantDatabase, get_database, open_databases
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "token-revocations"
+
+_table = RevokedToken.__table__
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        # jti -> expiry (unix time)
+        self._revoked: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+        expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    def add(self, jti: str, expires: float) -> None:
+        with self._lock:
+            self._revoked[jti] = expires
+            if len(self._revoked) > self._bloom.capacity:
+                # Past capacity the false positive rate climbs; start over with room to grow
+                self._rebuild(2 * len(self._revoked))
+            else:
+                self._bloom.add(jti)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [jti for jti, expires in self._revoked.items() if expires <= now]
+            for jti in expired:
+                del self._revoked[jti]
+            if expired:
+                self._rebuild(self._bloom.capacity)
+        return len(expired)
+
+    def _rebuild(self, capacity: int) -> None:
+        bloom = BloomFilter(max(capacity, settings.REVOCATION_BLOOM_CAPACITY), self.error_rate)
+        for jti in self._revoked:
+            bloom.add(jti)
+        # Swapped in whole, so lock-free readers see either the old or the new filter
+        self._bloom = bloom
+
+
+revocation_list = RevocationList(settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_ERROR_RATE)
+
+
+def revoke_access_token(db: Session, jti: str, expires: float) -> None:
+    """Revoke the access token ``jti`` (expiring at unix time ``expires``) and commit."""
+    now = datetime.utcnow()
+    # Expired rows are never needed again; the revoking request clears them out
+    db.execute(delete(_table).where(_table.c.expires_at < now))
+    if db.execute(select(_table.c.seq).where(_table.c.jti == jti)).first() is None:
+        db.execute(insert(_table).values(jti=jti, expires_at=datetime.utcfromtimestamp(expires)))
+    db.commit()
+    revocation_list.add(jti, expires)
+    if settings.REDIS_URL:
+        get_broker().publish(REVOCATION_CHANNEL, {"jti": jti, "exp": expires})
+
+
+class RevocationSync:
+    """Background thread that keeps ``revocation_list`` in step with the other workers."""
+
+    def __init__(self, revocations: RevocationList, interval: float) -> None:
+        self.revocations = revocations
+        self.interval = interval
+        # tenant -> newest revoked_tokens.seq seen in its database
+        self._last_seq: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        tenant = current_tenant().slug
+        if tenant not in self._last_seq:
+            # Load what the tenant has already revoked before its first token is checked
+            self._poll_database(get_database(tenant))
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="token-revocations", daemon=True)
+                    self._thread.start()
+
+    def _poll(self) -> None:
+        for database in open_databases():
+            self._poll_database(database)
+
+    def _poll_database(self, database: TenantDatabase) -> None:
+        tenant = database.tenant.slug
+        with self._poll_lock:
+            with database.engine.connect() as connection:
+                rows = connection.execute(
+                    select(_table.c.seq, _table.c.jti, _table.c.expires_at)
+                    .where(_table.c.seq > self._last_seq.get(tenant, 0), _table.c.expires_at > datetime.utcnow())
+                    .order_by(_table.c.seq)
+                ).all()
+            # jtis are random, so one list serves every tenant
+            for seq, jti, expires_at in rows:
+                self.revocations.add(jti, _unix(expires_at))
+                self._last_seq[tenant] = seq
+            self._last_seq.setdefault(tenant, 0)
+
+    def _run(self) -> None:
+        pubsub = None
+        while True:
+            try:
+                if settings.REDIS_URL and pubsub is None:
+                    import redis
+                    pubsub = redis.Redis.from_url(settings.REDIS_URL).pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(REVOCATION_CHANNEL)
+                self._poll()
+                self.revocations.prune()
+                self._wait(pubsub)
+            except Exception:
+                logger.exception("Token revocation sync failed")
+                pubsub = None
+                time.sleep(self.interval)
+
+    def _wait(self, pubsub) -> None:
+        if pubsub is None:
+            time.sleep(self.interval)
+            return
+        deadline = time.monotonic() + self.interval
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = pubsub.get_message(timeout=remaining)
+            if message is not None:
+                data = json.loads(message["data"])
+                self.revocations.add(data["jti"], data["exp"])
+
+
+def _unix(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+revocation_sync = RevocationSync(revocation_list, settings.REVOCATION_SYNC_SECONDS)
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    """In-memory check for ``deps.get_current_user``; tokens without a jti cannot be revoked."""
+    if jti is None:
+        return False
+    revocation_sync.ensure_started()
+    return revocation_list.is_revoked(jti)
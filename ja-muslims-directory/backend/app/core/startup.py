@@ -0,0 +1,121 @@
+"""
+Startup profiling.
+
+``phase(name)`` times a block of startup work such as importing a group of
+modules or loading a router. With ``PROFILE_STARTUP`` enabled, the phases are
+logged once the first request has been answered. The log also gives the time
+to that first request, measured from when ``app.main`` started importing.
+
+``python -m app.core.startup --profile-startup`` starts the app in fresh
+interpreters, with lazy and with eager router loading. It sends the first
+request to each router and prints the phases side by side.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_started = time.perf_counter()
+phases: List[Tuple[str, float]] = []
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.append((name, time.perf_counter() - start))
+
+
+def format_phases() -> str:
+    return "\n".join(f"  {name:<48} {seconds * 1000:>9.1f} ms" for name, seconds in phases)
+
+
+class FirstRequestTimer:
+    """Record the time to the first completed response and log the startup phases."""
+
+    def __init__(self, app, enabled: bool) -> None:
+        self.app = app
+        self.enabled = enabled
+        self.done = False
+
+    async def __call__(self, scope, receive, send) -> None:
+        if self.done or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_time(message) -> None:
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body") and not self.done:
+                self.done = True
+                phases.append(("time to first response", time.perf_counter() - _started))
+                if self.enabled:
+                    logger.warning("Startup phases:\n%s", format_phases())
+
+        await self.app(scope, receive, send_and_time)
+
+
+def _measure_child() -> None:
+    """Run in a fresh interpreter: import the app, request every router once, print phases as JSON."""
+    # Run as ``-m``, this file is ``__main__``; the app records into the ``app.core.startup`` module
+    from app.core import startup
+
+    with startup.phase("import app.main"):
+        from app.main import app
+    from fastapi.testclient import TestClient
+    from app.api.v1.api import ROUTERS
+    from app.core.config import settings
+
+    client = TestClient(app)
+    for _, prefix, _ in ROUTERS:
+        with startup.phase(f"first request {prefix}/"):
+            # Unauthenticated: enough to route the request (and load its router)
+            client.get(f"{settings.API_V1_STR}{prefix}/")
+    print(json.dumps(startup.phases))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profile application startup.")
+    parser.add_argument("--profile-startup", action="store_true", required=True)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    if args.child:
+        _measure_child()
+        return
+
+    workdir = tempfile.mkdtemp()
+    results = {}
+    for mode, lazy in (("eager", "false"), ("lazy", "true")):
+        runs: Dict[str, List[float]] = {}
+        for _ in range(args.runs):
+            env = {**os.environ, "LAZY_ROUTERS": lazy, "DATABASE_URL": f"sqlite:///{workdir}/startup.db"}
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, "-m", "app.core.startup", "--profile-startup", "--child"],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            runs.setdefault("process total (incl. interpreter)", []).append(time.perf_counter() - start)
+            for name, seconds in json.loads(output.strip().splitlines()[-1]):
+                runs.setdefault(name, []).append(seconds)
+        results[mode] = {name: statistics.median(samples) for name, samples in runs.items()}
+
+    print(f"median of {args.runs} runs")
+    print(f"{'phase':<48} {'eager ms':>10} {'lazy ms':>10}")
+    for name in results["eager"]:
+        eager = results["eager"][name] * 1000
+        lazy = results["lazy"].get(name, 0.0) * 1000
+        print(f"{name:<48} {eager:>10.1f} {lazy:>10.1f}")
+
+if __name__ == "__main__":
+    main()
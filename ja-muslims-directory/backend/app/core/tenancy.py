@@ -0,0 +1,144 @@
+"""
+Tenants: the communities served by one deployment.
+
+``TENANTS`` maps a tenant slug to its settings, for example:
+
+    {
+        "jamaica": {"name": "JA Muslims Directory", "hosts": ["jamaica.example.org"],
+                    "database_url": "sqlite:///./tenants/jamaica.db"},
+        "trinidad": {"name": "TT Muslims Directory", "hosts": ["tt.example.org"],
+                     "database_url": "postgresql://db.internal/directory", "schema": "trinidad"},
+    }
+
+Every tenant has its own database (a SQLite file, or a Postgres schema with
+its own pool), optionally with ``replica_urls``. A tenant's data never shares
+a table, a lock or a connection pool with another tenant. It can be moved to
+another node by copying its database and pointing ``database_url`` (and the
+load balancer's host mapping) at the new place (see ``app.db.tenants``).
+
+When ``TENANTS`` is empty there is a single tenant, ``DEFAULT_TENANT``, built
+from ``DATABASE_URL``, ``DATABASE_REPLICA_URLS`` and ``PROJECT_NAME``. Keys,
+paths and channels are then left exactly as they were before tenancy.
+
+``TenantMiddleware`` resolves the tenant of each request from the
+``X-Tenant`` header or the Host name, falling back to ``DEFAULT_TENANT``, and
+keeps it in a context variable for the rest of the request. Work outside a
+request (worker threads, timers, scripts) runs under ``use_tenant``.
+Per-process caches, queues and files are keyed with ``tenant_scoped`` and
+``tenant_path``.
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from app.core.config import settings
+
+TENANT_HEADER = "x-tenant"
+
+
+class Tenant:
+    def __init__(
+        self,
+        slug: str,
+        name: str,
+        database_url: str,
+        replica_urls: Optional[List[str]] = None,
+        schema: Optional[str] = None,
+        hosts: Optional[List[str]] = None,
+    ) -> None:
+        self.slug = slug
+        self.name = name
+        self.database_url = database_url
+        self.replica_urls = list(replica_urls or [])
+        self.schema = schema
+        self.hosts = [host.lower() for host in hosts or []]
+
+
+def _load_tenants() -> Dict[str, Tenant]:
+    if not settings.TENANTS:
+        return {settings.DEFAULT_TENANT: Tenant(
+            settings.DEFAULT_TENANT,
+            settings.PROJECT_NAME,
+            settings.DATABASE_URL,
+            settings.DATABASE_REPLICA_URLS,
+        )}
+    tenants = {
+        slug: Tenant(
+            slug,
+            config.get("name", slug),
+            config["database_url"],
+            config.get("replica_urls"),
+            config.get("schema"),
+            config.get("hosts"),
+        )
+        for slug, config in settings.TENANTS.items()
+    }
+    if settings.DEFAULT_TENANT not in tenants:
+        raise ValueError(f"DEFAULT_TENANT {settings.DEFAULT_TENANT!r} is not one of TENANTS")
+    return tenants
+
+
+tenants = _load_tenants()
+_hosts = {host: tenant for tenant in tenants.values() for host in tenant.hosts}
+
+_current: ContextVar[str] = ContextVar("tenant", default=settings.DEFAULT_TENANT)
+
+
+def is_multi_tenant() -> bool:
+    return bool(settings.TENANTS)
+
+
+def current_tenant() -> Tenant:
+    return tenants[_current.get()]
+
+
+@contextmanager
+def use_tenant(slug: str) -> Iterator[Tenant]:
+    """Run the block as ``slug``, e.g. on a worker thread that serves several tenants."""
+    token = _current.set(tenants[slug].slug)
+    try:
+        yield tenants[slug]
+    finally:
+        _current.reset(token)
+
+
+def tenant_scoped(key: str) -> str:
+    """``key`` made unique to the current tenant, for caches, buckets and channels shared by a process."""
+    return f"{_current.get()}:{key}" if is_multi_tenant() else key
+
+
+def tenant_path(root: str) -> str:
+    """The current tenant's directory under ``root``."""
+    return os.path.join(root, _current.get()) if is_multi_tenant() else root
+
+
+def resolve_tenant(headers: Headers) -> Optional[Tenant]:
+    """The tenant a request is for; None if it names one that does not exist."""
+    slug = headers.get(TENANT_HEADER)
+    if slug:
+        return tenants.get(slug)
+    host = headers.get("host", "").split(":")[0].lower()
+    return _hosts.get(host, tenants[settings.DEFAULT_TENANT])
+
+
+class TenantMiddleware:
+    """Set the current tenant for everything that handles the request, including other middleware."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        tenant = resolve_tenant(Headers(scope=scope))
+        if tenant is None:
+            await JSONResponse(status_code=404, content={"detail": "Unknown tenant"})(scope, receive, send)
+            return
+        token = _current.set(tenant.slug)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
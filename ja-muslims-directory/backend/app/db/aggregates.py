@@ -0,0 +1,97 @@
+"""
+Incrementally maintained count tables.
+
+An aggregate table has a composite primary key and a ``count`` column. Its
+maintainer computes what a set of source rows contributes, as a ``Counter``
+keyed by primary key tuples (in column order), once before a write and once
+after. ``apply_count_delta`` then adds the difference. Rows whose count drops
+to zero are deleted, so the table only ever holds non-empty cells.
+
+A negative delta for a cell that does not exist (a write that falls in a
+period the table has not been rebuilt for yet) is logged and dropped rather
+than stored as a negative count; the next rebuild gets the cell right.
+"""
+import logging
+from collections import Counter
+from typing import Callable, Iterable, List, Optional
+from sqlalchemy import Table, and_, delete, insert, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def id_chunks(ids: Optional[Iterable[int]]) -> Iterable[Optional[List[int]]]:
+    """``ids`` in ``BATCH_CHUNK_SIZE`` slices for ``IN`` clauses; None (all rows) passes through."""
+    if ids is None:
+        yield None
+        return
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), settings.BATCH_CHUNK_SIZE):
+        yield ids[start:start + settings.BATCH_CHUNK_SIZE]
+
+
+def apply_count_delta(connection: Connection, table: Table, before: Counter, after: Counter) -> int:
+    """Add ``after - before`` to the counts in ``table``; returns the number of cells changed."""
+    key_columns = list(table.primary_key.columns)
+    changed = 0
+    for key in sorted(set(before) | set(after)):
+        delta = after[key] - before[key]
+        if not delta:
+            continue
+        changed += 1
+        clause = and_(*(column == value for column, value in zip(key_columns, key)))
+        if _add(connection, table, clause, delta):
+            if delta < 0:
+                connection.execute(delete(table).where(clause, table.c.count <= 0))
+        elif delta < 0:
+            logger.warning("No %s cell %r to subtract %d from; left for the next rebuild", table.name, key, -delta)
+        else:
+            try:
+                # In a savepoint: on Postgres a failed INSERT would abort the whole transaction
+                with connection.begin_nested():
+                    connection.execute(insert(table).values(
+                        count=delta, **{column.name: value for column, value in zip(key_columns, key)}
+                    ))
+            except IntegrityError:
+                # Another worker inserted the cell first
+                _add(connection, table, clause, delta)
+    return changed
+
+
+def _add(connection: Connection, table: Table, clause, delta: int) -> bool:
+    """Add ``delta`` to the cell matching ``clause``; False if there is none."""
+    return connection.execute(update(table).where(clause).values(count=table.c.count + delta)).rowcount > 0
+
+
+def replace_counts(connection: Connection, table: Table, counts: Counter) -> int:
+    """Replace the whole of ``table`` with ``counts``; returns the number of cells."""
+    names = [column.name for column in table.primary_key.columns]
+    connection.execute(delete(table))
+    rows = [{**dict(zip(names, key)), "count": count} for key, count in sorted(counts.items()) if count]
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+class BulkAggregateUpdate:
+    """
+    ``before``/``after`` hooks for ``apply_bulk_update``, which bypasses flush.
+
+    ``contributions(connection, ids)`` computes what the updated rows add to
+    ``table``.
+    """
+
+    def __init__(self, table: Table, contributions: Callable[[Connection, Iterable[int]], Counter]) -> None:
+        self.table = table
+        self.contributions = contributions
+        self._before: Counter = Counter()
+
+    def before(self, db: Session, ids: List[int]) -> None:
+        self._before = self.contributions(db.connection(), ids)
+
+    def after(self, db: Session, ids: List[int]) -> None:
+        connection = db.connection()
+        apply_count_delta(connection, self.table, self._before, self.contributions(connection, ids))
@@ -0,0 +1,240 @@
+"""
+Audit trail of writes, recorded off the request path.
+
+An ``after_flush`` listener turns every insert, update and delete of a row in
+``AUDITED_TABLES`` into an ``audit_log`` entry with its before/after values
+(see ``app.models.audit_entry``). Writes that bypass flush (bulk updates,
+archival moves) add their entries with ``record_audit``. The user is the one
+``get_current_user`` authenticated on the session, under ``AUDIT_USER``.
+
+Entries wait on the session until its transaction commits, and are dropped
+if it (or the savepoint they were recorded in) rolls back. Committed entries
+go to a bounded in-process queue. One background thread writes them in
+batches of up to ``AUDIT_BATCH_SIZE``, waiting at most ``AUDIT_FLUSH_MS`` for
+a batch to fill, so a request pays for queueing the entries and never for
+inserting them. When the queue is full a committing thread waits up to
+``AUDIT_ENQUEUE_TIMEOUT_SECONDS`` for room, slowing writers down to the rate
+the audit writer keeps up with. Past that it writes its remaining entries
+itself, so nothing is lost under sustained overload.
+
+Entries reach ``audit_log`` within ``AUDIT_FLUSH_MS`` of the commit, or when
+the process exits; ``flush_audit_log`` waits for the queue to drain.
+"""
+import atexit
+import enum
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.tenancy import current_tenant
+from app.db.tenants import get_database
+from app.models.audit_entry import AuditEntry
+
+logger = logging.getLogger(__name__)
+
+_table = AuditEntry.__table__
+
+AUDITED_TABLES = {
+    "users", "members", "life_events", "educations", "businesses", "restaurants", "restaurant_menus", "masjids",
+}
+# Recorded as changed, without their values
+REDACTED_FIELDS = {"hashed_password"}
+REDACTED = "[redacted]"
+
+# Session.info key of the authenticated user's id
+AUDIT_USER = "audit_user_id"
+_PENDING = "audit_pending"
+
+
+def _plain(value: Any) -> Any:
+    """``value`` as JSON: enum values, ISO dates, floats for decimals."""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def audit_change(field: str, before: Any, after: Any) -> List[Any]:
+    """The ``[before, after]`` pair recorded for ``field``."""
+    if field in REDACTED_FIELDS:
+        return [REDACTED, REDACTED]
+    return [_plain(before), _plain(after)]
+
+
+def record_audit(session: Session, entries: Iterable[Tuple[str, int, str, Dict[str, List[Any]]]]) -> None:
+    """Add ``(table_name, row_id, action, changes)`` entries, written once the session commits."""
+    user_id = session.info.get(AUDIT_USER)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "table_name": table_name,
+            "row_id": row_id,
+            "action": action,
+            "changes": json.dumps(changes, default=str),
+            "user_id": user_id,
+            "changed_at": now,
+        }
+        for table_name, row_id, action, changes in entries
+    ]
+    if rows:
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        session.info.setdefault(_PENDING, []).append((transaction, rows))
+
+
+def _row_entry(obj: Any, action: str) -> Optional[Tuple[str, int, str, Dict[str, List[Any]]]]:
+    state = inspect(obj)
+    table_name = state.mapper.local_table.name
+    if table_name not in AUDITED_TABLES:
+        return None
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if action == "update":
+            history = state.attrs[key].history
+            if history.has_changes():
+                before = history.deleted[0] if history.deleted else None
+                after = history.added[0] if history.added else None
+                if before != after or key in REDACTED_FIELDS:
+                    changes[key] = audit_change(key, before, after)
+        # Only what is loaded: reading expired columns here would query mid-flush
+        elif key in state.dict and state.dict[key] is not None:
+            value = state.dict[key]
+            changes[key] = audit_change(key, None, value) if action == "insert" else audit_change(key, value, None)
+    if action == "update" and not changes:
+        return None
+    return table_name, state.mapper.primary_key_from_instance(obj)[0], action, changes
+
+
+@event.listens_for(Session, "after_flush")
+def _audit_after_flush(session: Session, flush_context) -> None:
+    if not settings.AUDIT_ENABLED:
+        return
+    entries = [_row_entry(obj, "insert") for obj in session.new]
+    entries += [_row_entry(obj, "update") for obj in session.dirty if session.is_modified(obj)]
+    entries += [_row_entry(obj, "delete") for obj in session.deleted]
+    record_audit(session, [entry for entry in entries if entry is not None])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session: Session, previous_transaction) -> None:
+    pending = session.info.get(_PENDING)
+    if not pending:
+        return
+
+    def rolled_back(transaction) -> bool:
+        while transaction is not None:
+            if transaction is previous_transaction:
+                return True
+            transaction = transaction.parent
+        return False
+
+    session.info[_PENDING] = [(transaction, rows) for transaction, rows in pending if not rolled_back(transaction)]
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        # The data is committed; failing to queue its audit entries must not turn that into an error
+        try:
+            audit_log.enqueue(current_tenant().slug, [row for _, rows in pending for row in rows])
+        except Exception:
+            logger.exception("Queueing audit entries failed")
+
+
+class AuditLog:
+    def __init__(self, max_queue: int, max_batch: int, max_wait: float) -> None:
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[str, dict]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"queued": 0, "written": 0, "written_inline": 0, "failed": 0}
+
+    def enqueue(self, tenant: str, rows: List[dict]) -> None:
+        self._ensure_started()
+        for index, row in enumerate(rows):
+            try:
+                self._queue.put((tenant, row), timeout=settings.AUDIT_ENQUEUE_TIMEOUT_SECONDS)
+            except queue.Full:
+                logger.warning("Audit queue full; writing %d entries inline", len(rows) - index)
+                self._write(tenant, rows[index:])
+                self.stats["written_inline"] += len(rows) - index
+                return
+            self.stats["queued"] += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued entry has been written; False if ``timeout`` ran out first."""
+        if self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self) -> List[Tuple[str, dict]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            by_tenant: Dict[str, List[dict]] = {}
+            for tenant, row in batch:
+                by_tenant.setdefault(tenant, []).append(row)
+            for tenant, rows in by_tenant.items():
+                try:
+                    self._write(tenant, rows)
+                    self.stats["written"] += len(rows)
+                except Exception:
+                    self.stats["failed"] += len(rows)
+                    logger.exception("Writing %d audit entries for %s failed", len(rows), tenant)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, tenant: str, rows: List[dict]) -> None:
+        with get_database(tenant).engine.begin() as connection:
+            connection.execute(insert(_table), rows)
+
+
+audit_log = AuditLog(settings.AUDIT_QUEUE_SIZE, settings.AUDIT_BATCH_SIZE, settings.AUDIT_FLUSH_MS / 1000)
+
+
+def flush_audit_log(timeout: Optional[float] = None) -> bool:
+    return audit_log.flush(timeout)
+
+
+atexit.register(flush_audit_log, 5.0)
@@ -1,19 +1,39 @@
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+from fastapi import Request, Response
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.routing import LAST_WRITE_COOKIE
+from app.db.tenants import get_database
 
-# SQLite specific settings
-connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+# The default tenant's engine, for scripts; requests and services go through get_database()
+engine = get_database(settings.DEFAULT_TENANT).engine
 
-engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class _TenantSessionFactory:
+    """``SessionLocal()`` opens a session on the current tenant's database (see app/core/tenancy.py)."""
+
+    def __call__(self, **kwargs):
+        return get_database().sessionmaker(**kwargs)
+
+SessionLocal = _TenantSessionFactory()
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request, response: Response):
+    database = get_database()
+    db = database.sessionmaker()
+    router = database.replica_router
+    if router.replicas:
+        def remember_write(wrote_at: datetime) -> None:
+            response.set_cookie(
+                LAST_WRITE_COOKIE, f"{wrote_at.replace(tzinfo=timezone.utc).timestamp():.6f}",
+                max_age=router.sticky_seconds, httponly=True, samesite="lax",
+            )
+
+        db.info["remember_write"] = remember_write
+        db.info["read_after"] = router.read_after(request.cookies.get(LAST_WRITE_COOKIE))
+    if request.method in ("GET", "HEAD"):
+        db.info["read_only"] = True
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
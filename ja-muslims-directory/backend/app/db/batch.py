@@ -0,0 +1,32 @@
+from typing import Any, List, Sequence, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+
+def fetch_by_ids(
+    db: Session,
+    model: Any,
+    ids: Sequence[int],
+    *options: Any,
+) -> Tuple[List[Any], List[int]]:
+    """
+    Load rows of ``model`` whose primary key is in ``ids`` using ``IN`` queries.
+
+    The lookup is chunked by ``BATCH_CHUNK_SIZE`` so large requests stay under
+    the database's bound-parameter limit. Returns the rows in request order
+    (duplicates collapsed) and the list of IDs that were not found.
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    found = {}
+    chunk_size = settings.BATCH_CHUNK_SIZE
+    for start in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[start:start + chunk_size]
+        query = db.query(model)
+        if options:
+            query = query.options(*options)
+        for obj in query.filter(model.id.in_(chunk)).all():
+            found[obj.id] = obj
+
+    items = [found[i] for i in unique_ids if i in found]
+    missing = [i for i in unique_ids if i not in found]
+    return items, missing
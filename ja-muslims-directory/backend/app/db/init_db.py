@@ -1,11 +1,12 @@
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.security import get_password_hash
-from app.db.base import Base, engine
+from app.db.tenants import get_database
+from app.db.schema import ensure_schema
 from app.models import User
 
 def init_db(db: Session) -> None:
-    Base.metadata.create_all(bind=engine)
+    ensure_schema(get_database().engine)
     
     user = db.query(User).filter(User.email == settings.FIRST_SUPERUSER_EMAIL).first()
     if not user:
@@ -0,0 +1,252 @@
+"""
+Read-replica routing.
+
+``RoutingSession`` sends a SELECT to a replica engine only when the session
+was opened for a read-only request (``info["read_only"]``, set by ``get_db``
+for GET/HEAD). Everything else goes to the primary: flushes, DML and
+``session.connection()`` calls from write-side listeners. Once a session has
+touched the primary it stays there, so a request reads its own writes. Before
+the first flush or DML statement the session takes the SQLite write lock
+(``app.db.sqlite.begin_write``).
+
+Across requests, read-your-writes travels with the client: a response to a
+request that committed a write sets the ``last_write`` cookie to when the
+write began (``note_write``). For ``REPLICA_STICKY_SECONDS`` after that, the
+client's reads only go to a replica whose last health check saw a primary
+change at least that recent, and to the primary otherwise. Nothing is kept
+per process, so this holds whichever worker serves the next request, and
+across token refreshes.
+
+``ReplicaRouter`` health-checks each replica at most every
+``REPLICA_CHECK_INTERVAL_SECONDS``. A replica is taken out of rotation when it
+is unreachable, or when it is still missing primary writes that are more than
+``REPLICA_MAX_LAG_SECONDS`` old (compared through ``table_versions``). A read
+that fails on a replica is retried once on the primary.
+
+For local testing with SQLite, ``python -m app.db.routing --interval 5``
+copies the primary database file over each replica file periodically.
+"""
+import argparse
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, List, Optional, Tuple
+from sqlalchemy import DateTime, column, func, select, table
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.db.sqlite import begin_write
+
+logger = logging.getLogger(__name__)
+
+# Core view of the per-table change versions; the model itself imports Base
+_table_versions = table("table_versions", column("updated_at", DateTime))
+
+LAST_WRITE_COOKIE = "last_write"
+
+
+class _Replica:
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = float("-inf")
+        # Newest primary change the replica had at its last check
+        self.latest: Optional[datetime] = None
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: List[Engine],
+        check_interval: float,
+        max_lag: float,
+        sticky_seconds: float,
+    ) -> None:
+        self.primary = primary
+        self.replicas = [_Replica(engine) for engine in replicas]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        # (monotonic time, newest primary change) samples taken by health checks
+        self._primary_marks: Deque[Tuple[float, Optional[datetime]]] = deque()
+
+    def pick(self, read_after: Optional[datetime] = None) -> Optional[Engine]:
+        """
+        A healthy replica in round-robin order, or None to use the primary.
+        With ``read_after``, only a replica that has the primary's changes
+        from then on.
+        """
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        for replica in self.replicas:
+            if now - replica.checked_at >= self.check_interval:
+                self.check(replica, now)
+        healthy = [
+            replica for replica in self.replicas
+            if replica.healthy and (read_after is None or (replica.latest is not None and replica.latest >= read_after))
+        ]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)].engine
+
+    def check(self, replica: _Replica, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            # Concurrent requests leave the check to whoever got here first
+            if now - replica.checked_at < self.check_interval:
+                return replica.healthy
+            replica.checked_at = now
+        try:
+            primary_latest = self._latest_change(self.primary)
+            replica_latest = self._latest_change(replica.engine)
+        except OperationalError as error:
+            self._set_health(replica, False, f"unreachable: {error}")
+            return False
+        replica.latest = replica_latest
+
+        with self._lock:
+            self._primary_marks.append((now, primary_latest))
+            # Newest primary state that every replica should have by now
+            required = None
+            while self._primary_marks and now - self._primary_marks[0][0] >= self.max_lag:
+                required = self._primary_marks.popleft()[1]
+            if required is not None:
+                self._primary_marks.appendleft((now - self.max_lag, required))
+        behind = required is not None and (replica_latest is None or replica_latest < required)
+        self._set_health(replica, not behind, f"more than {self.max_lag}s behind the primary")
+        return replica.healthy
+
+    def mark_down(self, engine: Engine, error: Exception) -> None:
+        for replica in self.replicas:
+            if replica.engine is engine:
+                replica.checked_at = time.monotonic()
+                self._set_health(replica, False, f"query failed: {error}")
+
+    def read_after(self, last_write: Optional[str]) -> Optional[datetime]:
+        """The start of the client's last write from its ``last_write`` cookie, while it is within the sticky window."""
+        if not last_write or not self.replicas:
+            return None
+        try:
+            wrote_at = float(last_write)
+        except ValueError:
+            return None
+        if not 0 <= time.time() - wrote_at < self.sticky_seconds:
+            return None
+        # table_versions.updated_at is naive UTC
+        return datetime.utcfromtimestamp(wrote_at)
+
+    def _latest_change(self, engine: Engine) -> Optional[datetime]:
+        with engine.connect() as connection:
+            return connection.execute(select(func.max(_table_versions.c.updated_at))).scalar()
+
+    def _set_health(self, replica: _Replica, healthy: bool, reason: str) -> None:
+        if replica.healthy != healthy:
+            url = replica.engine.url.render_as_string(hide_password=True)
+            if healthy:
+                logger.info("Replica %s is back in rotation", url)
+            else:
+                logger.warning("Replica %s taken out of rotation: %s", url, reason)
+        replica.healthy = healthy
+
+
+def note_write(session: Session, wrote_at: datetime) -> None:
+    """Tell the client of ``session``'s request that it wrote at ``wrote_at`` (naive UTC), so it reads it back."""
+    remember: Optional[Callable[[datetime], None]] = session.info.get("remember_write")
+    if remember is not None:
+        remember(wrote_at)
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, router: Optional[ReplicaRouter] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self._replica: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.router is not None
+            and self.info.get("read_only")
+            and not self.info.get("use_primary")
+            and not self._flushing
+            and clause is not None
+            and clause.is_select
+        ):
+            replica = self.router.pick(self.info.get("read_after"))
+            if replica is not None:
+                self._replica = replica
+                return replica
+        if self._flushing or (clause is not None and clause.is_dml):
+            # Before the write's table_versions bump, so a replica that has the bump has the write
+            self.info.setdefault("wrote_at", datetime.utcnow())
+        # Reads after anything went to the primary must see it
+        self.info["use_primary"] = True
+        self._replica = None
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def flush(self, objects=None) -> None:
+        if self.new or self.dirty or self.deleted:
+            begin_write(self.connection())
+        super().flush(objects)
+
+    def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            begin_write(self.connection())
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except OperationalError as error:
+            replica = self._replica
+            if replica is None or self.info.get("use_primary"):
+                raise
+            # Only replica reads have happened, so nothing is lost by starting over on the primary
+            self.router.mark_down(replica, error)
+            self.rollback()
+            self.info["use_primary"] = True
+            self._replica = None
+            return super().execute(statement, *args, **kwargs)
+
+    def commit(self) -> None:
+        super().commit()
+        wrote_at = self.info.pop("wrote_at", None)
+        if wrote_at is not None:
+            note_write(self, wrote_at)
+
+
+def copy_sqlite_database(source_url: str, target_url: str) -> None:
+    """Replace the SQLite database at ``target_url`` with a consistent copy of ``source_url``."""
+    source = sqlite3.connect(make_url(source_url).database)
+    target = sqlite3.connect(make_url(target_url).database)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def main() -> None:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Copy the SQLite primary over the replica files.")
+    parser.add_argument("--interval", type=float, help="Keep copying every N seconds")
+    args = parser.parse_args()
+    if not settings.DATABASE_URL.startswith("sqlite") or not settings.DATABASE_REPLICA_URLS:
+        parser.error("needs a SQLite DATABASE_URL and DATABASE_REPLICA_URLS")
+
+    while True:
+        for replica_url in settings.DATABASE_REPLICA_URLS:
+            copy_sqlite_database(settings.DATABASE_URL, replica_url)
+        print(f"Copied primary to {len(settings.DATABASE_REPLICA_URLS)} replica(s)")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Skip schema creation when the database is already current.
+
+``Base.metadata.create_all`` inspects every table on each run, which adds up
+for the entry points that call it on start. ``ensure_schema`` stores a
+fingerprint of the models (tables, columns, types, indexes) in
+``schema_state``. It only calls ``create_all`` when the stored fingerprint
+differs from the current models. The project has no Alembic revisions, so the
+fingerprint serves as the schema version.
+"""
+import hashlib
+from sqlalchemy import Column, MetaData, String, Table, select
+from sqlalchemy.engine import Engine
+from app.db.base import Base
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+# Kept off Base.metadata so it does not feed into its own fingerprint
+_state_metadata = MetaData()
+schema_state = Table(
+    "schema_state",
+    _state_metadata,
+    Column("name", String, primary_key=True),
+    Column("fingerprint", String, nullable=False),
+)
+
+
+def schema_fingerprint() -> str:
+    parts = []
+    for name, table in sorted(Base.metadata.tables.items()):
+        parts.append(f"table {name}")
+        for column in table.columns:
+            parts.append(f"  {column.name} {column.type!r} {column.nullable} {column.primary_key}")
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            parts.append(f"  index {index.name} {[column.name for column in index.columns]} {index.unique}")
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """Create missing tables unless the models are unchanged since the last run. Returns True if it ran."""
+    fingerprint = schema_fingerprint()
+    _state_metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        stored = connection.execute(
+            select(schema_state.c.fingerprint).where(schema_state.c.name == "models")
+        ).scalar()
+    if stored == fingerprint:
+        return False
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(schema_state.delete().where(schema_state.c.name == "models"))
+        connection.execute(schema_state.insert().values(name="models", fingerprint=fingerprint))
+    return True
@@ -0,0 +1,135 @@
+"""
+Write coordination for SQLite.
+
+SQLite allows one writer at a time. With several uvicorn workers on one file,
+a transaction that starts deferred and later writes can fail at once with
+"database is locked" when another process holds the write lock. To avoid that:
+
+- Connections use WAL journaling, so readers never block the writer.
+- Reads run outside a transaction, as pysqlite does by default.
+- A write transaction starts with ``BEGIN IMMEDIATE``, which takes the write
+  lock up front. ``begin_write`` does this before the session flushes. If the
+  lock stays busy past the busy timeout, it retries with jittered exponential
+  backoff. Nothing has been written at that point, so a retry is always safe.
+  Core writes outside a session get the same ``BEGIN IMMEDIATE`` implicitly
+  from pysqlite, waiting up to the busy timeout but without the retries.
+"""
+import logging
+import random
+import time
+from typing import List
+from sqlalchemy import Table, event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.exc import OperationalError
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Backoff between BEGIN IMMEDIATE attempts: random in [0, base * 2**attempt], capped
+_BACKOFF_BASE_SECONDS = 0.05
+_BACKOFF_MAX_SECONDS = 1.0
+
+
+def sqlite_connect_args() -> dict:
+    return {
+        "check_same_thread": False,
+        "timeout": settings.SQLITE_BUSY_TIMEOUT_SECONDS,
+        # pysqlite opens its implicit transactions (before INSERT/UPDATE/DELETE) with this
+        "isolation_level": "IMMEDIATE" if settings.SQLITE_BEGIN_IMMEDIATE else "",
+    }
+
+
+def configure_sqlite_engine(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        if settings.SQLITE_JOURNAL_MODE.upper() == "WAL":
+            # Durable at checkpoints rather than every commit; the usual pairing with WAL
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+def is_lock_error(error: Exception) -> bool:
+    message = str(getattr(error, "orig", error)).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def begin_write(connection: Connection) -> None:
+    """Take the SQLite write lock for the current transaction, if not held yet."""
+    if connection.dialect.name != "sqlite" or not settings.SQLITE_BEGIN_IMMEDIATE:
+        return
+    dbapi_connection = connection.connection.dbapi_connection
+    if dbapi_connection.in_transaction:
+        return
+    for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+        try:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            return
+        except OperationalError as error:
+            if not is_lock_error(error) or attempt == settings.SQLITE_WRITE_RETRIES:
+                raise
+            delay = random.uniform(0, min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * 2 ** attempt))
+            logger.info("Write lock busy, retrying in %.3fs (attempt %d)", delay, attempt + 1)
+            time.sleep(delay)
+
+
+def ensure_autoincrement(engine: Engine, tables: List[Table]) -> List[str]:
+    """
+    Rebuild those of ``tables`` that were created without AUTOINCREMENT (the
+    models now ask for it), keeping their rows, ids and indexes. Without it
+    SQLite hands the highest id out again once that row is deleted or
+    archived. Returns the names of the rebuilt tables.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+    rebuilt = []
+    with engine.connect() as connection:
+        # The connection goes back to the pool afterwards, with the setting it came with
+        foreign_keys = connection.exec_driver_sql("PRAGMA foreign_keys").scalar()
+        # Other tables refer to these; the rebuild keeps every id, so nothing dangles
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        try:
+            for table in tables:
+                sql = connection.execute(
+                    text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+                ).scalar()
+                if sql is None or "AUTOINCREMENT" in sql.upper():
+                    continue
+                existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+                columns = ", ".join(column.name for column in table.columns if column.name in existing)
+                staging = f"{table.name}_rebuild"
+                # Compiled from the model's own metadata, where its foreign keys resolve
+                create = str(CreateTable(table).compile(dialect=engine.dialect)).replace(
+                    f"CREATE TABLE {table.name} ", f"CREATE TABLE {staging} ", 1
+                )
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+                try:
+                    connection.exec_driver_sql(create)
+                    connection.exec_driver_sql(f"INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table.name}")
+                    connection.exec_driver_sql(f"DROP TABLE {table.name}")
+                    connection.exec_driver_sql(f"ALTER TABLE {staging} RENAME TO {table.name}")
+                    for index in table.indexes:
+                        index.create(connection)
+                    # Ids already archived count as used too
+                    archive = f"{table.name}_archive"
+                    if connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": archive}
+                    ).scalar():
+                        connection.exec_driver_sql(
+                            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table.name}', 0 "
+                            f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = '{table.name}')"
+                        )
+                        connection.exec_driver_sql(
+                            f"UPDATE sqlite_sequence SET seq = max(seq, coalesce((SELECT max(id) FROM {archive}), 0)) "
+                            f"WHERE name = '{table.name}'"
+                        )
+                    connection.exec_driver_sql("COMMIT")
+                except Exception:
+                    connection.exec_driver_sql("ROLLBACK")
+                    raise
+                rebuilt.append(table.name)
+        finally:
+            connection.exec_driver_sql(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+    return rebuilt
@@ -0,0 +1,222 @@
+"""
+Change feed for delta sync.
+
+An ``after_flush`` listener records the latest change of every synced row in
+``sync_changes``: the row's previous entry is removed and a new one appended,
+so each row appears once, at the position of its most recent write. Deletes
+keep their entry as a tombstone. Clients page through the feed by ``seq``.
+
+Paging by ``seq`` is only safe if entries become visible in ``seq`` order. On
+SQLite writers are serialized, so they do. On Postgres a sequence value is
+taken when the row is inserted, and a transaction that inserted early can
+commit after one that inserted later; a client that paged past the later one
+would never see it. There the entries are re-sequenced in ``before_commit``
+under a transaction-scoped advisory lock, which only the commit tails of
+synced writes take, so ``seq`` follows commit order.
+
+Tombstones are dropped after ``SYNC_TOMBSTONE_RETENTION_DAYS`` by
+``python -m app.db.sync`` (run it from cron), which moves the table's
+``sync_horizons`` entry forward. A client whose ``since`` is older than that
+may have missed deletions: ``read_changes`` raises ``ResyncRequired`` (410),
+and the client syncs again from ``since=0``.
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.tenancy import tenants, use_tenant
+from app.db.aggregates import id_chunks
+from app.db.base import Base, SessionLocal
+from app.db.batch import fetch_by_ids
+from app.models.sync_change import SyncChange
+from app.models.sync_horizon import SyncHorizon
+
+_table = SyncChange.__table__
+_horizons = SyncHorizon.__table__
+
+# session.info key: {table_name: row ids} recorded in this transaction, re-sequenced at commit (Postgres)
+_UNSEQUENCED = "sync_unsequenced"
+# pg_advisory_xact_lock key held while re-sequencing; any constant shared by all workers
+_SEQUENCE_LOCK = 0x73796E63
+
+
+class ResyncRequired(Exception):
+    def __init__(self, table_name: str, since: int, purged_seq: int) -> None:
+        super().__init__(
+            f"Deletions from {table_name} up to sync token {purged_seq} are no longer kept; "
+            f"token {since} is older, so sync again from since=0"
+        )
+        self.table_name = table_name
+
+# Tables exposed through the sync API
+SYNCED_TABLES = {"members", "businesses", "masjids", "restaurants", "educations", "life_events"}
+
+
+def record_changes(
+    session: Session, table_name: str, row_ids: Iterable[int], deleted: bool = False
+) -> None:
+    row_ids = list(row_ids)
+    if not row_ids:
+        return
+    now = datetime.utcnow()
+    connection = session.connection()
+    connection.execute(
+        delete(_table).where(_table.c.table_name == table_name, _table.c.row_id.in_(row_ids))
+    )
+    connection.execute(
+        insert(_table),
+        [
+            {"table_name": table_name, "row_id": row_id, "deleted": deleted, "changed_at": now}
+            for row_id in row_ids
+        ]
+    )
+    if connection.dialect.name == "postgresql":
+        session.info.setdefault(_UNSEQUENCED, {}).setdefault(table_name, set()).update(row_ids)
+
+
+def read_changes(
+    db: Session, table_name: str, since: int, limit: int
+) -> Tuple[List[Tuple[int, int, bool]], bool]:
+    """
+    Return up to ``limit`` ``(seq, row_id, deleted)`` entries after ``since``,
+    and whether more remain. Raises ``ResyncRequired`` if tombstones after
+    ``since`` have been purged.
+    """
+    if since:
+        purged_seq = db.execute(
+            select(_horizons.c.purged_seq).where(_horizons.c.table_name == table_name)
+        ).scalar()
+        if purged_seq is not None and since < purged_seq:
+            raise ResyncRequired(table_name, since, purged_seq)
+    rows = db.execute(
+        select(_table.c.seq, _table.c.row_id, _table.c.deleted)
+        .where(_table.c.table_name == table_name, _table.c.seq > since)
+        .order_by(_table.c.seq)
+        .limit(limit + 1)
+    ).all()
+    return [tuple(row) for row in rows[:limit]], len(rows) > limit
+
+
+def sync_page(db: Session, model: Any, since: int, limit: int, *options: Any) -> dict:
+    """
+    Build one page of the change feed for ``model``: current rows changed after
+    ``since``, IDs deleted after ``since``, and the token for the next page.
+    """
+    entries, has_more = read_changes(db, model.__tablename__, since, limit)
+    live_ids = [row_id for _, row_id, deleted in entries if not deleted]
+    rows, _ = fetch_by_ids(db, model, live_ids, *options)
+    return {
+        "changes": rows,
+        "deleted": [row_id for _, row_id, deleted in entries if deleted],
+        "next_since": entries[-1][0] if entries else since,
+        "has_more": has_more,
+    }
+
+
+def backfill_changes(db: Session, table_name: str) -> int:
+    """Add feed entries for existing rows that have none (e.g. rows created before sync existed)."""
+    source = Base.metadata.tables[table_name]
+    missing = db.execute(
+        select(source.c.id)
+        .where(~source.c.id.in_(
+            select(_table.c.row_id).where(_table.c.table_name == table_name)
+        ))
+        .order_by(source.c.id)
+    ).scalars().all()
+    record_changes(db, table_name, missing)
+    return len(missing)
+
+
+def purge_tombstones(db: Session, older_than: datetime) -> Dict[str, int]:
+    """Drop tombstones changed before ``older_than`` and move each table's horizon past them. Returns counts."""
+    purged = {}
+    for table_name in sorted(SYNCED_TABLES):
+        horizon = db.execute(
+            select(func.max(_table.c.seq))
+            .where(_table.c.table_name == table_name, _table.c.deleted, _table.c.changed_at < older_than)
+        ).scalar()
+        if horizon is None:
+            continue
+        purged[table_name] = db.execute(
+            delete(_table).where(_table.c.table_name == table_name, _table.c.deleted, _table.c.seq <= horizon)
+        ).rowcount
+        moved = db.execute(
+            update(_horizons)
+            .where(_horizons.c.table_name == table_name, _horizons.c.purged_seq < horizon)
+            .values(purged_seq=horizon)
+        ).rowcount
+        if not moved and db.get(SyncHorizon, table_name) is None:
+            db.add(SyncHorizon(table_name=table_name, purged_seq=horizon))
+    return purged
+
+
+@event.listens_for(Session, "before_commit")
+def _sequence_at_commit(session: Session) -> None:
+    if session.bind is None or session.bind.dialect.name != "postgresql":
+        return
+    # The commit's own flush would run after this hook, recording entries too late to re-sequence
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    unsequenced = session.info.pop(_UNSEQUENCED, None)
+    if not unsequenced:
+        return
+    connection = session.connection()
+    # Held until the commit is visible, so no later commit takes a lower seq
+    connection.execute(select(func.pg_advisory_xact_lock(_SEQUENCE_LOCK)))
+    next_seq = func.nextval(func.pg_get_serial_sequence(_table.name, "seq"))
+    for table_name, row_ids in sorted(unsequenced.items()):
+        for chunk in id_chunks(row_ids):
+            connection.execute(
+                update(_table)
+                .where(_table.c.table_name == table_name, _table.c.row_id.in_(chunk))
+                .values(seq=next_seq)
+            )
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_unsequenced(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_UNSEQUENCED, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_after_flush(session: Session, flush_context) -> None:
+    changed = {}
+    deleted = {}
+    for obj in session.new:
+        if obj.__table__.name in SYNCED_TABLES:
+            changed.setdefault(obj.__table__.name, set()).add(obj.id)
+    for obj in session.dirty:
+        if obj.__table__.name in SYNCED_TABLES and session.is_modified(obj):
+            changed.setdefault(obj.__table__.name, set()).add(obj.id)
+    for obj in session.deleted:
+        if obj.__table__.name in SYNCED_TABLES:
+            deleted.setdefault(obj.__table__.name, set()).add(obj.id)
+
+    for table_name, row_ids in changed.items():
+        record_changes(session, table_name, row_ids - deleted.get(table_name, set()))
+    for table_name, row_ids in deleted.items():
+        record_changes(session, table_name, row_ids, deleted=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drop sync tombstones older than the retention window.")
+    parser.add_argument("--days", type=int, default=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    parser.add_argument("--tenant", choices=sorted(tenants), default=settings.DEFAULT_TENANT)
+    args = parser.parse_args()
+
+    with use_tenant(args.tenant):
+        db = SessionLocal()
+        try:
+            purged = purge_tombstones(db, datetime.utcnow() - timedelta(days=args.days))
+            db.commit()
+        finally:
+            db.close()
+    summary = ", ".join(f"{count} {table}" for table, count in purged.items())
+    print(f"Purged tombstones: {summary or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+One database per tenant (see ``app.core.tenancy``).
+
+``get_database`` opens a tenant's database on first use: the primary engine
+with its own connection pool, the read replicas and the ``ReplicaRouter``
+between them, and a session factory. A tenant with a ``schema`` runs every
+connection with that ``search_path``, so tenants can share a Postgres server
+without sharing tables. Nothing is opened for tenants this process never
+serves, so a node only needs access to the databases of the tenants routed
+to it.
+
+Moving a tenant to another node: copy its database (``copy`` below for
+SQLite, ``pg_dump --schema`` for Postgres), configure the tenant there, then
+switch its hosts over.
+
+Usage (from the backend directory):
+    python -m app.db.tenants list
+    python -m app.db.tenants init [slug ...]
+    python -m app.db.tenants copy <slug> <sqlite url>
+"""
+import argparse
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.core.tenancy import Tenant, current_tenant, tenants, use_tenant
+from app.db.routing import ReplicaRouter, RoutingSession, copy_sqlite_database
+from app.db.sqlite import configure_sqlite_engine, sqlite_connect_args
+
+_SCHEMA_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def create_database_engine(url: str, schema: Optional[str] = None, **kwargs) -> Engine:
+    if url.startswith("sqlite"):
+        path = make_url(url).database
+        if path and path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # SQLite specific settings
+        sqlite_engine = create_engine(url, connect_args=sqlite_connect_args(), **kwargs)
+        configure_sqlite_engine(sqlite_engine)
+        return sqlite_engine
+    engine = create_engine(url, **kwargs)
+    if schema:
+        if not _SCHEMA_NAME.match(schema):
+            raise ValueError(f"Invalid schema name {schema!r}")
+
+        @event.listens_for(engine, "connect")
+        def _set_search_path(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET search_path TO "{schema}"')
+            cursor.close()
+    return engine
+
+
+class TenantDatabase:
+    def __init__(self, tenant: Tenant) -> None:
+        self.tenant = tenant
+        self.engine = create_database_engine(tenant.database_url, tenant.schema)
+        self.replica_router = ReplicaRouter(
+            self.engine,
+            [create_database_engine(url, tenant.schema, pool_pre_ping=True) for url in tenant.replica_urls],
+            check_interval=settings.REPLICA_CHECK_INTERVAL_SECONDS,
+            max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+            sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+        )
+        # Sessions use the primary unless marked read_only (see get_db)
+        self.sessionmaker = sessionmaker(
+            class_=RoutingSession, router=self.replica_router, autocommit=False, autoflush=False, bind=self.engine
+        )
+
+
+_databases: Dict[str, TenantDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(slug: Optional[str] = None) -> TenantDatabase:
+    """The database of tenant ``slug``, by default the current one."""
+    slug = slug or current_tenant().slug
+    database = _databases.get(slug)
+    if database is None:
+        with _databases_lock:
+            database = _databases.get(slug)
+            if database is None:
+                database = _databases[slug] = TenantDatabase(tenants[slug])
+    return database
+
+
+def open_databases() -> List[TenantDatabase]:
+    """The tenant databases this process has opened so far."""
+    return list(_databases.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage tenant databases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    init = commands.add_parser("init", help="Create or update the schema and the first superuser")
+    init.add_argument("slugs", nargs="*", help="Tenants to initialize (default: all)")
+    copy = commands.add_parser("copy", help="Copy a SQLite tenant database, e.g. to move it to another node")
+    copy.add_argument("slug")
+    copy.add_argument("target_url")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for tenant in tenants.values():
+            location = make_url(tenant.database_url).render_as_string(hide_password=True)
+            schema = f" (schema {tenant.schema})" if tenant.schema else ""
+            print(f"{tenant.slug}: {tenant.name} at {location}{schema}; hosts {', '.join(tenant.hosts) or '-'}")
+    elif args.command == "init":
+        from app.db.init_db import init_db
+
+        for slug in args.slugs or list(tenants):
+            if slug not in tenants:
+                parser.error(f"unknown tenant {slug!r}")
+            with use_tenant(slug):
+                database = get_database()
+                if database.tenant.schema and database.engine.dialect.name != "sqlite":
+                    with create_database_engine(database.tenant.database_url).begin() as connection:
+                        connection.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{database.tenant.schema}"')
+                db = database.sessionmaker()
+                try:
+                    init_db(db)
+                finally:
+                    db.close()
+            print(f"Initialized {slug}")
+    else:
+        if args.slug not in tenants:
+            parser.error(f"unknown tenant {args.slug!r}")
+        source = tenants[args.slug].database_url
+        if not source.startswith("sqlite") or not args.target_url.startswith("sqlite"):
+            parser.error("copy handles SQLite databases; use pg_dump --schema for Postgres tenants")
+        copy_sqlite_database(source, args.target_url)
+        print(f"Copied {args.slug} to {args.target_url}")
+
+
+if __name__ == "__main__":
+    main()
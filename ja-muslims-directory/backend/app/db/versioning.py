@@ -0,0 +1,119 @@
+"""
+Per-table change versions.
+
+Every flush that inserts, updates or deletes ORM rows marks the tables it
+touched, and bulk ``query.update()``/``query.delete()`` calls are caught
+through ``do_orm_execute``. Once the transaction commits, the matching
+``table_versions`` rows are bumped in a short transaction of their own.
+Bumping inside the writer's transaction would hold the lock on a hot counter
+row until that transaction ends, so on Postgres every writer to the same
+table would wait for the one before it. Readers use the counters to build
+ETags without touching the tables themselves.
+
+The counters therefore move just after the data does. A reader in between
+sees the new rows under the old version for that moment, and a process that
+dies between the two commits leaves the version unbumped until the table's
+next write.
+
+Callbacks registered with ``add_change_listener`` are told which tables
+changed once the transaction has committed.
+"""
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.db.sqlite import begin_write
+from app.models.table_version import TableVersion
+
+logger = logging.getLogger(__name__)
+
+_table = TableVersion.__table__
+
+_change_listeners: List[Callable[[Set[str]], None]] = []
+
+
+def add_change_listener(callback: Callable[[Set[str]], None]) -> None:
+    """Call ``callback(tables)`` after every commit that changed ``tables``."""
+    _change_listeners.append(callback)
+
+
+def bump_table_versions(session: Session, tables: Iterable[str]) -> None:
+    """Bump the versions of ``tables`` once ``session``'s transaction commits."""
+    session.info.setdefault("changed_tables", set()).update(set(tables) - {_table.name})
+
+
+def _write_versions(engine: Engine, tables: Set[str]) -> None:
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        begin_write(connection)
+        # Always in the same order, so two bumping transactions cannot deadlock
+        for table_name in sorted(tables):
+            result = connection.execute(
+                update(_table)
+                .where(_table.c.table_name == table_name)
+                .values(version=_table.c.version + 1, updated_at=now)
+            )
+            if result.rowcount == 0:
+                connection.execute(
+                    _table.insert().values(table_name=table_name, version=1, updated_at=now)
+                )
+
+
+def get_table_versions(
+    db: Session, tables: Iterable[str]
+) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """Return ``{table_name: (version, updated_at)}``; unseen tables are (0, None)."""
+    tables = list(tables)
+    versions = {table_name: (0, None) for table_name in tables}
+    rows = db.query(TableVersion).filter(TableVersion.table_name.in_(tables)).all()
+    for row in rows:
+        versions[row.table_name] = (row.version, row.updated_at)
+    return versions
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_after_flush(session: Session, flush_context) -> None:
+    tables = set()
+    for obj in session.new:
+        tables.add(obj.__table__.name)
+    for obj in session.deleted:
+        tables.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            tables.add(obj.__table__.name)
+    if tables:
+        bump_table_versions(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_on_bulk_write(orm_execute_state) -> None:
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper:
+        bump_table_versions(
+            orm_execute_state.session,
+            [orm_execute_state.bind_mapper.local_table.name]
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session: Session) -> None:
+    tables = session.info.pop("changed_tables", None)
+    if not tables:
+        return
+    # The data is already committed; failing to bump must not turn that into an error
+    try:
+        _write_versions(session.bind, tables)
+    except Exception:
+        logger.exception("Bumping table versions for %s failed", sorted(tables))
+    for callback in _change_listeners:
+        # The data is already committed; a failing listener must not turn that into an error
+        try:
+            callback(tables)
+        except Exception:
+            logger.exception("Change listener %r failed", callback)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("changed_tables", None)
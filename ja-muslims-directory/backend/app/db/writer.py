@@ -0,0 +1,154 @@
+"""
+Single in-process writer with group commit.
+
+With ``SQLITE_WRITER_QUEUE`` enabled, ``run_write`` hands a unit of work to
+one writer thread per process and tenant instead of running it in the
+request's session. The writer takes whatever work has queued up (up to
+``WRITER_MAX_BATCH``, waiting at most ``WRITER_MAX_WAIT_MS`` for more) and
+runs each unit in its own SAVEPOINT inside one ``BEGIN IMMEDIATE``
+transaction. It then commits once. A failing unit only rolls back its own
+savepoint. The batch pays for one lock acquisition and one commit, instead of
+one per request.
+
+Units of work run in the writer's session, so they must not touch objects
+from the request's session. Anything they return should be loaded before
+they return (flush and refresh); the writer's session does not expire
+objects on commit.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.core.tenancy import use_tenant
+from app.db.audit import AUDIT_USER
+from app.db.routing import note_write
+from app.db.tenants import get_database
+from app.db.sqlite import begin_write
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WriterQueue:
+    def __init__(self, tenant: str, session_factory: sessionmaker, max_batch: int, max_wait: float) -> None:
+        self.tenant = tenant
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[Callable[[Session], object], Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, work: Callable[[Session], T]) -> T:
+        """Run ``work(session)`` on the writer thread and wait until it is committed."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((work, future))
+        return future.result()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self) -> List[Tuple[Callable[[Session], object], Future]]:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=self.max_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        # Only the tenant, so commit listeners use its database; nothing of the
+        # request that started the thread (its id in every log record, say)
+        with use_tenant(self.tenant):
+            while True:
+                batch = self._next_batch()
+                try:
+                    self._commit_batch(batch)
+                except Exception:
+                    logger.exception("Writer batch failed")
+
+    def _commit_batch(self, batch: List[Tuple[Callable[[Session], object], Future]]) -> None:
+        session = self.session_factory(expire_on_commit=False)
+        done = []
+        try:
+            try:
+                begin_write(session.connection())
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                return
+            for work, future in batch:
+                try:
+                    with session.begin_nested():
+                        result = work(session)
+                except Exception as error:
+                    future.set_exception(error)
+                else:
+                    done.append((future, result))
+            try:
+                session.commit()
+            except Exception as error:
+                for future, _ in done:
+                    future.set_exception(error)
+                return
+            for future, result in done:
+                future.set_result(result)
+        finally:
+            session.close()
+
+
+# One writer per tenant database
+_writers: Dict[str, WriterQueue] = {}
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriterQueue:
+    database = get_database()
+    writer = _writers.get(database.tenant.slug)
+    if writer is None:
+        with _writer_lock:
+            writer = _writers.get(database.tenant.slug)
+            if writer is None:
+                writer = _writers[database.tenant.slug] = WriterQueue(
+                    database.tenant.slug, database.sessionmaker, settings.WRITER_MAX_BATCH, settings.WRITER_MAX_WAIT_MS / 1000
+                )
+    return writer
+
+
+def run_write(db: Session, work: Callable[[Session], T]) -> T:
+    """
+    Run ``work(session)`` and commit it: on the shared writer when
+    ``SQLITE_WRITER_QUEUE`` is enabled, otherwise in ``db``.
+    """
+    if settings.SQLITE_WRITER_QUEUE:
+        user_id = db.info.get(AUDIT_USER)
+
+        def attributed(session: Session) -> T:
+            # Audit the unit as the request's user; flush while that is set
+            session.info[AUDIT_USER] = user_id
+            try:
+                result = work(session)
+                session.flush()
+                return result
+            finally:
+                session.info.pop(AUDIT_USER, None)
+
+        wrote_at = datetime.utcnow()
+        result = get_writer().submit(attributed)
+        # Committed outside the request's session, which cannot tell the client itself
+        note_write(db, wrote_at)
+        return result
+    result = work(db)
+    db.commit()
+    return result
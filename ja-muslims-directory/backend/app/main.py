@@ -1,34 +1,83 @@
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from app.api.v1.api import api_router
-from app.core.config import settings
-import os
+from app.core.startup import FirstRequestTimer, phase
+
+with phase("import framework"):
+    from fastapi import FastAPI, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.exceptions import RequestValidationError
+    from fastapi.responses import JSONResponse
+
+with phase("import app core"):
+    from app.api.admission import AdmissionMiddleware
+    from app.api.conditional import CacheHeadersMiddleware
+    from app.api.idempotency import IdempotencyMiddleware
+    from app.api.lazy import load_all
+    from app.api.v1.api import include_routers
+    from app.core.config import settings
+    from app.core.logs import RequestIdMiddleware, configure_logging
+    from app.core.tenancy import TenantMiddleware, current_tenant
+    import logging
+    import os
+    from contextlib import asynccontextmanager
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+with phase("import change listeners"):
+    # Session and change listeners must be registered before the first write,
+    # whichever router happens to be loaded; with lazy routers nothing else imports them yet
+    from app.db import sync  # noqa: F401
+    from app.services import dashboard, demographics, match_keys, rollups  # noqa: F401
+    from app.services.directory_snapshots import PrecompressedStaticFiles, ensure_snapshots
+    from app.services.reports import start_report_scheduler
+    from app.services.typeahead import start_typeahead_index
+
+
+# Background work starts when the app is served, not when it is imported (tests, tools)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Name index for the pickers' typeahead, kept current from ORM events after this
+    start_typeahead_index()
+    # Public directory listings that do not exist yet are built in the background
+    ensure_snapshots()
+    # Scheduled community reports; only regenerated when their source tables changed
+    start_report_scheduler()
+    yield
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    print(f"Validation error: {exc}")
-    print(f"Request URL: {request.url}")
-    try:
-        body = await request.body()
-        print(f"Request body: {body}")
-    except:
-        body = "Could not read body"
-        print("Could not read request body")
-    print(f"Validation errors: {exc.errors()}")
+    # Where validation failed, not the submitted values, which are often personal data
+    logger.warning(
+        "Request validation failed",
+        extra={
+            "method": request.method,
+            "path": request.url.path,
+            "errors": [{"loc": list(error["loc"]), "type": error["type"]} for error in exc.errors()],
+        },
+    )
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors()}
     )
 
+@app.exception_handler(sync.ResyncRequired)
+async def resync_required_handler(request: Request, exc: sync.ResyncRequired):
+    return JSONResponse(status_code=410, content={"detail": str(exc)})
+
+# Inside admission control, so replayed retries are rate limited like any other request
+app.add_middleware(IdempotencyMiddleware)
+
+# Added before CORS so that 429 responses still carry the CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:5173"],
@@ -37,7 +86,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(api_router, prefix=settings.API_V1_STR)
+app.add_middleware(CacheHeadersMiddleware)
+
+# Outermost of the API middleware: everything below, admission control included, runs as the request's tenant
+app.add_middleware(TenantMiddleware)
+
+# Around everything else, so every response and log record of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
+with phase("include routers"):
+    include_routers(app, settings.API_V1_STR)
+
+
+def openapi():
+    # The schema describes every route, so every lazy router has to be loaded first
+    if app.openapi_schema is None:
+        load_all(app)
+    return FastAPI.openapi(app)
+
+
+app.openapi = openapi
+
+app.add_middleware(FirstRequestTimer, enabled=settings.PROFILE_STARTUP)
 
 # Create uploads directory if it doesn't exist
 os.makedirs("uploads", exist_ok=True)
@@ -45,6 +115,10 @@ os.makedirs("uploads", exist_ok=True)
 # Mount static files for serving uploaded files
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+# Public directory listings, prebuilt per parish and facet; served without touching the database
+os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+app.mount("/directory", PrecompressedStaticFiles(directory=settings.SNAPSHOT_DIR), name="directory")
+
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to JA Muslims Directory API"}
\ No newline at end of file
+    return {"message": f"Welcome to {current_tenant().name} API"}
\ No newline at end of file
@@ -5,5 +5,16 @@ from app.models.business import Business, BusinessCategory
 from app.models.restaurant import Restaurant, RestaurantMenu, CuisineType
 from app.models.masjid import Masjid, MasjidType
 from app.models.education import Education, EducationType, EducationCategory
+from app.models.table_version import TableVersion
+from app.models.sync_change import SyncChange
+from app.models.sync_horizon import SyncHorizon
+from app.models.member_match_key import MemberMatchKey
+from app.models.refresh_token import RefreshToken
+from app.models.revoked_token import RevokedToken
+from app.models.event_rollup import EventRollup
+from app.models.demographic_cell import DemographicCell
+from app.models.report import Report
+from app.models.audit_entry import AuditEntry
+from app.models.archive import ArchivedMember, ArchivedLifeEvent, ArchivedEducation, ArchivedBusiness
 
-__all__ = ["User", "Member", "Gender", "MaritalStatus", "LifeEvent", "EventType", "Business", "BusinessCategory", "Restaurant", "RestaurantMenu", "CuisineType", "Masjid", "MasjidType", "Education", "EducationType", "EducationCategory"]
\ No newline at end of file
+__all__ = ["User", "Member", "Gender", "MaritalStatus", "LifeEvent", "EventType", "Business", "BusinessCategory", "Restaurant", "RestaurantMenu", "CuisineType", "Masjid", "MasjidType", "Education", "EducationType", "EducationCategory", "TableVersion", "SyncChange", "SyncHorizon", "MemberMatchKey", "RefreshToken", "RevokedToken", "EventRollup", "DemographicCell", "Report", "AuditEntry", "ArchivedMember", "ArchivedLifeEvent", "ArchivedEducation", "ArchivedBusiness"]
\ No newline at end of file
@@ -0,0 +1,69 @@
+from sqlalchemy import Column, DateTime, Index, Table
+from sqlalchemy.orm import foreign, relationship
+from sqlalchemy.sql import func
+from app.db.base import Base
+from app.models.business import Business
+from app.models.education import Education
+from app.models.life_event import LifeEvent
+from app.models.member import Member
+
+
+def _archive_table(source: Table, *indexed: str) -> Table:
+    """
+    ``{source}_archive``: the columns of ``source`` with the same names and
+    types, plus ``archived_at``. Archive tables have no foreign keys, so rows
+    can move in and out in any order, and only the indexes lookups need.
+    """
+    columns = [
+        Column(column.name, column.type.copy(), primary_key=column.primary_key, autoincrement=False,
+               nullable=column.nullable)
+        for column in source.columns
+    ]
+    table = Table(
+        f"{source.name}_archive",
+        Base.metadata,
+        *columns,
+        Column("archived_at", DateTime, nullable=False, server_default=func.now()),
+    )
+    for name in indexed:
+        Index(f"ix_{table.name}_{name}", table.c[name])
+    return table
+
+
+class ArchivedLifeEvent(Base):
+    """A life event of an archived member (see app/services/archive.py)."""
+    __table__ = _archive_table(LifeEvent.__table__, "member_id")
+
+
+class ArchivedEducation(Base):
+    """An education record of an archived member."""
+    __table__ = _archive_table(Education.__table__, "member_id")
+
+
+class ArchivedMember(Base):
+    """A deceased member moved out of ``members``, with their life events and educations."""
+    __table__ = _archive_table(Member.__table__)
+
+    life_events = relationship(
+        ArchivedLifeEvent,
+        primaryjoin=lambda: foreign(ArchivedLifeEvent.member_id) == ArchivedMember.id,
+        order_by=lambda: ArchivedLifeEvent.event_date,
+        viewonly=True,
+    )
+    educations = relationship(
+        ArchivedEducation,
+        primaryjoin=lambda: foreign(ArchivedEducation.member_id) == ArchivedMember.id,
+        viewonly=True,
+    )
+
+
+class ArchivedBusiness(Base):
+    """A long-inactive business moved out of ``businesses``."""
+    __table__ = _archive_table(Business.__table__, "owner_id")
+
+    # The owner while they are still in ``members``
+    owner = relationship(
+        Member,
+        primaryjoin=lambda: foreign(ArchivedBusiness.owner_id) == Member.id,
+        viewonly=True,
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from app.db.base import Base
+
+class AuditEntry(Base):
+    """
+    One write to an audited row, recorded by ``app.db.audit``.
+
+    ``changes`` is a JSON object of ``{field: [before, after]}``: every
+    loaded field for inserts and deletes, only the changed ones for updates.
+    ``user_id`` has no foreign key, so the history outlives deleted users.
+    """
+    __tablename__ = "audit_log"
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)  # insert, update, delete, archive, restore
+    changes = Column(Text, nullable=False)
+    user_id = Column(Integer)
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_audit_log_entity", "table_name", "row_id", "changed_at"),
+        Index("ix_audit_log_user", "user_id", "changed_at"),
+        Index("ix_audit_log_changed_at", "changed_at"),
+    )
@@ -28,6 +28,8 @@ class BusinessCategory(enum.Enum):
 
 class Business(Base):
     __tablename__ = "businesses"
+    # Ids of archived rows are never handed out again (see app.services.archive)
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String
+from app.db.base import Base
+
+class DemographicCell(Base):
+    """
+    Living members per combination of demographic dimensions, maintained by
+    ``app.services.demographics``.
+    
+    ``age_group`` is the band of the age members reach in ``year``.
+    ``masjid_id`` is 0 for members without a masjid; the parish comes from the
+    masjid. ``education`` is ``none``, ``formal``, ``islamic`` or ``both``.
+    """
+    __tablename__ = "demographic_cube"
+    
+    year = Column(Integer, primary_key=True)
+    masjid_id = Column(Integer, primary_key=True)
+    gender = Column(String, primary_key=True)
+    age_group = Column(String, primary_key=True)
+    marital_status = Column(String, primary_key=True)  # 'unknown' when not recorded
+    education = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
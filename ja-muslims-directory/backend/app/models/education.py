@@ -38,6 +38,8 @@ class EducationCategory(enum.Enum):
 
 class Education(Base):
     __tablename__ = "educations"
+    # Ids of archived rows are never handed out again (see app.services.archive)
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     member_id = Column(Integer, ForeignKey("members.id", ondelete="CASCADE"), nullable=False)
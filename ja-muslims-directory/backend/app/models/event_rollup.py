@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Date, Index, Integer, String
+from app.db.base import Base
+
+class EventRollup(Base):
+    """
+    Monthly event counts per masjid, maintained by ``app.services.rollups``.
+    
+    ``event_type`` is a life event type, or ``member_conversion`` for members'
+    ``date_of_conversion``. ``masjid_id`` is the member's masjid (0 for none);
+    the parish comes from the masjid.
+    """
+    __tablename__ = "event_rollups"
+    
+    period = Column(Date, primary_key=True)  # first day of the month
+    event_type = Column(String, primary_key=True)
+    masjid_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("ix_event_rollups_type_period", "event_type", "period"),
+    )
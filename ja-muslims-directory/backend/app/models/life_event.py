@@ -18,6 +18,8 @@ class EventType(enum.Enum):
 
 class LifeEvent(Base):
     __tablename__ = "life_events"
+    # Ids of archived rows are never handed out again (see app.services.archive)
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     member_id = Column(Integer, ForeignKey("members.id"), nullable=False)
@@ -16,6 +16,8 @@ class MaritalStatus(enum.Enum):
 
 class Member(Base):
     __tablename__ = "members"
+    # Ids of archived rows are never handed out again (see app.services.archive)
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     muslim_name = Column(String, nullable=False)
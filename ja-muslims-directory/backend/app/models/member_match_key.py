@@ -0,0 +1,13 @@
+from sqlalchemy import Column, ForeignKey, Integer, String
+from app.db.base import Base
+
+class MemberMatchKey(Base):
+    """
+    Blocking keys of a member (normalized phone, date of birth, phonetic name
+    codes). Members sharing a key are duplicate candidates, so a new record is
+    only compared with the members found through its own keys.
+    """
+    __tablename__ = "member_match_keys"
+    
+    member_id = Column(Integer, ForeignKey("members.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String, primary_key=True, index=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class RefreshToken(Base):
+    """
+    A refresh token handed out at login. The client holds ``<id>.<secret>``;
+    only an HMAC of the secret is stored. Each refresh revokes the token and
+    issues its replacement in the same ``family_id``, so a revoked token that
+    comes back (a stolen copy) revokes the whole family.
+    """
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(String, nullable=False, index=True)
+    token_hash = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    revoked_at = Column(DateTime)
+    replaced_by = Column(String)
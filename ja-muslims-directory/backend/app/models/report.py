@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class Report(Base):
+    """
+    A generated community report. ``input_key`` identifies the report, its
+    parameters and the versions of the tables it reads, so asking again
+    before those tables change finds this row instead of regenerating. The
+    file is stored under its SHA-256 ``content_hash`` (see
+    ``app.services.reports``).
+    """
+    __tablename__ = "reports"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    format = Column(String, nullable=False)
+    params = Column(Text, nullable=False)  # JSON
+    input_key = Column(String, nullable=False, unique=True)
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed
+    content_hash = Column(String)
+    size = Column(Integer)
+    error = Column(Text)
+    requested_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    created_at = Column(DateTime, server_default=func.now())
+    requested_at = Column(DateTime)  # last time it was queued
+    completed_at = Column(DateTime)
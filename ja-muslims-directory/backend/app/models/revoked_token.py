@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from app.db.base import Base
+
+class RevokedToken(Base):
+    """
+    An access token revoked before it expired, by its ``jti``. Workers keep
+    these in memory (``app.core.revocation``) and pick up new rows by ``seq``;
+    rows are deleted once the token would have expired anyway.
+    """
+    __tablename__ = "revoked_tokens"
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String, nullable=False, unique=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    __table_args__ = ({"sqlite_autoincrement": True},)
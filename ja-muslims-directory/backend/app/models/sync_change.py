@@ -0,0 +1,24 @@
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String
+from app.db.base import Base
+
+class SyncChange(Base):
+    """
+    Latest change per synced row, ordered by a monotonic ``seq``.
+    
+    A row keeps a single entry that is re-sequenced on every write; deleted
+    rows keep theirs as a tombstone (``deleted=True``).
+    """
+    __tablename__ = "sync_changes"
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_sync_changes_table_seq", "table_name", "seq"),
+        Index("ix_sync_changes_table_row", "table_name", "row_id", unique=True),
+        # Never reuse a sequence number, even after the newest entry is replaced
+        {"sqlite_autoincrement": True},
+    )
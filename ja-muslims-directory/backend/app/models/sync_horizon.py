@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String
+from app.db.base import Base
+
+class SyncHorizon(Base):
+    """
+    Oldest sync token still served per table.
+
+    Tombstones up to ``purged_seq`` have been dropped, so a client that last
+    synced before it may have missed deletions and has to sync again from 0.
+    """
+    __tablename__ = "sync_horizons"
+    
+    table_name = Column(String, primary_key=True)
+    purged_seq = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.db.base import Base
+
+class TableVersion(Base):
+    """Change counter per table, bumped on every insert, update and delete."""
+    __tablename__ = "table_versions"
+    
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
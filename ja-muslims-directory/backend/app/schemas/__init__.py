@@ -1,13 +1,20 @@
-from app.schemas.user import User, UserCreate, UserUpdate, UserInDB
-from app.schemas.member import Member, MemberCreate, MemberUpdate, MemberInDBBase
-from app.schemas.life_event import LifeEvent, LifeEventCreate, LifeEventUpdate
-from app.schemas.business import Business, BusinessCreate, BusinessUpdate, BusinessInDBBase
-from app.schemas.restaurant import Restaurant, RestaurantCreate, RestaurantUpdate, RestaurantWithBusiness, RestaurantMenu
-
-__all__ = [
-    "User", "UserCreate", "UserUpdate", "UserInDB",
-    "Member", "MemberCreate", "MemberUpdate", "MemberInDBBase",
-    "LifeEvent", "LifeEventCreate", "LifeEventUpdate",
-    "Business", "BusinessCreate", "BusinessUpdate", "BusinessInDBBase",
-    "Restaurant", "RestaurantCreate", "RestaurantUpdate", "RestaurantWithBusiness", "RestaurantMenu"
-]
\ No newline at end of file
+import importlib
+
+# Schemas are imported from their own modules on first access, so importing one
+# schema module (e.g. app.schemas.token for auth) does not build all of them
+_modules = {
+    "User": "user", "UserCreate": "user", "UserUpdate": "user", "UserInDB": "user",
+    "Member": "member", "MemberCreate": "member", "MemberUpdate": "member", "MemberInDBBase": "member",
+    "LifeEvent": "life_event", "LifeEventCreate": "life_event", "LifeEventUpdate": "life_event",
+    "Business": "business", "BusinessCreate": "business", "BusinessUpdate": "business", "BusinessInDBBase": "business",
+    "Restaurant": "restaurant", "RestaurantCreate": "restaurant", "RestaurantUpdate": "restaurant",
+    "RestaurantWithBusiness": "restaurant", "RestaurantMenu": "restaurant",
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str):
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f"{__name__}.{_modules[name]}"), name)
@@ -0,0 +1,21 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class AuditEntry(BaseModel):
+    id: int
+    table_name: str
+    row_id: int
+    action: str
+    changes: Dict[str, List[Any]]
+    user_id: Optional[int] = None
+    changed_at: datetime
+
+
+class AuditStatus(BaseModel):
+    queue_depth: int
+    queued: int
+    written: int
+    written_inline: int
+    failed: int
@@ -0,0 +1,13 @@
+from typing import Generic, List, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class BatchRequest(BaseModel):
+    ids: List[int]
+
+
+class BatchResponse(BaseModel, Generic[T]):
+    items: List[T] = []
+    missing: List[int] = []
@@ -0,0 +1,21 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+
+class BulkUpdateItem(BaseModel):
+    id: int
+    values: Dict[str, Any]
+
+
+class BulkUpdateRequest(BaseModel):
+    # Either per-row updates...
+    items: Optional[List[BulkUpdateItem]] = None
+    # ...or one set of values applied to every row matching the filter.
+    # Filter values may be a scalar (equality), a list (IN) or null (IS NULL).
+    filter: Optional[Dict[str, Any]] = None
+    values: Optional[Dict[str, Any]] = None
+
+
+class BulkUpdateResult(BaseModel):
+    updated: int
+    ids: List[int] = []
@@ -0,0 +1,26 @@
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel
+from app.models.member import Gender
+
+
+class DuplicateMember(BaseModel):
+    id: int
+    muslim_name: str
+    legal_name: str
+    gender: Gender
+    date_of_birth: date
+    phone_number: Optional[str] = None
+
+
+class DuplicateMatch(BaseModel):
+    score: float
+    # An existing member...
+    member: Optional[DuplicateMember] = None
+    # ...or another record in the same request, by position
+    index: Optional[int] = None
+
+
+class DuplicateCheckResult(BaseModel):
+    index: int
+    matches: List[DuplicateMatch] = []
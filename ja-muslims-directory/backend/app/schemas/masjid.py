@@ -56,6 +56,16 @@ class MemberBasic(BaseModel):
         from_attributes = True
 
 
+class MasjidBasic(BaseModel):
+    id: int
+    name: str
+    type: MasjidType
+    parish: str
+    
+    class Config:
+        from_attributes = True
+
+
 class Masjid(MasjidBase):
     id: int
     created_at: datetime
@@ -1,7 +1,11 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime
 from app.models.member import Gender, MaritalStatus
+from app.schemas.business import Business
+from app.schemas.education import Education
+from app.schemas.life_event import LifeEvent
+from app.schemas.masjid import MasjidBasic, MemberBasic
 
 class MemberBase(BaseModel):
     muslim_name: str
@@ -65,4 +69,14 @@ class Member(MemberInDBBase):
     pass
 
 class MemberWithRelations(Member):
-    life_events: list = []
\ No newline at end of file
+    life_events: List[LifeEvent] = []
+
+class MemberProfile(Member):
+    # Sections left out via ``include=`` stay None
+    life_events: Optional[List[LifeEvent]] = None
+    educations: Optional[List[Education]] = None
+    businesses: Optional[List[Business]] = None
+    spouse: Optional[MemberBasic] = None
+    masjid: Optional[MasjidBasic] = None
+    imam_of_masjids: Optional[List[MasjidBasic]] = None
+    shura_member_of_masjids: Optional[List[MasjidBasic]] = None
@@ -0,0 +1,35 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+
+
+class ReportRequest(BaseModel):
+    name: str
+    format: str = "pdf"
+    year: int = Field(default_factory=lambda: date.today().year, ge=1900, le=2100)
+
+
+class Report(BaseModel):
+    id: int
+    name: str
+    format: str
+    params: Dict[str, Any]
+    status: str
+    content_hash: Optional[str] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+
+class ReportTypeInfo(BaseModel):
+    name: str
+    title: str
+    formats: List[str]
+    tables: List[str]
+
+
+class ReportList(BaseModel):
+    types: List[ReportTypeInfo]
+    reports: List[Report]
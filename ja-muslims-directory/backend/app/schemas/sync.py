@@ -0,0 +1,11 @@
+from typing import Generic, List, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class SyncPage(BaseModel, Generic[T]):
+    changes: List[T] = []
+    deleted: List[int] = []
+    next_since: int
+    has_more: bool = False
@@ -0,0 +1,9 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class TypeaheadMatch(BaseModel):
+    type: str
+    id: int
+    name: str
+    detail: Optional[str] = None
@@ -0,0 +1,316 @@
+"""
+Hot/cold archival of deceased members and long-inactive businesses.
+
+Members who died more than ``ARCHIVE_DECEASED_AFTER_DAYS`` ago move from
+``members`` to ``members_archive``, together with their life events and
+educations (``life_events_archive``, ``educations_archive``). Businesses that
+have been inactive for ``ARCHIVE_INACTIVE_BUSINESS_AFTER_DAYS`` (by their last
+update) move to ``businesses_archive``. The hot tables, their indexes and
+every scan over them then only hold the records the directory works with.
+
+Archive tables have the same columns as their hot tables plus
+``archived_at``, and live in the same database, so a move is one
+``INSERT ... SELECT`` and ``DELETE`` per table in a single transaction.
+A record still referred to from the hot tables stays hot: a member who is
+still a masjid's imam or on its shura, someone's spouse, the related member
+of a hot life event, or the owner of a hot business; a business that still
+has a restaurant listing.
+
+Moves bypass the ORM, so aggregates built from these rows (event rollups,
+dashboard totals, cohort frames) keep counting archived records. Sync
+clients receive the moved rows as deletions, the audit log gets an
+``archive`` (or ``restore``) entry per row, and ``table_versions`` is bumped
+for both the hot and the archive tables.
+
+The hot tables use AUTOINCREMENT, so an archived id is never given to a new
+row; tables created before that are rebuilt by ``update_db.py``. A restore
+whose ids are taken anyway fails with ``RestoreConflict`` and moves nothing.
+
+Read endpoints leave archived rows out unless asked with
+``include_archived=true``; ``paginate_with_archive`` then pages through the
+hot rows followed by the archived ones.
+
+Usage (from the backend directory):
+    python -m app.services.archive [--dry-run] [--tenant slug]
+    python -m app.services.archive --restore-member ID [--restore-business ID]
+"""
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import Table, delete, func, insert, null, select
+from sqlalchemy.orm import Query, Session
+from app.core.config import settings
+from app.core.tenancy import tenants, use_tenant
+from app.db.aggregates import id_chunks
+from app.db.audit import record_audit
+from app.db.base import SessionLocal
+from app.db.sqlite import begin_write
+from app.db.sync import record_changes
+from app.db.versioning import bump_table_versions
+from app.models.archive import ArchivedBusiness, ArchivedEducation, ArchivedLifeEvent, ArchivedMember
+from app.models.business import Business
+from app.models.education import Education
+from app.models.life_event import LifeEvent
+from app.models.masjid import Masjid, masjid_shura_members
+from app.models.member import Member
+from app.models.restaurant import Restaurant
+from app.services.match_keys import refresh_match_keys
+
+_members = Member.__table__
+_life_events = LifeEvent.__table__
+_educations = Education.__table__
+_businesses = Business.__table__
+_members_archive = ArchivedMember.__table__
+_life_events_archive = ArchivedLifeEvent.__table__
+_educations_archive = ArchivedEducation.__table__
+_businesses_archive = ArchivedBusiness.__table__
+
+ARCHIVE_TABLES = {
+    "members": _members_archive.name,
+    "life_events": _life_events_archive.name,
+    "educations": _educations_archive.name,
+    "businesses": _businesses_archive.name,
+}
+
+# Hot columns referring to members, with the column of the member row they
+# belong to (None for rows that are never archived with a member)
+_MEMBER_REFERENCES = (
+    (Masjid.__table__.c.imam_id, None),
+    (masjid_shura_members.c.member_id, None),
+    (_businesses.c.owner_id, None),
+    (_members.c.spouse_id, _members.c.id),
+    (_life_events.c.related_member_id, _life_events.c.member_id),
+)
+
+
+class RestoreConflict(Exception):
+    """Archived rows whose ids have since been given to new rows, so they cannot go back."""
+
+    def __init__(self, table_name: str, ids: List[int]) -> None:
+        super().__init__(f"{table_name} ids {ids} are already in use; restore them by hand")
+        self.table_name = table_name
+        self.ids = ids
+
+
+def _check_free(db: Session, source: Table, target: Table, column: str, ids: Iterable[int]) -> None:
+    """Raise ``RestoreConflict`` if a row of ``source`` to be moved has an id ``target`` already uses."""
+    taken: List[int] = []
+    for chunk in id_chunks(ids):
+        moving = select(source.c.id).where(source.c[column].in_(chunk)).scalar_subquery()
+        taken.extend(db.execute(select(target.c.id).where(target.c.id.in_(moving))).scalars())
+    if taken:
+        raise RestoreConflict(target.name, sorted(taken))
+
+
+def _move(db: Session, source: Table, target: Table, column: str, ids: Iterable[int]) -> List[int]:
+    """Move the rows of ``source`` whose ``column`` is in ``ids`` to ``target``; returns their ids."""
+    names = [name for name in source.c.keys() if name in target.c]
+    moved: List[int] = []
+    for chunk in id_chunks(ids):
+        where = source.c[column].in_(chunk)
+        moved.extend(db.execute(select(source.c.id).where(where)).scalars())
+        db.execute(insert(target).from_select(names, select(*(source.c[name] for name in names)).where(where)))
+        db.execute(delete(source).where(where))
+    return moved
+
+
+def _changed(db: Session, changes: Dict[str, List[int]], archived: bool) -> None:
+    """Tombstones (or re-additions) in the sync feed, audit entries, and version bumps for both tables."""
+    action = "archive" if archived else "restore"
+    for table_name, row_ids in changes.items():
+        record_changes(db, table_name, row_ids, deleted=archived)
+        record_audit(db, [(table_name, row_id, action, {}) for row_id in row_ids])
+    bump_table_versions(db, [
+        name for table_name in changes for name in (table_name, ARCHIVE_TABLES[table_name])
+    ])
+
+
+def _blocked_members(db: Session, candidates: Set[int]) -> Set[int]:
+    """Candidates still referred to by a row that would stay hot."""
+    blocked = set()
+    for chunk in id_chunks(candidates):
+        for column, owner in _MEMBER_REFERENCES:
+            rows = db.execute(select(column, owner if owner is not None else null()).where(column.in_(chunk)))
+            blocked.update(referenced for referenced, referrer in rows if referrer not in candidates)
+    return blocked
+
+
+def deceased_member_ids(db: Session, died_before: date) -> List[int]:
+    """Members who died before ``died_before`` and can be archived."""
+    candidates = set(db.execute(select(_members.c.id).where(_members.c.date_of_death < died_before)).scalars())
+    # Leaving a member behind can block the members only they referred to, e.g. a spouse
+    while candidates:
+        blocked = _blocked_members(db, candidates)
+        if not blocked:
+            break
+        candidates -= blocked
+    return sorted(candidates)
+
+
+def inactive_business_ids(db: Session, inactive_before: datetime) -> List[int]:
+    """Businesses inactive since before ``inactive_before`` that have no restaurant listing."""
+    listed = select(Restaurant.__table__.c.business_id).where(Restaurant.__table__.c.business_id.isnot(None))
+    return list(db.execute(
+        select(_businesses.c.id)
+        .where(
+            _businesses.c.is_active.is_(False),
+            func.coalesce(_businesses.c.updated_at, _businesses.c.created_at) < inactive_before,
+            _businesses.c.id.notin_(listed),
+        )
+        .order_by(_businesses.c.id)
+    ).scalars())
+
+
+def archive_members(db: Session, member_ids: Iterable[int]) -> Dict[str, List[int]]:
+    """Move members with their life events and educations to the archive; returns the moved ids per table."""
+    member_ids = sorted(set(member_ids))
+    if not member_ids:
+        return {}
+    changes = {
+        "life_events": _move(db, _life_events, _life_events_archive, "member_id", member_ids),
+        "educations": _move(db, _educations, _educations_archive, "member_id", member_ids),
+        "members": _move(db, _members, _members_archive, "id", member_ids),
+    }
+    refresh_match_keys(db, member_ids)
+    _changed(db, changes, archived=True)
+    return changes
+
+
+def archive_businesses(db: Session, business_ids: Iterable[int]) -> List[int]:
+    business_ids = sorted(set(business_ids))
+    if not business_ids:
+        return []
+    moved = _move(db, _businesses, _businesses_archive, "id", business_ids)
+    _changed(db, {"businesses": moved}, archived=True)
+    return moved
+
+
+def run_archival(db: Session, today: Optional[date] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Archive everything due as of ``today``; returns the number of rows per
+    table. Businesses go first, so that an owner whose last businesses are
+    archived can follow in the same run. The caller commits.
+    """
+    today = today or date.today()
+    begin_write(db.connection())
+    business_ids = inactive_business_ids(
+        db, datetime.combine(today, datetime.min.time()) - timedelta(days=settings.ARCHIVE_INACTIVE_BUSINESS_AFTER_DAYS)
+    )
+    if dry_run:
+        # Archived businesses would no longer block their owners; that is only known after the move
+        member_ids = deceased_member_ids(db, today - timedelta(days=settings.ARCHIVE_DECEASED_AFTER_DAYS))
+        return {"businesses": len(business_ids), "members": len(member_ids)}
+    counts = {"businesses": len(archive_businesses(db, business_ids))}
+    member_ids = deceased_member_ids(db, today - timedelta(days=settings.ARCHIVE_DECEASED_AFTER_DAYS))
+    counts.update({table: len(ids) for table, ids in archive_members(db, member_ids).items()})
+    return counts
+
+
+def _archived_closure(db: Session, member_ids: Iterable[int]) -> Set[int]:
+    """``member_ids`` and the archived members they refer to, as spouse or related member of their events."""
+    closure: Set[int] = set()
+    pending = set(member_ids)
+    while pending:
+        closure |= pending
+        referenced: Set[int] = set()
+        for chunk in id_chunks(pending):
+            referenced.update(db.execute(
+                select(_members_archive.c.spouse_id).where(_members_archive.c.id.in_(chunk))
+            ).scalars())
+            referenced.update(db.execute(
+                select(_life_events_archive.c.related_member_id).where(_life_events_archive.c.member_id.in_(chunk))
+            ).scalars())
+        referenced.discard(None)
+        pending = set()
+        for chunk in id_chunks(referenced - closure):
+            pending.update(db.execute(select(_members_archive.c.id).where(_members_archive.c.id.in_(chunk))).scalars())
+    return closure
+
+
+def restore_members(db: Session, member_ids: Iterable[int]) -> List[int]:
+    """
+    Move archived members back to the hot tables, with the archived members
+    they refer to; returns the restored member ids. The caller commits.
+    """
+    begin_write(db.connection())
+    member_ids = sorted(_archived_closure(db, member_ids))
+    # Only tables created before AUTOINCREMENT (see update_db.py) can have reused an archived id
+    _check_free(db, _members_archive, _members, "id", member_ids)
+    _check_free(db, _life_events_archive, _life_events, "member_id", member_ids)
+    _check_free(db, _educations_archive, _educations, "member_id", member_ids)
+    changes = {
+        "members": _move(db, _members_archive, _members, "id", member_ids),
+        "life_events": _move(db, _life_events_archive, _life_events, "member_id", member_ids),
+        "educations": _move(db, _educations_archive, _educations, "member_id", member_ids),
+    }
+    if not changes["members"]:
+        return []
+    refresh_match_keys(db, changes["members"])
+    _changed(db, changes, archived=False)
+    return changes["members"]
+
+
+def restore_businesses(db: Session, business_ids: Iterable[int]) -> List[int]:
+    """Move archived businesses back, restoring archived owners first; returns the restored business ids."""
+    begin_write(db.connection())
+    business_ids = sorted(set(business_ids))
+    owner_ids = set()
+    for chunk in id_chunks(business_ids):
+        owner_ids.update(db.execute(
+            select(_businesses_archive.c.owner_id).where(_businesses_archive.c.id.in_(chunk))
+        ).scalars())
+    _check_free(db, _businesses_archive, _businesses, "id", business_ids)
+    restore_members(db, owner_ids)
+    moved = _move(db, _businesses_archive, _businesses, "id", business_ids)
+    if moved:
+        _changed(db, {"businesses": moved}, archived=False)
+    return moved
+
+
+def paginate_with_archive(query: Query, archived_query: Query, skip: int, limit: int) -> List[Any]:
+    """
+    Page ``skip``/``limit`` through the rows of ``query`` followed by those of
+    ``archived_query``. The archive is only read once the page runs past the
+    hot rows.
+    """
+    rows = query.offset(skip).limit(limit).all()
+    if len(rows) == limit:
+        return rows
+    hot_count = skip + len(rows) if rows else query.order_by(None).count()
+    return rows + archived_query.offset(max(0, skip - hot_count)).limit(limit - len(rows)).all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive deceased members and long-inactive businesses.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+    parser.add_argument("--restore-member", type=int, action="append", default=[], metavar="ID")
+    parser.add_argument("--restore-business", type=int, action="append", default=[], metavar="ID")
+    parser.add_argument("--tenant", choices=sorted(tenants), default=settings.DEFAULT_TENANT)
+    args = parser.parse_args()
+
+    with use_tenant(args.tenant):
+        db = SessionLocal()
+        try:
+            if args.restore_member or args.restore_business:
+                try:
+                    members = restore_members(db, args.restore_member)
+                    businesses = restore_businesses(db, args.restore_business)
+                except RestoreConflict as conflict:
+                    db.rollback()
+                    raise SystemExit(f"Nothing restored: {conflict}")
+                db.commit()
+                print(f"Restored members {members or '-'} and businesses {businesses or '-'}")
+                return
+            counts = run_archival(db, dry_run=args.dry_run)
+            if args.dry_run:
+                db.rollback()
+            else:
+                db.commit()
+        finally:
+            db.close()
+    summary = ", ".join(f"{count} {table}" for table, count in counts.items())
+    print(f"{'Would archive' if args.dry_run else 'Archived'} {summary}")
+
+
+if __name__ == "__main__":
+    main()
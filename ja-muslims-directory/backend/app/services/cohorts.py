@@ -0,0 +1,265 @@
+"""
+Columnar cohort reports over members, life events and educations.
+
+``load_frame`` reads the columns the reports need with one raw cursor fetch
+per table, without hydrating ORM objects, and keeps them as NumPy arrays.
+``get_frame`` caches the frame per process and tenant, keyed by the
+``table_versions`` of the three tables, so it is only reloaded after a write.
+Every worker sees the same versions, whichever process did the write. The
+reports are vectorized over the arrays:
+
+- ``age_pyramid``: living members per five-year age band and gender
+- ``conversion_cohorts``: members grouped by conversion year
+- ``salary_percentiles``: annual salaries (monthly ones times 12) by gender
+- ``marital_transitions``: state changes from marriage and divorce events
+
+Archived members, with their life events and educations, are part of the
+frame (see ``app.services.archive``). Ages are whole days divided by 365, as
+on the dashboard.
+"""
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.tenancy import current_tenant
+from app.db.versioning import get_table_versions
+from app.models.education import EducationCategory
+from app.models.life_event import EventType
+from app.models.member import Gender, MaritalStatus
+
+FRAME_TABLES = ("members", "life_events", "educations")
+# Each frame table is read together with its archive table
+ARCHIVED_FRAME_TABLES = tuple(f"{table}_archive" for table in FRAME_TABLES)
+
+GENDERS = [gender.value for gender in Gender]
+
+AGE_BAND_YEARS = 5
+OLDEST_AGE_BAND = 90
+SALARY_PERCENTILES = (10, 25, 50, 75, 90)
+# Members without a salary_period entered it monthly (the member form's default)
+SALARY_PERIODS_PER_YEAR = {"monthly": 12, "yearly": 1}
+
+_SINGLE, _MARRIED, _DIVORCED = 0, 1, 2
+_MARITAL_STATES = ("single", "married", "divorced")
+
+
+def _codes(values: Sequence[Optional[str]], names: Sequence[str]) -> np.ndarray:
+    """Index of each stored enum name in ``names``, -1 for NULL or unknown."""
+    lookup = {name: code for code, name in enumerate(names)}
+    return np.fromiter((lookup.get(value, -1) for value in values), dtype=np.int8, count=len(values))
+
+
+def _dates(values: Sequence[Any]) -> np.ndarray:
+    # Driver values are ISO strings (SQLite) or dates; NULL becomes NaT
+    return np.array(values, dtype="datetime64[D]")
+
+
+def _code(member) -> int:
+    """The ``_codes`` code of an enum member."""
+    return list(type(member)).index(member)
+
+
+def _fetch(db: Session, table: str, columns: Sequence[str]) -> List[Sequence[Any]]:
+    """Columns of every row of ``table`` and its archive as lists, straight from the DB-API cursor."""
+    names = ", ".join(columns)
+    rows = db.connection().exec_driver_sql(
+        f"SELECT {names} FROM {table} UNION ALL SELECT {names} FROM {table}_archive"
+    ).fetchall()
+    if not rows:
+        return [[] for _ in columns]
+    return [list(column) for column in zip(*rows)]
+
+
+class AnalyticsFrame:
+    """One dict of equal-length column arrays per table."""
+
+    def __init__(
+        self, members: Dict[str, np.ndarray], events: Dict[str, np.ndarray], educations: Dict[str, np.ndarray]
+    ) -> None:
+        self.members = members
+        self.events = events
+        self.educations = educations
+
+    def __len__(self) -> int:
+        return len(self.members["id"])
+
+
+def load_frame(db: Session) -> AnalyticsFrame:
+    (ids, gender, dob, converted, died, marital, salary, period) = _fetch(db, "members", (
+        "id", "gender", "date_of_birth", "date_of_conversion", "date_of_death",
+        "marital_status", "salary", "salary_period",
+    ))
+    members = {
+        "id": np.array(ids, dtype=np.int64),
+        "gender": _codes(gender, [g.name for g in Gender]),
+        "date_of_birth": _dates(dob),
+        "date_of_conversion": _dates(converted),
+        "date_of_death": _dates(died),
+        "marital_status": _codes(marital, [s.name for s in MaritalStatus]),
+        "salary": np.array([np.nan if value is None else value for value in salary], dtype=np.float64),
+        "salary_periods_per_year": np.array(
+            [SALARY_PERIODS_PER_YEAR.get((value or "monthly").lower(), 12) for value in period], dtype=np.int8
+        ),
+    }
+
+    (event_ids, member_ids, event_type, event_date) = _fetch(
+        db, "life_events", ("id", "member_id", "event_type", "event_date")
+    )
+    events = {
+        "id": np.array(event_ids, dtype=np.int64),
+        "member_id": np.array(member_ids, dtype=np.int64),
+        "event_type": _codes(event_type, [t.name for t in EventType]),
+        "event_date": _dates(event_date),
+    }
+
+    (education_member_ids, category) = _fetch(db, "educations", ("member_id", "category"))
+    educations = {
+        "member_id": np.array(education_member_ids, dtype=np.int64),
+        "category": _codes(category, [c.name for c in EducationCategory]),
+    }
+    return AnalyticsFrame(members, events, educations)
+
+
+# tenant -> (table versions, frame)
+_cache: Dict[str, Tuple[tuple, AnalyticsFrame]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_frame(db: Session) -> AnalyticsFrame:
+    """The current tenant's cached frame, reloaded if any of ``FRAME_TABLES`` changed since it was loaded."""
+    tenant = current_tenant().slug
+    versions = tuple(version for version, _ in get_table_versions(db, FRAME_TABLES + ARCHIVED_FRAME_TABLES).values())
+    cached_versions, frame = _cache.get(tenant, (None, None))
+    if frame is not None and cached_versions == versions:
+        return frame
+    with _cache_lock:
+        cached_versions, frame = _cache.get(tenant, (None, None))
+        if frame is None or cached_versions != versions:
+            frame = load_frame(db)
+            _cache[tenant] = (versions, frame)
+    return frame
+
+
+def _ages(frame: AnalyticsFrame, today: date) -> np.ndarray:
+    return (np.datetime64(today, "D") - frame.members["date_of_birth"]).astype(np.int64) // 365
+
+
+def _living(frame: AnalyticsFrame) -> np.ndarray:
+    return np.isnat(frame.members["date_of_death"]) & ~np.isnat(frame.members["date_of_birth"])
+
+
+def age_groups(frame: AnalyticsFrame, today: date) -> Dict[str, int]:
+    """The dashboard's age distribution of living members."""
+    ages = _ages(frame, today)[_living(frame)]
+    counts = np.bincount(np.searchsorted([18, 30, 45, 60], ages, side="left"), minlength=5)
+    return dict(zip(["0-18", "19-30", "31-45", "46-60", "60+"], counts.tolist()))
+
+
+def age_pyramid(frame: AnalyticsFrame, today: date) -> Dict[str, Any]:
+    living = _living(frame)
+    ages = _ages(frame, today)[living]
+    genders = frame.members["gender"][living]
+    bands = np.minimum(np.maximum(ages, 0), OLDEST_AGE_BAND) // AGE_BAND_YEARS
+    band_count = OLDEST_AGE_BAND // AGE_BAND_YEARS + 1
+    labels = [f"{band * AGE_BAND_YEARS}-{band * AGE_BAND_YEARS + AGE_BAND_YEARS - 1}" for band in range(band_count - 1)]
+    labels.append(f"{OLDEST_AGE_BAND}+")
+    return {
+        "age_bands": labels,
+        **{
+            gender: np.bincount(bands[genders == code], minlength=band_count).tolist()
+            for code, gender in enumerate(GENDERS)
+        },
+    }
+
+
+def conversion_cohorts(frame: AnalyticsFrame) -> List[Dict[str, Any]]:
+    members = frame.members
+    converted = ~np.isnat(members["date_of_conversion"])
+    if not converted.any():
+        return []
+    years = members["date_of_conversion"][converted].astype("datetime64[Y]").astype(np.int64) + 1970
+    cohorts, cohort = np.unique(years, return_inverse=True)
+    size = len(cohorts)
+
+    def count(mask: np.ndarray) -> List[int]:
+        return np.bincount(cohort[mask], minlength=size).tolist()
+
+    ages_at_conversion = (
+        (members["date_of_conversion"][converted] - members["date_of_birth"][converted]).astype(np.int64) // 365
+    )
+    order = np.lexsort((ages_at_conversion, cohort))
+    bounds = np.searchsorted(cohort[order], np.arange(size + 1))
+    median_ages = [
+        float(np.median(ages_at_conversion[order[bounds[i]:bounds[i + 1]]])) for i in range(size)
+    ]
+    islamic = np.isin(
+        members["id"][converted],
+        frame.educations["member_id"][frame.educations["category"] == _code(EducationCategory.ISLAMIC)],
+    )
+    gender = members["gender"][converted]
+    living = np.isnat(members["date_of_death"][converted])
+    married = members["marital_status"][converted] == _code(MaritalStatus.MARRIED)
+
+    columns = {
+        "members": count(np.ones_like(living)),
+        **{gender_name: count(gender == code) for code, gender_name in enumerate(GENDERS)},
+        "living": count(living),
+        "married": count(married),
+        "with_islamic_education": count(islamic),
+    }
+    return [
+        {
+            "year": int(year),
+            **{name: values[i] for name, values in columns.items()},
+            "median_age_at_conversion": median_ages[i],
+        }
+        for i, year in enumerate(cohorts)
+    ]
+
+
+def salary_percentiles(frame: AnalyticsFrame) -> Dict[str, Any]:
+    members = frame.members
+    annual = members["salary"] * members["salary_periods_per_year"]
+    known = ~np.isnan(annual)
+
+    def summary(mask: np.ndarray) -> Dict[str, Any]:
+        values = annual[mask & known]
+        if not len(values):
+            return {"count": 0, "percentiles": {str(p): None for p in SALARY_PERCENTILES}}
+        return {
+            "count": int(len(values)),
+            "percentiles": dict(zip(map(str, SALARY_PERCENTILES), np.percentile(values, SALARY_PERCENTILES).tolist())),
+        }
+
+    return {
+        "period": "yearly",
+        "all": summary(np.ones(len(annual), dtype=bool)),
+        **{gender: summary(members["gender"] == code) for code, gender in enumerate(GENDERS)},
+    }
+
+
+def marital_transitions(frame: AnalyticsFrame) -> List[Dict[str, Any]]:
+    """Counts of (year, from, to) state changes, replaying each member's marriage and divorce events in date order."""
+    events = frame.events
+    marriage, divorce = _code(EventType.MARRIAGE), _code(EventType.DIVORCE)
+    relevant = np.isin(events["event_type"], [marriage, divorce]) & ~np.isnat(events["event_date"])
+    member_ids = events["member_id"][relevant]
+    dates = events["event_date"][relevant]
+    order = np.lexsort((events["id"][relevant], dates, member_ids))
+    member_ids, dates = member_ids[order], dates[order]
+
+    to_state = np.where(events["event_type"][relevant][order] == marriage, _MARRIED, _DIVORCED)
+    from_state = np.empty_like(to_state)
+    if len(to_state):
+        from_state[0] = _SINGLE
+        from_state[1:] = to_state[:-1]
+        # Each member's first event starts from single
+        from_state[1:][member_ids[1:] != member_ids[:-1]] = _SINGLE
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+
+    keys, counts = np.unique(np.stack([years, from_state, to_state]), axis=1, return_counts=True)
+    return [
+        {"year": year, "from": _MARITAL_STATES[source], "to": _MARITAL_STATES[target], "count": n}
+        for (year, source, target), n in zip(keys.T.tolist(), counts.tolist())
+    ]
@@ -0,0 +1,207 @@
+"""
+Dashboard aggregates and their live feed.
+
+``compute_dashboard`` runs the dashboard queries. ``DashboardFeed`` keeps one
+snapshot per process and tenant: writes to the tables the dashboard reads
+publish a notification, the feed recomputes once per burst of notifications
+and pushes only the keys that changed to every connected viewer. Viewers themselves
+never query the database, so idle connections cost nothing.
+"""
+import asyncio
+from datetime import date
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.pubsub import get_broker
+from app.core.tenancy import current_tenant, tenant_scoped
+from app.db.base import SessionLocal
+from app.db.versioning import add_change_listener
+from app.models.member import Member as MemberModel
+from app.models.life_event import LifeEvent as LifeEventModel
+from app.models.business import Business as BusinessModel
+from app.models.archive import ArchivedBusiness, ArchivedMember
+from app.services.rollups import CONVERSION, trend_counts
+
+DASHBOARD_CHANNEL = "dashboard"
+DASHBOARD_TABLES = {"members", "life_events", "businesses"}
+
+
+def compute_dashboard(db: Session) -> Dict[str, Any]:
+    # Archived members are all deceased and archived businesses all inactive
+    archived_members = db.query(ArchivedMember).count()
+    total_members = db.query(MemberModel).count() + archived_members
+    active_members = db.query(MemberModel).filter(MemberModel.date_of_death == None).count()
+    deceased_members = db.query(MemberModel).filter(MemberModel.date_of_death != None).count() + archived_members
+    
+    marital_status_distribution = dict(
+        db.query(MemberModel.marital_status, func.count(MemberModel.id))
+        .group_by(MemberModel.marital_status)
+        .all()
+    )
+    
+    current_year = date.today().year
+    conversions_this_year = sum(trend_counts(
+        db, [CONVERSION], date(current_year, 1, 1), date(current_year, 12, 31)
+    ).values())
+    
+    recent_events = db.query(LifeEventModel).order_by(
+        LifeEventModel.event_date.desc()
+    ).limit(10).all()
+    
+    event_type_distribution = dict(
+        db.query(LifeEventModel.event_type, func.count(LifeEventModel.id))
+        .group_by(LifeEventModel.event_type)
+        .all()
+    )
+    
+    # NumPy is only imported once the dashboard is first computed, not at startup
+    from app.services.cohorts import age_groups as count_age_groups, get_frame
+    age_groups = count_age_groups(get_frame(db), date.today())
+    
+    # Business analytics
+    total_businesses = db.query(BusinessModel).count() + db.query(ArchivedBusiness).count()
+    active_businesses = db.query(BusinessModel).filter(BusinessModel.is_active == True).count()
+    
+    business_category_distribution = dict(
+        db.query(BusinessModel.category, func.count(BusinessModel.id))
+        .group_by(BusinessModel.category)
+        .all()
+    )
+    
+    halal_certified_businesses = db.query(BusinessModel).filter(
+        BusinessModel.halal_certified == True
+    ).count()
+    
+    zakat_accepting_businesses = db.query(BusinessModel).filter(
+        BusinessModel.accepts_zakat == True
+    ).count()
+    
+    return {
+        "total_members": total_members,
+        "active_members": active_members,
+        "deceased_members": deceased_members,
+        "total_businesses": total_businesses,
+        "active_businesses": active_businesses,
+        "halal_certified_businesses": halal_certified_businesses,
+        "zakat_accepting_businesses": zakat_accepting_businesses,
+        "marital_status_distribution": marital_status_distribution,
+        "conversions_this_year": conversions_this_year,
+        "age_distribution": age_groups,
+        "business_category_distribution": {
+            cat.value: count for cat, count in business_category_distribution.items()
+        },
+        "event_type_distribution": event_type_distribution,
+        "recent_events": [
+            {
+                "id": event.id,
+                "event_type": event.event_type.value,
+                "event_date": event.event_date.isoformat(),
+                "member_id": event.member_id
+            }
+            for event in recent_events
+        ]
+    }
+
+
+class DashboardFeed:
+    def __init__(self, debounce_seconds: float = 1.0, keepalive_seconds: float = 15.0) -> None:
+        self.debounce_seconds = debounce_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._viewers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _compute(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return jsonable_encoder(compute_dashboard(db))
+        finally:
+            db.close()
+
+    async def _ensure_started(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._watch_changes())
+            if self._snapshot is None:
+                self._snapshot = await run_in_threadpool(self._compute)
+
+    async def _watch_changes(self) -> None:
+        changed = asyncio.Event()
+
+        async def listen() -> None:
+            async for _ in get_broker().subscribe(tenant_scoped(DASHBOARD_CHANNEL)):
+                changed.set()
+
+        listener = asyncio.create_task(listen())
+        try:
+            while True:
+                await changed.wait()
+                # Coalesce a burst of writes into a single recompute
+                await asyncio.sleep(self.debounce_seconds)
+                changed.clear()
+                if not self._viewers:
+                    # Nobody is watching; recompute lazily for the next viewer
+                    self._snapshot = None
+                    continue
+                snapshot = await run_in_threadpool(self._compute)
+                previous = self._snapshot or {}
+                delta = {key: value for key, value in snapshot.items() if previous.get(key) != value}
+                self._snapshot = snapshot
+                if delta:
+                    self._broadcast({"type": "delta", "data": delta})
+        finally:
+            listener.cancel()
+
+    def _broadcast(self, message: Dict[str, Any]) -> None:
+        for queue in list(self._viewers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow viewer: drop its backlog and resend the whole state
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "snapshot", "data": self._snapshot})
+
+    async def subscribe(self) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield the current snapshot, then deltas as they happen. ``None`` is
+        yielded after ``keepalive_seconds`` of silence so callers can send a
+        keep-alive.
+        """
+        await self._ensure_started()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=32)
+        self._viewers.add(queue)
+        try:
+            yield {"type": "snapshot", "data": self._snapshot}
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._viewers.discard(queue)
+
+
+# tenant -> feed; a feed's task and recomputes run in its first viewer's tenant context
+_feeds: Dict[str, DashboardFeed] = {}
+
+
+def get_dashboard_feed() -> DashboardFeed:
+    tenant = current_tenant().slug
+    if tenant not in _feeds:
+        _feeds[tenant] = DashboardFeed()
+    return _feeds[tenant]
+
+
+def _publish_dashboard_change(tables: Set[str]) -> None:
+    changed = tables & DASHBOARD_TABLES
+    if changed:
+        get_broker().publish(tenant_scoped(DASHBOARD_CHANNEL), {"tables": sorted(changed)})
+
+
+add_change_listener(_publish_dashboard_change)
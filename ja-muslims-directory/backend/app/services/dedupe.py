@@ -0,0 +1,290 @@
+"""
+Duplicate member detection.
+
+Comparing every member with every other member is O(n²), so candidate pairs
+come from blocking instead: two members are only compared when they share a
+blocking key, i.e. the same normalized phone number, the same date of birth,
+or the same phonetic code of their Muslim or legal name within the same birth
+year. Candidate pairs are scored in NumPy. Names are compared by trigram
+(Dice) similarity over fixed-width arrays of hashed trigrams, both as spelled
+and as a vowel-less skeleton so "Muhammad" and "Mohammed" stay close. That
+similarity is combined with phone and date of birth agreement.
+
+``find_duplicates`` scans the whole table (``python -m app.services.dedupe``).
+``find_matches`` checks new records at create or import time. It looks up
+candidates through ``member_match_keys`` (see ``app.services.match_keys``).
+"""
+import argparse
+import csv
+import re
+import sys
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.services.match_keys import (
+    MATCH_FIELDS,
+    candidate_member_ids,
+    match_keys,
+    member_rows,
+    name_code,
+    name_tokens,
+    normalize_phone,
+    rebuild_match_keys,
+)
+
+# Hashed trigrams kept per name; longer names are truncated
+TRIGRAM_SLOTS = 24
+# Blocks larger than this (e.g. a placeholder phone number shared by hundreds
+# of records) say nothing about duplication and are skipped
+MAX_BLOCK_SIZE = 100
+# Pairs scored per NumPy chunk, bounding memory on large tables
+SCORE_CHUNK_SIZE = 250_000
+
+NAME_WEIGHT = 0.6
+DOB_WEIGHT = 0.2
+PHONE_WEIGHT = 0.2
+
+_VOWELS = re.compile(r"[aeiouy]+")
+_REPEATS = re.compile(r"(.)\1+")
+_GENDERS = {"male": 0, "female": 1}
+
+
+def _trigrams(words: Iterable[str]) -> List[int]:
+    hashes = []
+    for word in words:
+        padded = f"  {word} "
+        hashes.extend(zlib.crc32(padded[i:i + 3].encode()) & 0x7FFFFFFF for i in range(len(padded) - 2))
+    return list(dict.fromkeys(hashes))[:TRIGRAM_SLOTS]
+
+
+def trigram_signatures(name: Optional[str]) -> Tuple[List[int], List[int]]:
+    """Distinct trigram hashes of ``name`` and of its consonant skeleton ("mohammed" -> "mhmd")."""
+    tokens = name_tokens(name)
+    skeletons = [_REPEATS.sub(r"\1", token[0] + _VOWELS.sub("", token[1:])) for token in tokens]
+    return _trigrams(tokens), _trigrams(skeletons)
+
+
+class MemberFrame:
+    """
+    Column arrays of the match fields for ``n`` members. Missing values are -1;
+    the name signatures are (n, TRIGRAM_SLOTS) trigram hashes padded with -1.
+    """
+
+    def __init__(self, rows: Sequence[Sequence[Any]]) -> None:
+        n = len(rows)
+        self.ids = np.empty(n, dtype=np.int64)
+        self.gender = np.full(n, -1, dtype=np.int8)
+        self.dob = np.full(n, -1, dtype=np.int64)
+        self.phone = np.full(n, -1, dtype=np.int64)
+        self.signatures = {
+            (field, kind): np.full((n, TRIGRAM_SLOTS), -1, dtype=np.int32)
+            for field in ("muslim_name", "legal_name")
+            for kind in ("raw", "skeleton")
+        }
+        self.muslim_code = np.full(n, -1, dtype=np.int64)
+        self.legal_code = np.full(n, -1, dtype=np.int64)
+
+        codes: Dict[Tuple[str, int], int] = {}
+        # Names repeat a lot across a directory; derive each one's features once
+        features: Dict[Optional[str], Tuple[List[int], List[int], Optional[str]]] = {}
+        for i, (member_id, muslim_name, legal_name, gender, date_of_birth, phone_number) in enumerate(rows):
+            self.ids[i] = member_id
+            self.gender[i] = _GENDERS.get(getattr(gender, "value", gender), -1)
+            phone = normalize_phone(phone_number)
+            if phone:
+                self.phone[i] = int(phone)
+            if date_of_birth:
+                self.dob[i] = date_of_birth.toordinal()
+            for field, name, code_column in (
+                ("muslim_name", muslim_name, self.muslim_code),
+                ("legal_name", legal_name, self.legal_code),
+            ):
+                if name not in features:
+                    features[name] = (*trigram_signatures(name), name_code(name))
+                raw, skeleton, code = features[name]
+                self.signatures[field, "raw"][i, :len(raw)] = raw
+                self.signatures[field, "skeleton"][i, :len(skeleton)] = skeleton
+                if code and date_of_birth:
+                    code_column[i] = codes.setdefault((code, date_of_birth.year), len(codes))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def blocking_columns(self) -> List[np.ndarray]:
+        # Pairs of different genders score 0, so gender splits every block;
+        # rows with an unknown gender (-1) fall in with the males (0)
+        gender = np.maximum(self.gender, 0).astype(np.int64)
+        return [
+            np.where(keys >= 0, keys * 2 + gender, -1)
+            for keys in (self.phone, self.dob, self.muslim_code, self.legal_code)
+        ]
+
+
+def _block_pairs(keys: np.ndarray, max_block: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """All pairs of rows that share a key value, plus the number of oversized blocks skipped."""
+    rows = np.flatnonzero(keys >= 0)
+    order = rows[np.argsort(keys[rows], kind="stable")]
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) if len(order) else order
+    sizes = np.diff(np.r_[starts, len(order)])
+
+    lefts, rights = [], []
+    # Blocks of equal size share one set of triangle indices, so each size is one vectorized step
+    for size in np.unique(sizes[(sizes >= 2) & (sizes <= max_block)]):
+        block_starts = starts[sizes == size]
+        i, j = np.triu_indices(size, 1)
+        lefts.append(order[(block_starts[:, None] + i).ravel()])
+        rights.append(order[(block_starts[:, None] + j).ravel()])
+    if not lefts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, int((sizes > max_block).sum())
+    return np.concatenate(lefts), np.concatenate(rights), int((sizes > max_block).sum())
+
+
+def candidate_pairs(frame: MemberFrame, max_block: int = MAX_BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Distinct row pairs (left < right) sharing at least one blocking key."""
+    n = len(frame)
+    encoded = []
+    skipped = 0
+    for keys in frame.blocking_columns():
+        left, right, oversized = _block_pairs(keys, max_block)
+        skipped += oversized
+        encoded.append(np.minimum(left, right) * n + np.maximum(left, right))
+    pairs = np.unique(np.concatenate(encoded)) if encoded else np.empty(0, dtype=np.int64)
+    return pairs // max(n, 1), pairs % max(n, 1), skipped
+
+
+def _trigram_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Each row holds distinct hashes, so after sorting a row of both signatures
+    # every adjacent equal pair is one shared trigram
+    merged = np.sort(np.concatenate([a, b], axis=1), axis=1)
+    shared = ((merged[:, 1:] == merged[:, :-1]) & (merged[:, 1:] >= 0)).sum(axis=1)
+    sizes = (a >= 0).sum(axis=1) + (b >= 0).sum(axis=1)
+    return np.divide(2.0 * shared, sizes, out=np.zeros(len(a)), where=sizes > 0)
+
+
+def score_pairs(frame: MemberFrame, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    scores = np.empty(len(left), dtype=np.float64)
+    for start in range(0, len(left), SCORE_CHUNK_SIZE):
+        l = left[start:start + SCORE_CHUNK_SIZE]
+        r = right[start:start + SCORE_CHUNK_SIZE]
+        # Spelling and consonant skeleton count equally; a duplicate needs both names to agree
+        names = sum(
+            _trigram_similarity(signature[l], signature[r])
+            for signature in frame.signatures.values()
+        ) / len(frame.signatures)
+        dob = (frame.dob[l] == frame.dob[r]) & (frame.dob[l] >= 0)
+        has_phone = (frame.phone[l] >= 0) & (frame.phone[r] >= 0)
+        phone = has_phone & (frame.phone[l] == frame.phone[r])
+        # Phone only counts when both records have one
+        score = (NAME_WEIGHT * names + DOB_WEIGHT * dob + PHONE_WEIGHT * phone) / (
+            NAME_WEIGHT + DOB_WEIGHT + PHONE_WEIGHT * has_phone
+        )
+        different_gender = (frame.gender[l] >= 0) & (frame.gender[r] >= 0) & (frame.gender[l] != frame.gender[r])
+        scores[start:start + SCORE_CHUNK_SIZE] = np.where(different_gender, 0.0, score)
+    return scores
+
+
+def find_duplicates(db: Session, threshold: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Score every blocked pair of members and return those at or above
+    ``threshold`` as ``(member_id, member_id, score)``, best first.
+    """
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    frame = MemberFrame(member_rows(db))
+    left, right, skipped = candidate_pairs(frame)
+    scores = score_pairs(frame, left, right)
+    keep = np.flatnonzero(scores >= threshold)
+    keep = keep[np.argsort(-scores[keep], kind="stable")]
+    return {
+        "members": len(frame),
+        "candidates": len(left),
+        "skipped_blocks": skipped,
+        "pairs": [
+            (int(frame.ids[left[k]]), int(frame.ids[right[k]]), round(float(scores[k]), 4))
+            for k in keep
+        ],
+    }
+
+
+def find_matches(
+    db: Session, records: Sequence[Dict[str, Any]], threshold: Optional[float] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Check new member records against existing members and against each other.
+
+    Returns, per record, the matches at or above ``threshold`` (best first):
+    ``{"score", "member"}`` for an existing member or ``{"score", "index"}``
+    for another record in ``records``.
+    """
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    keys = set()
+    for record in records:
+        keys |= match_keys(*(record.get(field) for field in ("muslim_name", "legal_name", "date_of_birth", "phone_number")))
+
+    members = member_rows(db, sorted(candidate_member_ids(db, keys)))
+
+    # New records take negative IDs so they cannot collide with members
+    frame = MemberFrame(
+        [(-1 - index, *(record.get(field) for field in MATCH_FIELDS)) for index, record in enumerate(records)]
+        + members
+    )
+    left, right, _ = candidate_pairs(frame)
+    # Pairs of two existing members are not this check's business
+    involved = left < len(records)
+    left, right = left[involved], right[involved]
+    scores = score_pairs(frame, left, right)
+
+    by_id = {row[0]: row for row in members}
+    matches: List[List[Dict[str, Any]]] = [[] for _ in records]
+    for l, r, score in zip(left, right, scores):
+        if score < threshold:
+            continue
+        score = round(float(score), 4)
+        if r < len(records):
+            matches[l].append({"score": score, "index": int(r)})
+            matches[r].append({"score": score, "index": int(l)})
+        else:
+            row = by_id[int(frame.ids[r])]
+            matches[l].append({"score": score, "member": dict(zip(("id", *MATCH_FIELDS), row))})
+    for record_matches in matches:
+        record_matches.sort(key=lambda match: -match["score"])
+    return matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find likely duplicate members.")
+    parser.add_argument("--threshold", type=float, default=settings.DEDUPE_THRESHOLD)
+    parser.add_argument("--output", help="Write the pairs to this CSV file instead of stdout")
+    parser.add_argument("--rebuild-keys", action="store_true", help="Rebuild member_match_keys first")
+    args = parser.parse_args()
+
+    from app.db.base import SessionLocal
+    # The scan is read-only and may run on a replica; rebuilding the keys pins it to the primary
+    db = SessionLocal(info={"read_only": True})
+    try:
+        if args.rebuild_keys:
+            added = rebuild_match_keys(db)
+            db.commit()
+            print(f"Rebuilt member_match_keys ({added} keys)", file=sys.stderr)
+        result = find_duplicates(db, args.threshold)
+    finally:
+        db.close()
+
+    print(
+        f"{result['members']} members, {result['candidates']} candidate pairs, "
+        f"{len(result['pairs'])} above {args.threshold}, {result['skipped_blocks']} oversized blocks skipped",
+        file=sys.stderr
+    )
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.writer(output)
+    writer.writerow(["member_id", "duplicate_id", "score"])
+    writer.writerows(result["pairs"])
+    if args.output:
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Demographics cube: living members counted per combination of masjid, gender,
+age group, marital status and education.
+
+``demographic_cube`` only has a row for each non-empty combination, so its
+size is bounded by the number of masjids, not by the number of members (a few
+thousand cells for dozens of masjids). Queries filter and group the cube
+(``query_cube``) instead of members, educations and masjids. The parish is
+taken from the masjid when querying.
+
+``age_group`` is the dashboard's band for the age a member reaches this
+calendar year, so cells only go stale when the year turns. The year is part
+of every cell, and the first query of a new year recounts the cube.
+``education`` is ``none``, ``formal``, ``islamic`` or ``both``, from the
+categories of the member's education entries.
+
+The cube is maintained like ``event_rollups`` (``app.services.rollups``):
+flush listeners apply the change in the contribution of every member a flush
+touches, and bulk updates use ``bulk_member_update``/``bulk_education_update``.
+``rebuild_cube`` recounts everything.
+
+Usage (from the backend directory):
+    python -m app.services.demographics
+"""
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.db.aggregates import BulkAggregateUpdate, apply_count_delta, id_chunks, replace_counts
+from app.db.base import SessionLocal
+from app.models.demographic_cell import DemographicCell
+from app.models.education import Education, EducationCategory
+from app.models.masjid import Masjid
+from app.models.member import Member
+
+_table = DemographicCell.__table__
+_masjids = Masjid.__table__
+
+# Oldest age in each band, as on the dashboard; the last is open-ended
+AGE_GROUPS = {"0-18": 18, "19-30": 30, "31-45": 45, "46-60": 60, "60+": None}
+EDUCATIONS = ("none", "formal", "islamic", "both")
+DIMENSIONS = ("parish", "masjid", "gender", "age_group", "marital_status", "education")
+
+# Fields whose changes move a member to another cell
+MEMBER_FIELDS = ("masjid_id", "gender", "date_of_birth", "marital_status", "date_of_death")
+EDUCATION_FIELDS = ("member_id", "category")
+
+_PENDING = "demographics_before_flush"
+
+
+def _education(categories: Set[str]) -> str:
+    if {EducationCategory.FORMAL.value, EducationCategory.ISLAMIC.value} <= categories:
+        return "both"
+    return next(iter(categories)) if categories else "none"
+
+
+def _age_group(age: int) -> str:
+    for label, oldest in AGE_GROUPS.items():
+        if oldest is None or age <= oldest:
+            return label
+
+
+def member_contributions(connection: Connection, member_ids: Optional[Iterable[int]] = None) -> Counter:
+    """Cube cells of ``member_ids`` (every member if None); deceased members are not counted."""
+    year = date.today().year
+    counts: Counter = Counter()
+    for chunk in id_chunks(member_ids):
+        members = select(
+            Member.id, Member.masjid_id, Member.gender, Member.date_of_birth, Member.marital_status
+        ).where(Member.date_of_death.is_(None))
+        educations = select(Education.member_id, Education.category).distinct()
+        if chunk is not None:
+            members = members.where(Member.id.in_(chunk))
+            educations = educations.where(Education.member_id.in_(chunk))
+        categories: Dict[int, Set[str]] = defaultdict(set)
+        for member_id, category in connection.execute(educations):
+            categories[member_id].add(category.value)
+        for member_id, masjid_id, gender, born, marital_status in connection.execute(members):
+            counts[(
+                year,
+                masjid_id or 0,
+                gender.value,
+                _age_group(year - born.year),
+                marital_status.value if marital_status else "unknown",
+                _education(categories.get(member_id, set())),
+            )] += 1
+    return counts
+
+
+def education_contributions(connection: Connection, education_ids: Iterable[int]) -> Counter:
+    """Cube cells of the members owning ``education_ids``."""
+    member_ids = set()
+    for chunk in id_chunks(education_ids):
+        member_ids.update(connection.execute(select(Education.member_id).where(Education.id.in_(chunk))).scalars())
+    return member_contributions(connection, member_ids)
+
+
+def rebuild_cube(db: Session) -> int:
+    """Recount ``demographic_cube`` from scratch, e.g. for data written before it existed."""
+    connection = db.connection()
+    return replace_counts(connection, _table, member_contributions(connection))
+
+
+def bulk_member_update() -> BulkAggregateUpdate:
+    return BulkAggregateUpdate(_table, member_contributions)
+
+
+def bulk_education_update() -> BulkAggregateUpdate:
+    return BulkAggregateUpdate(_table, education_contributions)
+
+
+def _changed(obj, fields: Sequence[str]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, "before_flush")
+def _cube_before_flush(session: Session, flush_context, instances) -> None:
+    member_ids: Set[int] = set()
+    for obj in session.new:
+        if isinstance(obj, Education) and obj.member_id is not None:
+            member_ids.add(obj.member_id)
+    for obj in session.dirty:
+        if isinstance(obj, Education) and _changed(obj, EDUCATION_FIELDS):
+            member_ids.update(member_id for member_id in inspect(obj).attrs.member_id.history.sum() if member_id)
+        elif isinstance(obj, Member) and _changed(obj, MEMBER_FIELDS):
+            member_ids.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Education):
+            member_ids.add(obj.member_id)
+        elif isinstance(obj, Member):
+            member_ids.add(obj.id)
+
+    session.info.pop(_PENDING, None)
+    if member_ids:
+        session.info[_PENDING] = (member_ids, member_contributions(session.connection(), member_ids))
+
+
+@event.listens_for(Session, "after_flush")
+def _cube_after_flush(session: Session, flush_context) -> None:
+    member_ids, before = session.info.pop(_PENDING, (set(), Counter()))
+    # Members created in this flush, and educations attached to them, only have ids now
+    for obj in session.new:
+        if isinstance(obj, Member):
+            member_ids.add(obj.id)
+        elif isinstance(obj, Education):
+            member_ids.add(obj.member_id)
+    if member_ids:
+        connection = session.connection()
+        apply_count_delta(connection, _table, before, member_contributions(connection, member_ids))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def _is_stale(db: Session) -> bool:
+    """Whether the cube's age groups are from an earlier year."""
+    oldest = db.execute(select(func.min(_table.c.year))).scalar()
+    return oldest is not None and oldest < date.today().year
+
+
+def _query_cube(db: Session, filters: Dict[str, List[Any]], group_by: Sequence[str]) -> Dict[str, Any]:
+    year = date.today().year
+    group_by = [dimension for dimension in DIMENSIONS if dimension in group_by]
+    columns = {
+        "parish": [_masjids.c.parish],
+        "masjid": [_table.c.masjid_id, _masjids.c.name],
+        "gender": [_table.c.gender],
+        "age_group": [_table.c.age_group],
+        "marital_status": [_table.c.marital_status],
+        "education": [_table.c.education],
+    }
+    selected = [column for dimension in group_by for column in columns[dimension]]
+    query = select(*selected, func.sum(_table.c.count)).select_from(
+        _table.outerjoin(_masjids, _masjids.c.id == _table.c.masjid_id)
+    ).where(_table.c.year == year)
+    for dimension, values in filters.items():
+        if not values:
+            continue
+        if dimension == "parish":
+            query = query.where(_masjids.c.parish.in_(values))
+        elif dimension == "masjid":
+            query = query.where(_table.c.masjid_id.in_(values))
+        else:
+            query = query.where(_table.c[dimension].in_(values))
+    if selected:
+        query = query.group_by(*selected)
+
+    names = []
+    for dimension in group_by:
+        names.extend((dimension, "masjid_name") if dimension == "masjid" else (dimension,))
+    cells = [{**dict(zip(names, row[:-1])), "count": row[-1]} for row in db.execute(query) if row[-1]]
+    cells.sort(key=lambda cell: -cell["count"])
+    return {"total": sum(cell["count"] for cell in cells), "group_by": group_by, "cells": cells}
+
+
+def query_cube(db: Session, filters: Dict[str, List[Any]], group_by: Sequence[str]) -> Dict[str, Any]:
+    """
+    Living member counts matching ``filters`` (dimension -> accepted values;
+    ``masjid`` takes masjid ids, 0 for none), one cell per combination of
+    ``group_by``.
+    """
+    if not _is_stale(db):
+        return _query_cube(db, filters, group_by)
+    # New year: recount on the primary and read from there, since ``db`` may be
+    # a replica or hold a snapshot from before the recount
+    with SessionLocal() as session:
+        if _is_stale(session):
+            rebuild_cube(session)
+            session.commit()
+        return _query_cube(session, filters, group_by)
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        rows = rebuild_cube(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt demographic_cube with {rows} cells")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Prebuilt public directory snapshots.
+
+The masjid and restaurant directories change rarely, but every view through
+the API decodes a JWT, looks up the user, queries and serializes. This module
+writes the public listings as static JSON instead, one file per parish and
+filter facet:
+
+    {SNAPSHOT_DIR}/manifest.json
+    {SNAPSHOT_DIR}/masjids/<version>/<parish>/<facet>.json  (+ .json.gz, .json.br)
+
+With several tenants each one has its own ``{SNAPSHOT_DIR}/<tenant>/``.
+
+``<parish>`` is ``all`` or a parish slug. ``<facet>`` is ``all``, or a masjid
+type (``masjid``/``musalla``), or ``halal`` for restaurants. The version is a
+hash of the listing's content. Versioned files never change once written and
+can be cached forever. Only the small manifest, which points at the current
+version, must be revalidated. Gzip and Brotli variants are written next to
+each file (Brotli only when the ``brotli`` package is installed). They are
+served with ``Content-Encoding`` at ``/directory`` (``PrecompressedStaticFiles``),
+or by a web server that supports precompressed files. With several tenants,
+``/directory`` serves the directory of the tenant the request resolves to.
+
+A commit that touches a source table schedules a rebuild of the affected
+listings after ``SNAPSHOT_DEBOUNCE_SECONDS``. Bursts of writes coalesce into one
+rebuild. Listings carry no member details apart from affiliation counts.
+
+Usage (from the backend directory):
+    python -m app.services.directory_snapshots
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+from app.core.config import settings
+from app.core.tenancy import current_tenant, tenant_path, tenants, use_tenant
+from app.db.base import SessionLocal
+from app.db.versioning import add_change_listener
+from app.models.business import Business, BusinessCategory
+from app.models.masjid import Masjid
+from app.models.member import Member
+from app.models.restaurant import Restaurant
+
+try:
+    import brotli
+except ImportError:  # optional; gzip variants are always written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+MASJID_FIELDS = (
+    "id", "name", "type", "address", "city", "parish", "postal_code", "phone", "email", "website",
+    "established_year", "capacity", "facilities", "prayer_times_info", "jummah_time", "activities",
+)
+RESTAURANT_FIELDS = (
+    "id", "name", "address", "parish", "phone", "email", "website", "is_halal_certified",
+    "has_halal_options", "has_vegetarian_options", "has_vegan_options", "cuisine_types",
+    "opening_hours", "description", "business_id",
+)
+
+
+def parish_slug(parish: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (parish or "").lower()).strip("-") or "unknown"
+
+
+def _masjid_rows(db: Session) -> List[Dict[str, Any]]:
+    counts = dict(
+        db.query(Member.masjid_id, func.count(Member.id))
+        .filter(Member.masjid_id.isnot(None))
+        .group_by(Member.masjid_id)
+        .all()
+    )
+    rows = []
+    for masjid in db.query(Masjid).order_by(Masjid.name, Masjid.id):
+        row = {field: getattr(masjid, field) for field in MASJID_FIELDS}
+        row["affiliated_members_count"] = counts.get(masjid.id, 0)
+        rows.append(row)
+    return rows
+
+
+def _masjid_facets(row: Dict[str, Any]) -> List[str]:
+    return [row["type"]]
+
+
+def _restaurant_rows(db: Session) -> List[Dict[str, Any]]:
+    restaurants = db.query(Restaurant).options(joinedload(Restaurant.business)).order_by(Restaurant.name).all()
+    rows = []
+    for restaurant in restaurants:
+        row = {field: getattr(restaurant, field) for field in RESTAURANT_FIELDS}
+        row["business_name"] = restaurant.business.name if restaurant.business else None
+        rows.append(row)
+    # Muslim-owned restaurant businesses without their own restaurant entry, as in read_restaurants
+    listed = {restaurant.business_id for restaurant in restaurants if restaurant.business_id}
+    businesses = db.query(Business).filter(
+        Business.category == BusinessCategory.RESTAURANT,
+        Business.is_active == True,
+    ).order_by(Business.name)
+    for business in businesses:
+        if business.id in listed:
+            continue
+        rows.append({
+            "id": 0,
+            "name": business.name,
+            "address": business.address,
+            "parish": business.parish,
+            "phone": business.phone_number,
+            "email": business.email,
+            "website": business.website,
+            "is_halal_certified": business.halal_certified,
+            "has_halal_options": business.halal_certified,
+            "has_vegetarian_options": False,
+            "has_vegan_options": False,
+            "cuisine_types": None,
+            "opening_hours": business.operating_hours,
+            "description": business.description,
+            "business_id": business.id,
+            "business_name": business.name,
+        })
+    return rows
+
+
+def _restaurant_facets(row: Dict[str, Any]) -> List[str]:
+    return ["halal"] if row["is_halal_certified"] or row["has_halal_options"] else []
+
+
+class Listing:
+    def __init__(
+        self,
+        name: str,
+        tables: Set[str],
+        rows: Callable[[Session], List[Dict[str, Any]]],
+        facets: Callable[[Dict[str, Any]], List[str]],
+    ) -> None:
+        self.name = name
+        self.tables = tables
+        self.rows = rows
+        self.facets = facets
+
+
+LISTINGS = {
+    "masjids": Listing("masjids", {"masjids", "members"}, _masjid_rows, _masjid_facets),
+    "restaurants": Listing("restaurants", {"restaurants", "businesses"}, _restaurant_rows, _restaurant_facets),
+}
+
+
+def _files(listing: Listing, rows: List[Dict[str, Any]]) -> Dict[str, bytes]:
+    """``{"<parish>/<facet>": json bytes}`` for every parish and facet combination."""
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in jsonable_encoder(rows):
+        facets = ["all"] + listing.facets(row)
+        for parish in ("all", parish_slug(row["parish"])):
+            for facet in facets:
+                groups[f"{parish}/{facet}"].append(row)
+    groups.setdefault("all/all", [])
+    return {key: json.dumps(items, separators=(",", ":")).encode() for key, items in sorted(groups.items())}
+
+
+def _write_variants(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+    with open(path + ".gz", "wb") as f:
+        # mtime=0 keeps the bytes stable for identical content
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_listing(db: Session, listing: Listing, root: str) -> Dict[str, Any]:
+    files = _files(listing, listing.rows(db))
+    digest = hashlib.sha1()
+    for key, data in files.items():
+        digest.update(key.encode() + b"\0" + data)
+    version = digest.hexdigest()[:16]
+
+    target = os.path.join(root, listing.name, version)
+    if not os.path.isdir(target):
+        staging = tempfile.mkdtemp(prefix=f".{version}-", dir=os.path.join(root, listing.name))
+        try:
+            for key, data in files.items():
+                path = os.path.join(staging, f"{key}.json")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _write_variants(path, data)
+            os.chmod(staging, 0o755)
+            os.rename(staging, target)
+        except OSError:
+            # Another worker published the same version first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+    return {
+        "version": version,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "files": {key: f"{listing.name}/{version}/{key}.json" for key in files},
+    }
+
+
+def _prune(root: str, listing: Listing, current: str) -> None:
+    directory = os.path.join(root, listing.name)
+    versions = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_dir() and not entry.name.startswith(".")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    # Keep a few old versions for clients still holding the previous manifest
+    for entry in versions[settings.SNAPSHOT_KEEP_VERSIONS:]:
+        if entry.name != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# One lock per snapshot directory, so tenants build independently
+_build_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+def build_snapshots(names: Set[str] = frozenset(LISTINGS)) -> Dict[str, Any]:
+    """Rebuild the current tenant's named listings and point its manifest at them."""
+    root = tenant_path(settings.SNAPSHOT_DIR)
+    os.makedirs(root, exist_ok=True)
+    with _build_locks[root]:
+        db = SessionLocal()
+        try:
+            built = {}
+            for name in sorted(names):
+                os.makedirs(os.path.join(root, name), exist_ok=True)
+                built[name] = build_listing(db, LISTINGS[name], root)
+        finally:
+            db.close()
+
+        manifest_path = os.path.join(root, MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        for name, entry in built.items():
+            if manifest.get(name, {}).get("version") != entry["version"]:
+                manifest[name] = entry
+        fd, staging = tempfile.mkstemp(dir=root, prefix=".manifest-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.chmod(staging, 0o644)
+        os.replace(staging, manifest_path)
+
+        for name, entry in built.items():
+            _prune(root, LISTINGS[name], entry["version"])
+    return manifest
+
+
+class _Debouncer:
+    def __init__(self, tenant: str) -> None:
+        self.tenant = tenant
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+
+    def schedule(self, names: Set[str]) -> None:
+        with self._lock:
+            self._pending |= names
+            if self._timer is None:
+                self._timer = threading.Timer(settings.SNAPSHOT_DEBOUNCE_SECONDS, self._run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _run(self) -> None:
+        with self._lock:
+            names, self._pending, self._timer = self._pending, set(), None
+        try:
+            with use_tenant(self.tenant):
+                build_snapshots(names)
+        except Exception:
+            logger.exception("Rebuilding directory snapshots for %s failed", self.tenant)
+
+
+_debouncers: Dict[str, _Debouncer] = {}
+_debouncers_lock = threading.Lock()
+
+
+def _debouncer() -> _Debouncer:
+    tenant = current_tenant().slug
+    with _debouncers_lock:
+        if tenant not in _debouncers:
+            _debouncers[tenant] = _Debouncer(tenant)
+        return _debouncers[tenant]
+
+
+def _rebuild_on_change(tables: Set[str]) -> None:
+    names = {name for name, listing in LISTINGS.items() if listing.tables & tables}
+    if names and settings.SNAPSHOTS_ENABLED:
+        _debouncer().schedule(names)
+
+
+add_change_listener(_rebuild_on_change)
+
+
+def ensure_snapshots() -> None:
+    """Build the snapshots in the background for tenants that have none yet (e.g. a fresh checkout)."""
+    if not settings.SNAPSHOTS_ENABLED:
+        return
+    for slug in tenants:
+        with use_tenant(slug):
+            if not os.path.exists(os.path.join(tenant_path(settings.SNAPSHOT_DIR), MANIFEST)):
+                _debouncer().schedule(set(LISTINGS))
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Serve ``x.json.br``/``x.json.gz`` for ``x.json`` when the client accepts
+    it, from the request's tenant's directory: ``/directory/manifest.json`` is
+    the current tenant's manifest, and no tenant can read another's files.
+    """
+
+    def lookup_path(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        for root in self.all_directories:
+            directory = os.path.realpath(tenant_path(root))
+            full_path = os.path.realpath(os.path.join(directory, path))
+            # Nor anything outside it
+            if os.path.commonpath([full_path, directory]) != directory:
+                continue
+            try:
+                return full_path, os.stat(full_path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return "", None
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        accepted = dict(scope["headers"]).get(b"accept-encoding", b"").decode().lower()
+        versioned = not str(full_path).endswith(MANIFEST)
+        headers = {
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "public, max-age=31536000, immutable" if versioned else "no-cache",
+        }
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            variant = f"{full_path}{suffix}"
+            if encoding in accepted and os.path.exists(variant):
+                headers["Content-Encoding"] = encoding
+                return FileResponse(variant, status_code=status_code, headers=headers, media_type="application/json")
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers.update(headers)
+        return response
+
+
+def main() -> None:
+    manifest = build_snapshots()
+    for name, entry in manifest.items():
+        print(f"{name}: version {entry['version']}, {len(entry['files'])} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Blocking keys for duplicate member detection.
+
+A member's keys are its normalized phone number, its date of birth, and the
+phonetic code of each name combined with the birth year. Members that share a
+key are duplicate candidates. ``member_match_keys`` indexes the keys of every
+member so a new record can find its candidates with one indexed lookup; an
+``after_flush`` listener keeps it in step with the members table.
+
+This module has no NumPy dependency so the listener can always be loaded;
+the scoring lives in ``app.services.dedupe``.
+"""
+import re
+import unicodedata
+from datetime import date
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.member import Member
+from app.models.member_match_key import MemberMatchKey
+
+_keys_table = MemberMatchKey.__table__
+
+# Member columns that feed the blocking keys and the score
+MATCH_FIELDS = ("muslim_name", "legal_name", "gender", "date_of_birth", "phone_number")
+
+_NON_LETTERS = re.compile(r"[^a-z]+")
+_NON_DIGITS = re.compile(r"\D+")
+_SOUNDEX = {
+    char: digit
+    for digit, chars in {"1": "bfpv", "2": "cgjkqsxz", "3": "dt", "4": "l", "5": "mn", "6": "r"}.items()
+    for char in chars
+}
+
+
+def name_tokens(name: Optional[str]) -> List[str]:
+    """Lower-case ASCII words of ``name`` with accents and punctuation removed."""
+    if not name:
+        return []
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return _NON_LETTERS.sub(" ", ascii_name.lower()).split()
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Last seven digits of ``phone``, so "(876) 555-1234" and "5551234" agree."""
+    digits = _NON_DIGITS.sub("", phone or "")
+    return digits[-7:] if len(digits) >= 7 else None
+
+
+def soundex(token: str) -> str:
+    if not token:
+        return ""
+    code = token[0].upper()
+    previous = _SOUNDEX.get(token[0], "")
+    for char in token[1:]:
+        digit = _SOUNDEX.get(char, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if char not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def name_code(name: Optional[str]) -> Optional[str]:
+    """Phonetic code of the first and last word, independent of their order."""
+    tokens = name_tokens(name)
+    if not tokens:
+        return None
+    return "".join(sorted({soundex(tokens[0]), soundex(tokens[-1])}))
+
+
+def match_keys(
+    muslim_name: Optional[str],
+    legal_name: Optional[str],
+    date_of_birth: Optional[date],
+    phone_number: Optional[str],
+) -> Set[str]:
+    keys = set()
+    phone = normalize_phone(phone_number)
+    if phone:
+        keys.add(f"tel:{phone}")
+    if date_of_birth:
+        keys.add(f"dob:{date_of_birth.isoformat()}")
+    for name in (muslim_name, legal_name):
+        code = name_code(name)
+        if code and date_of_birth:
+            keys.add(f"name:{code}:{date_of_birth.year}")
+    return keys
+
+
+def member_rows(db: Session, member_ids: Optional[Iterable[int]] = None) -> List[tuple]:
+    columns = [Member.id] + [getattr(Member, field) for field in MATCH_FIELDS]
+    if member_ids is None:
+        return [tuple(row) for row in db.execute(select(*columns).order_by(Member.id))]
+    member_ids = list(member_ids)
+    rows = []
+    for start in range(0, len(member_ids), settings.BATCH_CHUNK_SIZE):
+        chunk = member_ids[start:start + settings.BATCH_CHUNK_SIZE]
+        rows.extend(tuple(row) for row in db.execute(select(*columns).where(Member.id.in_(chunk))))
+    return rows
+
+
+def candidate_member_ids(db: Session, keys: Iterable[str]) -> Set[int]:
+    """IDs of members sharing at least one of ``keys``."""
+    keys = sorted(set(keys))
+    member_ids = set()
+    for start in range(0, len(keys), settings.BATCH_CHUNK_SIZE):
+        member_ids.update(db.execute(
+            select(_keys_table.c.member_id).where(_keys_table.c.key.in_(keys[start:start + settings.BATCH_CHUNK_SIZE]))
+        ).scalars())
+    return member_ids
+
+
+def refresh_match_keys(session: Session, member_ids: Iterable[int]) -> None:
+    """Recompute the blocking keys of ``member_ids`` from their current rows."""
+    member_ids = sorted(set(member_ids))
+    if not member_ids:
+        return
+    connection = session.connection()
+    for start in range(0, len(member_ids), settings.BATCH_CHUNK_SIZE):
+        chunk = member_ids[start:start + settings.BATCH_CHUNK_SIZE]
+        connection.execute(delete(_keys_table).where(_keys_table.c.member_id.in_(chunk)))
+    rows = [
+        {"member_id": row[0], "key": key}
+        for row in member_rows(session, member_ids)
+        for key in match_keys(row[1], row[2], row[4], row[5])
+    ]
+    if rows:
+        connection.execute(insert(_keys_table), rows)
+
+
+def rebuild_match_keys(db: Session) -> int:
+    """Rebuild ``member_match_keys`` for the whole table, e.g. for members created before it existed."""
+    connection = db.connection()
+    connection.execute(delete(_keys_table))
+    rows = [
+        {"member_id": row[0], "key": key}
+        for row in member_rows(db)
+        for key in match_keys(row[1], row[2], row[4], row[5])
+    ]
+    if rows:
+        connection.execute(insert(_keys_table), rows)
+    return len(rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_keys_after_flush(session: Session, flush_context) -> None:
+    changed = {obj.id for obj in session.new if isinstance(obj, Member)}
+    for obj in session.dirty:
+        if isinstance(obj, Member):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in MATCH_FIELDS):
+                changed.add(obj.id)
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, Member)}
+
+    if deleted:
+        session.connection().execute(
+            delete(_keys_table).where(_keys_table.c.member_id.in_(sorted(deleted)))
+        )
+    if changed - deleted:
+        refresh_match_keys(session, changed - deleted)
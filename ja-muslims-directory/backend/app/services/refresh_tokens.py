@@ -0,0 +1,113 @@
+"""
+Refresh tokens with rotation and server-side revocation.
+
+Login costs a bcrypt verify; refreshing costs an HMAC of the presented secret
+and one primary-key lookup of its row (joined to the user). Every refresh
+revokes the presented token and issues a new one in the same family. If a
+revoked token is presented again after the reuse grace window, someone else
+holds a copy of it, so the whole family is revoked and the user has to log in
+again.
+"""
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.security import hash_token_secret, new_token_secret, verify_token_secret
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+def _parse(token: str) -> Tuple[str, str]:
+    token_id, _, secret = token.partition(".")
+    if not token_id or not secret:
+        raise InvalidRefreshToken("Malformed refresh token")
+    return token_id, secret
+
+
+def issue_refresh_token(db: Session, user: User, family_id: Optional[str] = None) -> Tuple[RefreshToken, str]:
+    """Add a new refresh token for ``user`` to ``db`` (not committed). Returns the row and the client's token."""
+    now = datetime.utcnow()
+    secret = new_token_secret()
+    row = RefreshToken(
+        id=secrets.token_urlsafe(16),
+        user_id=user.id,
+        family_id=family_id or secrets.token_urlsafe(16),
+        token_hash=hash_token_secret(secret),
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    if family_id is None:
+        # A new login: drop this user's expired tokens while we are here
+        db.query(RefreshToken).filter(
+            RefreshToken.user_id == user.id, RefreshToken.expires_at < now
+        ).delete(synchronize_session=False)
+    db.add(row)
+    return row, f"{row.id}.{secret}"
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[User, str]:
+    """Check ``token``, revoke it and issue its replacement (not committed)."""
+    token_id, secret = _parse(token)
+    found = (
+        db.query(RefreshToken, User)
+        .join(User, User.id == RefreshToken.user_id)
+        .filter(RefreshToken.id == token_id)
+        .first()
+    )
+    if found is None or not verify_token_secret(secret, found[0].token_hash):
+        raise InvalidRefreshToken("Unknown refresh token")
+    row, user = found
+    now = datetime.utcnow()
+    if row.expires_at <= now:
+        raise InvalidRefreshToken("Refresh token expired")
+    if not user.is_active:
+        raise InvalidRefreshToken("Inactive user")
+    if row.revoked_at is not None:
+        _reject_reuse(db, row, now)
+
+    new_row, new_token = issue_refresh_token(db, user, row.family_id)
+    # Conditional on the token still being live, so two concurrent refreshes cannot both rotate it
+    rotated = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == row.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now, replaced_by=new_row.id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if rotated != 1:
+        db.expunge(new_row)
+        raise InvalidRefreshToken("Refresh token already used")
+    return user, new_token
+
+
+def _reject_reuse(db: Session, row: RefreshToken, now: datetime) -> None:
+    grace = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+    if row.replaced_by is not None and now - row.revoked_at > grace:
+        revoke_family(db, row.family_id)
+        db.commit()
+    raise InvalidRefreshToken("Refresh token already used")
+
+
+def revoke_family(db: Session, family_id: str) -> int:
+    return db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def revoke_refresh_token(db: Session, token: str) -> None:
+    """Log out: revoke the family of ``token`` (not committed). Unknown tokens are ignored."""
+    try:
+        token_id, secret = _parse(token)
+    except InvalidRefreshToken:
+        return
+    row = db.query(RefreshToken).filter(RefreshToken.id == token_id).first()
+    if row is not None and verify_token_secret(secret, row.token_hash):
+        revoke_family(db, row.family_id)
+
@@ -0,0 +1,256 @@
+"""
+Minimal PDF and XLSX writers for generated reports.
+
+A report is a ``Document``: a title and a list of tables (``Section``). PDF
+pages set each table in a fixed-width font, and XLSX gets one worksheet per
+table. Both writers use only the standard library, and the same document
+always gives the same bytes, so identical reports share one stored file
+(see ``app.services.reports``).
+"""
+import io
+import zipfile
+from typing import Any, List, Optional, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+
+class Section:
+    def __init__(
+        self, title: str, columns: Sequence[str], rows: Sequence[Sequence[Any]], note: Optional[str] = None
+    ) -> None:
+        self.title = title
+        self.columns = list(columns)
+        self.rows = [list(row) for row in rows]
+        self.note = note
+
+
+class Document:
+    def __init__(self, title: str, subtitle: str, sections: List[Section]) -> None:
+        self.title = title
+        self.subtitle = subtitle
+        self.sections = sections
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return str(value)
+
+
+# PDF
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+LINE_HEIGHT = 13
+TABLE_FONT_SIZE = 9
+# Courier advances 0.6 em per character
+TABLE_CHARS_PER_LINE = int((PAGE_WIDTH - 2 * MARGIN) / (0.6 * TABLE_FONT_SIZE))
+
+
+def _pdf_string(text: str) -> str:
+    # The standard fonts use WinAnsi encoding; anything outside Latin-1 is replaced
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def _table_lines(section: Section) -> List[str]:
+    cells = [section.columns] + [[_text(value) for value in row] for row in section.rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(section.columns))]
+    # Shrink the widest columns until the table fits the page
+    while sum(widths) + 2 * (len(widths) - 1) > TABLE_CHARS_PER_LINE and max(widths) > 6:
+        widths[widths.index(max(widths))] -= 1
+
+    # Text left, numbers right
+    numeric = [bool(section.rows) and _is_number(value) for value in (section.rows or [[]])[0]]
+
+    def line(row: List[str]) -> str:
+        parts = []
+        for i, (value, width) in enumerate(zip(row, widths)):
+            value = value if len(value) <= width else value[:width - 1] + "~"
+            parts.append(value.rjust(width) if i < len(numeric) and numeric[i] else value.ljust(width))
+        return "  ".join(parts).rstrip()
+
+    return [line(cells[0]), "-" * min(TABLE_CHARS_PER_LINE, sum(widths) + 2 * (len(widths) - 1))] + [
+        line(row) for row in cells[1:]
+    ]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def render_pdf(document: Document) -> bytes:
+    # (font, size, text) lines, then split into pages
+    lines = [("F2", 18, document.title), ("F1", 10, document.subtitle), ("F1", 10, "")]
+    for section in document.sections:
+        lines.append(("F2", 12, section.title))
+        if section.note:
+            lines.append(("F1", 9, section.note))
+        lines.extend(("F3", TABLE_FONT_SIZE, text) for text in _table_lines(section))
+        lines.append(("F1", 10, ""))
+
+    per_page = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+    pages = [lines[start:start + per_page] for start in range(0, len(lines), per_page)] or [[]]
+
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    page_tree = add(b"")
+    fonts = {
+        name: add(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>".encode())
+        for name, base in (("F1", "Helvetica"), ("F2", "Helvetica-Bold"), ("F3", "Courier"))
+    }
+    resources = "<< /Font << " + " ".join(f"/{name} {number} 0 R" for name, number in fonts.items()) + " >> >>"
+    page_numbers = []
+    for index, page in enumerate(pages):
+        commands = ["BT"]
+        y = PAGE_HEIGHT - MARGIN
+        for font, size, text in page:
+            commands.append(f"/{font} {size} Tf 1 0 0 1 {MARGIN} {y} Tm {_pdf_string(text)} Tj")
+            y -= LINE_HEIGHT + (6 if size > 12 else 0)
+        footer = f"{index + 1} / {len(pages)}"
+        commands.append(f"/F1 8 Tf 1 0 0 1 {PAGE_WIDTH - MARGIN - 40} {MARGIN // 2} Tm ({footer}) Tj")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_numbers.append(add(
+            f"<< /Type /Page /Parent {page_tree} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources {resources} /Contents {content} 0 R >>".encode()
+        ))
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {page_tree} 0 R >>".encode()
+    objects[page_tree - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in page_numbers)}] /Count {len(page_numbers)} >>"
+    ).encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+# XLSX
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_SHEET_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cell(reference: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if _is_number(value):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def _sheet_xml(rows: List[List[Any]]) -> str:
+    body = []
+    for row_number, row in enumerate(rows, start=1):
+        cells = "".join(_cell(f"{_column_letter(i)}{row_number}", value) for i, value in enumerate(row))
+        body.append(f'<row r="{row_number}">{cells}</row>')
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{_MAIN_NS}">'
+        f'<sheetData>{"".join(body)}</sheetData></worksheet>'
+    )
+
+
+def _sheet_names(sections: List[Section]) -> List[str]:
+    names = []
+    for section in sections:
+        base = "".join(char for char in section.title if char not in "[]:*?/\\")[:31] or "Sheet"
+        name, suffix = base, 2
+        while name.lower() in (existing.lower() for existing in names):
+            name = f"{base[:28]} {suffix}"
+            suffix += 1
+        names.append(name)
+    return names
+
+
+def render_xlsx(document: Document) -> bytes:
+    sheets = [
+        Section("Summary", ["Report", document.title], [["", document.subtitle]])
+    ] + document.sections
+    names = _sheet_names(sheets)
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        def write(path: str, text: str) -> None:
+            # A fixed timestamp keeps the archive bytes identical for identical content
+            archive.writestr(zipfile.ZipInfo(path, date_time=(1980, 1, 1, 0, 0, 0)), text, zipfile.ZIP_DEFLATED)
+
+        write("[Content_Types].xml", _CONTENT_TYPES.format(sheets="".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(sheets) + 1)
+        )))
+        write("_rels/.rels", _ROOT_RELS)
+        write("xl/workbook.xml", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>'
+            + "".join(
+                f'<sheet name={quoteattr(name)} sheetId="{i}" r:id="rId{i}"/>'
+                for i, name in enumerate(names, start=1)
+            )
+            + "</sheets></workbook>"
+        ))
+        write("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" Type="{_SHEET_TYPE}" Target="worksheets/sheet{i}.xml"/>'
+                for i in range(1, len(sheets) + 1)
+            )
+            + "</Relationships>"
+        ))
+        for i, section in enumerate(sheets, start=1):
+            rows = [section.columns] + section.rows
+            if section.note:
+                rows = [[section.note], []] + rows
+            write(f"xl/worksheets/sheet{i}.xml", _sheet_xml(rows))
+    return out.getvalue()
+
+
+FORMATS = {
+    "pdf": (render_pdf, "application/pdf"),
+    "xlsx": (render_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
@@ -0,0 +1,334 @@
+"""
+Generated community reports (PDF or XLSX), cached by their inputs.
+
+A report is built only from the precomputed aggregates (the demographics cube,
+the event rollups and a GROUP BY over businesses), so generating one costs a
+few small queries and the rendering. Rendering runs in a pool of
+``REPORT_WORKERS`` background threads per tenant, never in a request.
+
+Each ``reports`` row has an ``input_key``, a hash of the report name, format,
+parameters and the ``table_versions`` of every table the report reads. Asking
+for a report whose key already exists returns that row, queued or done, so a
+report is only regenerated after its inputs changed. Finished files are stored
+by the SHA-256 of their content:
+
+    {REPORT_DIR}/<hash[:2]>/<hash>.<format>   ({REPORT_DIR}/<tenant>/... with several tenants)
+
+Files are never rewritten, and a regenerated report whose numbers did not
+change points at the file already there. Downloads are plain file reads.
+
+``start_report_scheduler`` (called when the app starts serving) requests the
+``REPORT_SCHEDULE`` reports for the current year every
+``REPORT_SCHEDULE_SECONDS``. That is cheap, since nothing is generated unless
+the data moved. It only runs where ``REPORT_SCHEDULER_ENABLED`` is set, which
+should be one process of the deployment.
+
+Usage (from the backend directory):
+    python -m app.services.reports annual pdf --year 2025
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.tenancy import current_tenant, tenant_path, tenants, use_tenant
+from app.db.base import SessionLocal
+from app.db.versioning import get_table_versions
+from app.models.business import Business
+from app.models.report import Report
+from app.services.demographics import query_cube
+from app.services.report_formats import FORMATS, Document, Section
+from app.services.rollups import EVENT_TYPES, trend_counts
+
+logger = logging.getLogger(__name__)
+
+# Part of every input key; bump it when the layout of a report changes
+REPORT_FORMAT_VERSION = 1
+
+# A queued or running report not finished after this long is assumed lost
+# (e.g. the process restarted) and is queued again
+REPORT_TIMEOUT = timedelta(minutes=30)
+
+DEMOGRAPHIC_BREAKDOWNS = (
+    ("Parish", "parish"),
+    ("Gender", "gender"),
+    ("Age group", "age_group"),
+    ("Marital status", "marital_status"),
+    ("Education", "education"),
+)
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _demographics_sections(db: Session, year: int) -> List[Section]:
+    sections = []
+    for title, dimension in DEMOGRAPHIC_BREAKDOWNS:
+        cube = query_cube(db, {}, [dimension])
+        rows = [[cell[dimension] or "Unknown", cell["count"]] for cell in cube["cells"]]
+        rows.append(["Total", cube["total"]])
+        sections.append(Section(f"Members by {title.lower()}", [title, "Members"], rows))
+    sections[0].note = f"Living members as of {date.today().isoformat()}"
+    return sections
+
+
+def _businesses_sections(db: Session, year: int) -> List[Section]:
+    rows = (
+        db.query(
+            Business.category,
+            Business.parish,
+            func.count(Business.id),
+            func.sum(func.coalesce(Business.halal_certified, False)),
+            func.sum(func.coalesce(Business.accepts_zakat, False)),
+        )
+        .filter(Business.is_active.is_(True))
+        .group_by(Business.category, Business.parish)
+        .all()
+    )
+    by_category: Dict[str, List[int]] = {}
+    by_parish: Dict[str, int] = {}
+    for category, parish, count, halal, zakat in rows:
+        totals = by_category.setdefault(category.value, [0, 0, 0])
+        for i, value in enumerate((count, halal, zakat)):
+            totals[i] += int(value or 0)
+        by_parish[parish or "Unknown"] = by_parish.get(parish or "Unknown", 0) + count
+    return [
+        Section(
+            "Businesses by category",
+            ["Category", "Active", "Halal certified", "Accepts zakat"],
+            [[category, *totals] for category, totals in sorted(by_category.items(), key=lambda item: -item[1][0])],
+        ),
+        Section(
+            "Businesses by parish",
+            ["Parish", "Active"],
+            sorted(([parish, count] for parish, count in by_parish.items()), key=lambda row: -row[1]),
+        ),
+    ]
+
+
+def _life_events_sections(db: Session, year: int) -> List[Section]:
+    counts = trend_counts(db, EVENT_TYPES, date(year, 1, 1), date(year, 12, 1))
+    rows = []
+    for event_type in EVENT_TYPES:
+        monthly = [counts.get((date(year, month, 1), event_type), 0) for month in range(1, 13)]
+        rows.append([event_type.replace("_", " ").capitalize(), *monthly, sum(monthly)])
+    return [Section(f"Life events in {year}", ["Event", *MONTHS, "Total"], rows)]
+
+
+class ReportType:
+    def __init__(
+        self, title: str, tables: Tuple[str, ...], sections: Callable[[Session, int], List[Section]]
+    ) -> None:
+        self.title = title
+        self.tables = tables
+        self.sections = sections
+
+
+REPORT_TYPES: Dict[str, ReportType] = {
+    "demographics": ReportType(
+        "Community Demographics", ("members", "educations", "masjids"), _demographics_sections
+    ),
+    "businesses": ReportType("Muslim Businesses", ("businesses",), _businesses_sections),
+    "life_events": ReportType("Life Events", ("members", "life_events", "masjids"), _life_events_sections),
+}
+REPORT_TYPES["annual"] = ReportType(
+    "Annual Community Report",
+    tuple(sorted({table for report_type in REPORT_TYPES.values() for table in report_type.tables})),
+    lambda db, year: [
+        section for name in ("demographics", "life_events", "businesses")
+        for section in REPORT_TYPES[name].sections(db, year)
+    ],
+)
+
+
+def build_document(db: Session, name: str, params: Dict[str, Any]) -> Document:
+    report_type = REPORT_TYPES[name]
+    year = params["year"]
+    return Document(
+        f"{report_type.title} {year}",
+        f"{current_tenant().name}, generated {date.today().isoformat()}",
+        report_type.sections(db, year),
+    )
+
+
+def input_key(db: Session, name: str, format: str, params: Dict[str, Any]) -> str:
+    versions = get_table_versions(db, REPORT_TYPES[name].tables)
+    material = {
+        "name": name,
+        "format": format,
+        "params": params,
+        "versions": {table: version for table, (version, _) in sorted(versions.items())},
+        # Age groups in the cube move on with the calendar year
+        "as_of_year": date.today().year,
+        "layout": REPORT_FORMAT_VERSION,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+
+
+def content_path(content_hash: str, format: str) -> str:
+    return os.path.join(tenant_path(settings.REPORT_DIR), content_hash[:2], f"{content_hash}.{format}")
+
+
+def store_content(data: bytes, format: str) -> str:
+    """Write ``data`` under its hash unless that file already exists; returns the hash."""
+    content_hash = hashlib.sha256(data).hexdigest()
+    path = content_path(content_hash, format)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, staging = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".report-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(staging, path)
+    return content_hash
+
+
+def generate_report(report_id: int) -> None:
+    """Render one queued report; runs on a worker thread with its own session."""
+    db = SessionLocal()
+    try:
+        report = db.get(Report, report_id)
+        if report is None or report.status == "done":
+            return
+        report.status = "running"
+        db.commit()
+        try:
+            render, _ = FORMATS[report.format]
+            data = render(build_document(db, report.name, json.loads(report.params)))
+            report.content_hash = store_content(data, report.format)
+            report.size = len(data)
+            report.status = "done"
+            report.error = None
+        except Exception as exc:
+            logger.exception("Generating report %s failed", report_id)
+            db.rollback()
+            report.status = "failed"
+            report.error = str(exc)[:1000]
+        report.completed_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+# One pool per tenant, so a large tenant's backlog never delays another's reports
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+
+
+def _generate_for(tenant: str, report_id: int) -> None:
+    with use_tenant(tenant):
+        generate_report(report_id)
+
+
+def _submit(report_id: int) -> None:
+    tenant = current_tenant().slug
+    with _executor_lock:
+        if tenant not in _executors:
+            _executors[tenant] = ThreadPoolExecutor(
+                max_workers=settings.REPORT_WORKERS, thread_name_prefix=f"reports-{tenant}"
+            )
+    _executors[tenant].submit(_generate_for, tenant, report_id)
+
+
+def _reusable(report: Report) -> bool:
+    if report.status == "done":
+        return os.path.exists(content_path(report.content_hash, report.format))
+    if report.status in ("pending", "running"):
+        return report.requested_at is not None and datetime.utcnow() - report.requested_at < REPORT_TIMEOUT
+    return False
+
+
+def request_report(
+    db: Session, name: str, format: str, params: Dict[str, Any], requested_by: Optional[int] = None
+) -> Tuple[Report, bool]:
+    """
+    The report for these inputs, queued for generation unless an up-to-date
+    one exists; returns ``(report, queued)``.
+    """
+    key = input_key(db, name, format, params)
+    report = db.query(Report).filter(Report.input_key == key).first()
+    if report is not None and _reusable(report):
+        return report, False
+
+    if report is None:
+        report = Report(
+            name=name,
+            format=format,
+            params=json.dumps(params, sort_keys=True),
+            input_key=key,
+            requested_by=requested_by,
+        )
+        db.add(report)
+    report.status = "pending"
+    report.error = None
+    report.requested_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request queued the same inputs first
+        db.rollback()
+        return db.query(Report).filter(Report.input_key == key).one(), False
+    db.refresh(report)
+    _submit(report.id)
+    return report, True
+
+
+def _run_schedule(stop: threading.Event) -> None:
+    while not stop.wait(settings.REPORT_SCHEDULE_SECONDS):
+        for tenant in tenants:
+            with use_tenant(tenant):
+                db = SessionLocal()
+                try:
+                    for entry in settings.REPORT_SCHEDULE:
+                        name, format = entry.split(":")
+                        request_report(db, name, format, {"year": date.today().year})
+                except Exception:
+                    logger.exception("Scheduling reports for %s failed", tenant)
+                finally:
+                    db.close()
+
+
+_scheduler_stop = threading.Event()
+
+
+def start_report_scheduler() -> None:
+    """
+    Request every tenant's ``REPORT_SCHEDULE`` reports periodically on a
+    daemon thread, if ``REPORT_SCHEDULER_ENABLED`` makes this the process
+    that runs the schedule.
+    """
+    if settings.REPORT_SCHEDULER_ENABLED and settings.REPORT_SCHEDULE_SECONDS > 0 and settings.REPORT_SCHEDULE:
+        threading.Thread(target=_run_schedule, args=(_scheduler_stop,), name="report-scheduler", daemon=True).start()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("name", choices=sorted(REPORT_TYPES))
+    parser.add_argument("format", choices=sorted(FORMATS))
+    parser.add_argument("--year", type=int, default=date.today().year)
+    parser.add_argument("--tenant", choices=sorted(tenants), default=settings.DEFAULT_TENANT)
+    args = parser.parse_args()
+
+    with use_tenant(args.tenant):
+        db = SessionLocal()
+        try:
+            report, queued = request_report(db, args.name, args.format, {"year": args.year})
+            if queued:
+                _executors[args.tenant].shutdown(wait=True)
+                db.refresh(report)
+        finally:
+            db.close()
+    if report.status == "done":
+        print(f"{content_path(report.content_hash, report.format)} ({report.size} bytes)")
+    else:
+        print(f"Report {report.id} is {report.status}{': ' + report.error if report.error else ''}")
+
+
+if __name__ == "__main__":
+    main()
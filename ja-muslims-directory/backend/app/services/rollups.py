@@ -0,0 +1,198 @@
+"""
+Monthly rollups of life events and conversions for the trend endpoints.
+
+``event_rollups`` holds one count per (month, event type, masjid). Life events
+count under their ``event_type`` and members with a ``date_of_conversion``
+under ``member_conversion``. Both are attributed to the member's masjid, and
+the parish comes from the masjid when querying, so moving a member to another
+masjid moves their counts too.
+
+The counts are kept up to date incrementally. ``before_flush`` records what
+the members touched by a flush contributed before it, ``after_flush``
+recomputes their contribution and applies the difference (see
+``app.db.aggregates``). Bulk updates, which bypass flush, do the same through
+``bulk_member_update`` and ``bulk_event_update``.
+``rebuild_rollups`` recomputes the whole table, including the contributions
+of archived members (see ``app.services.archive``), which stay counted.
+
+Usage (from the backend directory):
+    python -m app.services.rollups
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.db.aggregates import BulkAggregateUpdate, apply_count_delta, id_chunks, replace_counts
+from app.db.base import SessionLocal
+from app.models.archive import ArchivedLifeEvent, ArchivedMember
+from app.models.event_rollup import EventRollup
+from app.models.life_event import EventType, LifeEvent
+from app.models.masjid import Masjid
+from app.models.member import Member
+
+_table = EventRollup.__table__
+
+CONVERSION = "member_conversion"
+EVENT_TYPES = [event_type.value for event_type in EventType] + [CONVERSION]
+
+# Fields whose changes move a row between rollup keys
+LIFE_EVENT_FIELDS = ("member_id", "event_type", "event_date")
+MEMBER_FIELDS = ("masjid_id", "date_of_conversion")
+
+_PENDING = "rollups_before_flush"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def member_contributions(connection: Connection, member_ids: Optional[Iterable[int]] = None) -> Counter:
+    """Rollup counts of ``member_ids`` (every member if None): their conversions and life events."""
+    counts: Counter = Counter()
+    for chunk in id_chunks(member_ids):
+        conversions = select(Member.date_of_conversion, Member.masjid_id).where(Member.date_of_conversion.isnot(None))
+        events = select(LifeEvent.event_date, LifeEvent.event_type, Member.masjid_id).join(
+            Member, Member.id == LifeEvent.member_id
+        )
+        if chunk is not None:
+            conversions = conversions.where(Member.id.in_(chunk))
+            events = events.where(Member.id.in_(chunk))
+        for converted, masjid_id in connection.execute(conversions):
+            counts[(month_start(converted), CONVERSION, masjid_id or 0)] += 1
+        for event_date, event_type, masjid_id in connection.execute(events):
+            counts[(month_start(event_date), event_type.value, masjid_id or 0)] += 1
+    return counts
+
+
+def event_contributions(connection: Connection, event_ids: Iterable[int]) -> Counter:
+    """Rollup counts of the life events ``event_ids`` alone."""
+    counts: Counter = Counter()
+    for chunk in id_chunks(event_ids):
+        rows = connection.execute(
+            select(LifeEvent.event_date, LifeEvent.event_type, Member.masjid_id)
+            .join(Member, Member.id == LifeEvent.member_id)
+            .where(LifeEvent.id.in_(chunk))
+        )
+        for event_date, event_type, masjid_id in rows:
+            counts[(month_start(event_date), event_type.value, masjid_id or 0)] += 1
+    return counts
+
+
+def archived_contributions(connection: Connection) -> Counter:
+    """Rollup counts of every archived member, from the archive tables."""
+    counts: Counter = Counter()
+    conversions = select(ArchivedMember.date_of_conversion, ArchivedMember.masjid_id).where(
+        ArchivedMember.date_of_conversion.isnot(None)
+    )
+    events = select(ArchivedLifeEvent.event_date, ArchivedLifeEvent.event_type, ArchivedMember.masjid_id).join(
+        ArchivedMember, ArchivedMember.id == ArchivedLifeEvent.member_id
+    )
+    for converted, masjid_id in connection.execute(conversions):
+        counts[(month_start(converted), CONVERSION, masjid_id or 0)] += 1
+    for event_date, event_type, masjid_id in connection.execute(events):
+        counts[(month_start(event_date), event_type.value, masjid_id or 0)] += 1
+    return counts
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute ``event_rollups`` from scratch, e.g. for data written before it existed."""
+    connection = db.connection()
+    return replace_counts(
+        connection, _table, member_contributions(connection) + archived_contributions(connection)
+    )
+
+
+def bulk_member_update() -> BulkAggregateUpdate:
+    return BulkAggregateUpdate(_table, member_contributions)
+
+
+def bulk_event_update() -> BulkAggregateUpdate:
+    return BulkAggregateUpdate(_table, event_contributions)
+
+
+def _changed(obj, fields: Tuple[str, ...]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, "before_flush")
+def _rollups_before_flush(session: Session, flush_context, instances) -> None:
+    member_ids: Set[int] = set()
+    for obj in session.new:
+        if isinstance(obj, LifeEvent) and obj.member_id is not None:
+            member_ids.add(obj.member_id)
+    for obj in session.dirty:
+        if isinstance(obj, LifeEvent) and _changed(obj, LIFE_EVENT_FIELDS):
+            # Both the old and the new member, if the event moved
+            member_ids.update(member_id for member_id in inspect(obj).attrs.member_id.history.sum() if member_id)
+        elif isinstance(obj, Member) and _changed(obj, MEMBER_FIELDS):
+            member_ids.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, LifeEvent):
+            member_ids.add(obj.member_id)
+        elif isinstance(obj, Member):
+            member_ids.add(obj.id)
+
+    session.info.pop(_PENDING, None)
+    if member_ids:
+        session.info[_PENDING] = (member_ids, member_contributions(session.connection(), member_ids))
+
+
+@event.listens_for(Session, "after_flush")
+def _rollups_after_flush(session: Session, flush_context) -> None:
+    member_ids, before = session.info.pop(_PENDING, (set(), Counter()))
+    # Members created in this flush, and events attached to them, only have ids now
+    for obj in session.new:
+        if isinstance(obj, Member):
+            member_ids.add(obj.id)
+        elif isinstance(obj, LifeEvent):
+            member_ids.add(obj.member_id)
+    if member_ids:
+        connection = session.connection()
+        apply_count_delta(connection, _table, before, member_contributions(connection, member_ids))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def trend_counts(
+    db: Session,
+    event_types: List[str],
+    start: date,
+    end: date,
+    parish: Optional[str] = None,
+    masjid_id: Optional[int] = None,
+) -> Dict[Tuple[date, str], int]:
+    """``{(month, event_type): count}`` for the months from ``start`` to ``end`` inclusive."""
+    query = (
+        select(_table.c.period, _table.c.event_type, func.sum(_table.c.count))
+        .where(
+            _table.c.event_type.in_(event_types),
+            _table.c.period >= month_start(start),
+            _table.c.period <= month_start(end),
+        )
+        .group_by(_table.c.period, _table.c.event_type)
+    )
+    if masjid_id is not None:
+        query = query.where(_table.c.masjid_id == masjid_id)
+    if parish is not None:
+        query = query.join(Masjid.__table__, Masjid.id == _table.c.masjid_id).where(Masjid.parish == parish)
+    return {(period, event_type): count for period, event_type, count in db.execute(query)}
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        rows = rebuild_rollups(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt event_rollups with {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+In-memory typeahead over member, business and masjid names.
+
+The pickers (spouse, imam, owner, shura) search on every keystroke. Rather
+than an ``ILIKE '%x%'`` scan per keystroke, each worker keeps a prefix index
+per tenant of ``muslim_name`` and ``legal_name`` of members and the names of
+businesses and masjids, with two lists per type:
+
+- ``_names``: the whole normalized names, sorted
+- ``_words``: every word of every name, sorted
+
+Both are sorted lists of ``(text, id)`` searched with ``bisect``, so a lookup
+costs a binary search plus the matches it reads (at most ``_MAX_CANDIDATES``
+per list). Keeping each type apart means a ``type`` filter only reads the
+lists of the types asked for, so the cap never spends itself on other types.
+
+Names are normalized to lower case without accents, so "aisha" finds
+"Ā'isha". Results whose whole name starts with the query rank first, then
+those with a word that does, shorter names first. With several words, every
+query word must start a word of the same name.
+
+The index is built in the background when the app starts serving
+(``start_typeahead_index`` from the lifespan hook in ``app.main``), and
+otherwise on the first lookup. After that, ORM inserts, updates and deletes in this worker update it
+once their transaction commits, and bulk statements on the indexed tables
+rebuild it in the background. Writes this worker never sees (other workers,
+the archival CLI) are caught the way ``app.services.cohorts`` catches them:
+the index remembers the ``table_versions`` it was loaded at, and a lookup
+that finds them moved starts a background rebuild. Lookups use the previous
+index until the new one is ready.
+"""
+import bisect
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.core.tenancy import current_tenant, tenants, use_tenant
+from app.db.base import SessionLocal
+from app.db.versioning import get_table_versions
+from app.models.business import Business
+from app.models.masjid import Masjid
+from app.models.member import Member
+
+logger = logging.getLogger(__name__)
+
+# type -> (model, name columns, detail column)
+INDEXED = {
+    "member": (Member, ("muslim_name", "legal_name"), "legal_name"),
+    "business": (Business, ("name",), "category"),
+    "masjid": (Masjid, ("name",), "parish"),
+}
+_TYPES = {model: name for name, (model, _, _) in INDEXED.items()}
+_TABLES = tuple(model.__table__.name for model, _, _ in INDEXED.values())
+
+# Matches read from each sorted list per lookup; bounds one-letter queries
+_MAX_CANDIDATES = 250
+
+Versions = Tuple[int, ...]
+
+_WORD = re.compile(r"\w+")
+_PENDING = "typeahead_pending"
+_STALE = "typeahead_stale"
+# A change that cannot be read from a flushed row; the index is rebuilt instead
+_UNREADABLE = object()
+
+# (label, detail, normalized names, words)
+Entry = Tuple[str, Optional[str], Tuple[str, ...], frozenset]
+
+
+def normalize(text: str) -> str:
+    """Lower case, without accents or apostrophes, and single-spaced."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_WORD.findall(stripped.replace("'", "").replace("’", "")))
+
+
+def _detail(value) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def _entry(label: str, detail, names: Sequence[Optional[str]]) -> Entry:
+    normalized = tuple(dict.fromkeys(normalize(name) for name in names if name))
+    words = frozenset(word for name in normalized for word in name.split())
+    return label, _detail(detail), normalized, words
+
+
+class TypeaheadIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loading = threading.Lock()
+        # type -> sorted (text, id)
+        self._names: Dict[str, List[Tuple[str, int]]] = {type_: [] for type_ in INDEXED}
+        self._words: Dict[str, List[Tuple[str, int]]] = {type_: [] for type_ in INDEXED}
+        self._entries: Dict[Tuple[str, int], Entry] = {}
+        # table_versions of _TABLES the rows were read at; None until loaded
+        self.versions: Optional[Versions] = None
+        # Changes committed while a rebuild reads the tables, applied to its result
+        self._replay: Optional[List[Tuple[str, int, Optional[Entry]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, db: Session) -> None:
+        """Replace the index with every indexed row in ``db``."""
+        with self._loading:
+            with self._lock:
+                self._replay = []
+            try:
+                # Read first: a write landing during the load only makes the next lookup rebuild again
+                versions = table_versions(db)
+                entries = {}
+                for type_, (model, columns, detail) in INDEXED.items():
+                    table = model.__table__
+                    query = select(table.c.id, table.c[detail], *(table.c[column] for column in columns))
+                    for row in db.execute(query):
+                        entries[(type_, row[0])] = _entry(row[2], row[1], row[2:])
+                names = {type_: [] for type_ in INDEXED}
+                words = {type_: [] for type_ in INDEXED}
+                for (type_, id_), entry in entries.items():
+                    names[type_].extend((name, id_) for name in entry[2])
+                    words[type_].extend((word, id_) for word in entry[3])
+                for sorted_list in (*names.values(), *words.values()):
+                    sorted_list.sort()
+            except Exception:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                self._names, self._words, self._entries = names, words, entries
+                self.versions = versions
+                replay, self._replay = self._replay, None
+                for type_, id_, entry in replay:
+                    self._set(type_, id_, entry)
+
+    def apply(self, changes: Sequence[Tuple[str, int, Optional[Entry]]]) -> None:
+        """Apply ``(type, id, entry)`` changes; an entry of None removes the row."""
+        with self._lock:
+            for type_, id_, entry in changes:
+                self._set(type_, id_, entry)
+            if self._replay is not None:
+                self._replay.extend(changes)
+
+    def _set(self, type_: str, id_: int, entry: Optional[Entry]) -> None:
+        old = self._entries.pop((type_, id_), None)
+        if old is not None:
+            for name in old[2]:
+                _remove(self._names[type_], (name, id_))
+            for word in old[3]:
+                _remove(self._words[type_], (word, id_))
+        if entry is not None:
+            self._entries[(type_, id_)] = entry
+            for name in entry[2]:
+                bisect.insort(self._names[type_], (name, id_))
+            for word in entry[3]:
+                bisect.insort(self._words[type_], (word, id_))
+
+    def search(self, query: str, types: Optional[Sequence[str]] = None, limit: int = 10) -> List[dict]:
+        """Up to ``limit`` ``{type, id, name, detail}`` matches for ``query``, best first."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        query_words = prefix.split()
+        # The longest word narrows the word list furthest
+        longest = max(query_words, key=len)
+        with self._lock:
+            ranked: Dict[Tuple[str, int], tuple] = {}
+            for tier, lists, key in ((0, self._names, prefix), (1, self._words, longest)):
+                for type_ in types or INDEXED:
+                    for _, id_ in _starting_with(lists[type_], key):
+                        if (type_, id_) in ranked:
+                            continue
+                        label, detail, names, words = self._entries[(type_, id_)]
+                        if tier and not all(any(word.startswith(q) for word in words) for q in query_words):
+                            continue
+                        ranked[(type_, id_)] = (tier, len(label), label.casefold(), type_, id_, label, detail)
+        best = sorted(ranked.values())[:limit]
+        return [{"type": type_, "id": id_, "name": label, "detail": detail} for *_, type_, id_, label, detail in best]
+
+
+def _remove(sorted_list: list, item: tuple) -> None:
+    position = bisect.bisect_left(sorted_list, item)
+    if position < len(sorted_list) and sorted_list[position] == item:
+        del sorted_list[position]
+
+
+def _starting_with(sorted_list: list, prefix: str):
+    position = bisect.bisect_left(sorted_list, (prefix,))
+    end = min(len(sorted_list), position + _MAX_CANDIDATES)
+    while position < end and sorted_list[position][0].startswith(prefix):
+        yield sorted_list[position]
+        position += 1
+
+
+def table_versions(db: Session) -> Versions:
+    return tuple(version for version, _ in get_table_versions(db, _TABLES).values())
+
+
+# tenant -> index
+_indexes: Dict[str, TypeaheadIndex] = {}
+_ready: Dict[str, threading.Event] = {}
+# Tenants with a background rebuild running
+_rebuilding: set = set()
+_indexes_lock = threading.Lock()
+
+
+def _build(tenant: str) -> None:
+    with use_tenant(tenant):
+        db = SessionLocal()
+        try:
+            _indexes[tenant].load(db)
+        finally:
+            db.close()
+
+
+def get_index(db: Optional[Session] = None) -> TypeaheadIndex:
+    """
+    The current tenant's index, built now if this is the first lookup and
+    nothing else is building it. With ``db``, an index older than the tables'
+    versions is rebuilt in the background and returned as it is meanwhile.
+    """
+    tenant = current_tenant().slug
+    with _indexes_lock:
+        build = tenant not in _ready
+        if build:
+            _indexes[tenant] = TypeaheadIndex()
+            _ready[tenant] = threading.Event()
+    if build:
+        try:
+            _build(tenant)
+        except Exception:
+            # The next lookup tries again
+            with _indexes_lock:
+                del _indexes[tenant]
+                _ready.pop(tenant).set()
+            raise
+        _ready[tenant].set()
+        return _indexes[tenant]
+    _ready[tenant].wait()
+    index = _indexes.get(tenant)
+    if index is None:
+        return get_index(db)
+    if db is not None and index.versions is not None and index.versions != table_versions(db):
+        start_rebuild(tenant)
+    return index
+
+
+def start_rebuild(tenant: str) -> None:
+    """Rebuild ``tenant``'s index on a background thread, unless one is already running."""
+    with _indexes_lock:
+        if tenant in _rebuilding:
+            return
+        _rebuilding.add(tenant)
+    try:
+        threading.Thread(target=_rebuild, args=(tenant,), name="typeahead-rebuild", daemon=True).start()
+    except Exception:
+        with _indexes_lock:
+            _rebuilding.discard(tenant)
+        raise
+
+
+def _rebuild(tenant: str) -> None:
+    try:
+        _build(tenant)
+    except Exception:
+        logger.exception("Rebuilding the typeahead index for %s failed", tenant)
+    finally:
+        with _indexes_lock:
+            _rebuilding.discard(tenant)
+
+
+def start_typeahead_index() -> None:
+    """Build every tenant's index on a background thread, so the first keystrokes find it ready."""
+
+    def build_all() -> None:
+        for slug in tenants:
+            with use_tenant(slug):
+                try:
+                    get_index()
+                except Exception:
+                    logger.exception("Building the typeahead index for %s failed", slug)
+
+    threading.Thread(target=build_all, name="typeahead-index", daemon=True).start()
+
+
+def _change(obj, action: str):
+    """The ``(type, id, entry)`` change a flushed row makes; None if it changes no indexed column."""
+    type_ = _TYPES.get(type(obj))
+    if type_ is None:
+        return None
+    if action == "delete":
+        return type_, obj.id, None
+    _, columns, detail = INDEXED[type_]
+    state = inspect(obj)
+    if action == "update" and not any(state.attrs[column].history.has_changes() for column in columns + (detail,)):
+        return None
+    # Reading an expired column here would query mid-flush
+    if any(column not in state.dict for column in columns + (detail,)):
+        return _UNREADABLE
+    values = state.dict
+    return type_, obj.id, _entry(values[columns[0]], values[detail], [values[column] for column in columns])
+
+
+@event.listens_for(Session, "after_flush")
+def _typeahead_after_flush(session: Session, flush_context) -> None:
+    changes = [_change(obj, "insert") for obj in session.new]
+    changes += [_change(obj, "update") for obj in session.dirty]
+    changes += [_change(obj, "delete") for obj in session.deleted]
+    if _UNREADABLE in changes:
+        session.info[_STALE] = True
+    changes = [change for change in changes if change is not None and change is not _UNREADABLE]
+    if changes:
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        session.info.setdefault(_PENDING, []).append((transaction, changes))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _typeahead_on_bulk_write(orm_execute_state) -> None:
+    statement = orm_execute_state.statement
+    if (
+        (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete)
+        and getattr(statement, "table", None) is not None
+        and statement.table.name in _TABLES
+    ):
+        orm_execute_state.session.info[_STALE] = True
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _typeahead_discard(session: Session, previous_transaction) -> None:
+    pending = session.info.get(_PENDING)
+    if not pending:
+        return
+
+    def rolled_back(transaction) -> bool:
+        while transaction is not None:
+            if transaction is previous_transaction:
+                return True
+            transaction = transaction.parent
+        return False
+
+    session.info[_PENDING] = [(transaction, changes) for transaction, changes in pending if not rolled_back(transaction)]
+    if previous_transaction.parent is None:
+        session.info.pop(_STALE, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _typeahead_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    stale = session.info.pop(_STALE, None)
+    tenant = current_tenant().slug
+    index = _indexes.get(tenant)
+    # Not built yet: it will read these rows when it is
+    if index is None or not (pending or stale):
+        return
+    # The data is committed; failing to index it must not turn that into an error
+    try:
+        if pending:
+            index.apply([change for _, changes in pending for change in changes])
+        if stale:
+            start_rebuild(tenant)
+    except Exception:
+        logger.exception("Updating the typeahead index failed")
@@ -0,0 +1,88 @@
+"""
+CPU cost of password logins versus refresh-token rotation.
+
+Times ``POST /auth/login`` (bcrypt verify) and ``POST /auth/refresh`` (HMAC
+check and one lookup) in process CPU time, then estimates the CPU spent per
+active user per day. Without refresh tokens, a client logs in again every
+``ACCESS_TOKEN_EXPIRE_MINUTES`` of activity. With them, it logs in once a
+day and refreshes the rest of the time.
+
+Usage (from the backend directory):
+    python -m benchmarks.auth_refresh --runs 50 --active-hours 8
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def cpu_ms(call) -> float:
+    start = time.process_time()
+    call()
+    return (time.process_time() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--active-hours", type=float, default=8, help="Hours a typical user is active per day")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    # Repeated logins from one address would hit the login rate limit
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.chdir(workdir)
+
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.db.base import SessionLocal
+    from app.db.init_db import init_db
+    from app.main import app
+
+    db = SessionLocal()
+    init_db(db)
+    db.close()
+
+    client = TestClient(app)
+    credentials = {"username": settings.FIRST_SUPERUSER_EMAIL, "password": settings.FIRST_SUPERUSER_PASSWORD}
+    refresh_token = client.post(f"{settings.API_V1_STR}/auth/login", data=credentials).json()["refresh_token"]
+
+    def login() -> None:
+        response = client.post(f"{settings.API_V1_STR}/auth/login", data=credentials)
+        assert response.status_code == 200, response.text
+
+    def refresh() -> None:
+        nonlocal refresh_token
+        response = client.post(f"{settings.API_V1_STR}/auth/refresh", json={"refresh_token": refresh_token})
+        assert response.status_code == 200, response.text
+        refresh_token = response.json()["refresh_token"]
+
+    # Warm up both paths (router loading, first connection)
+    login()
+    refresh()
+    login_ms = statistics.median(cpu_ms(login) for _ in range(args.runs))
+    refresh_ms = statistics.median(cpu_ms(refresh) for _ in range(args.runs))
+
+    renewals = math.ceil(args.active_hours * 60 / settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    before = renewals * login_ms
+    after = login_ms + (renewals - 1) * refresh_ms
+    print(f"{'request':<10} {'CPU ms (median)':>16}")
+    print(f"{'login':<10} {login_ms:>16.2f}")
+    print(f"{'refresh':<10} {refresh_ms:>16.2f}")
+    print()
+    print(f"{args.active_hours:g} active hours, {settings.ACCESS_TOKEN_EXPIRE_MINUTES} minute access tokens: "
+          f"{renewals} token renewals per user per day")
+    print(f"logins only:           {before:>9.1f} CPU ms per user per day")
+    print(f"one login + refreshes: {after:>9.1f} CPU ms per user per day")
+    print(f"saved:                 {before - after:>9.1f} CPU ms per user per day ({(before - after) / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Cohort reports: per-object loops over ORM rows versus the columnar frame.
+
+Seeds a throwaway SQLite database with synthetic members, life events and
+educations. Then computes the age pyramid, conversion cohorts, salary
+percentiles and marital transitions twice. The first way loads ORM objects and
+loops over them in Python, as the analytics endpoints used to. The second uses
+``app.services.cohorts``, once from a cold cache (raw fetch into NumPy arrays)
+and once from the cached frame. Both ways must give the same numbers.
+
+Usage (from the backend directory):
+    python -m benchmarks.cohorts --members 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+EVENT_TYPES = ("MARRIAGE", "DIVORCE", "BIRTH", "HAJJ", "EMPLOYMENT")
+
+
+def per_object_reports(db, today: date) -> dict:
+    """The reports computed the way the endpoints did before: ORM objects and Python loops."""
+    import numpy as np
+    from app.models import Education, LifeEvent, Member
+    from app.models.education import EducationCategory
+    from app.models.life_event import EventType
+    from app.models.member import MaritalStatus
+    from app.services.cohorts import AGE_BAND_YEARS, OLDEST_AGE_BAND, SALARY_PERCENTILES
+
+    members = db.query(Member).all()
+    pyramid = defaultdict(Counter)
+    cohorts = defaultdict(Counter)
+    ages_at_conversion = defaultdict(list)
+    salaries = defaultdict(list)
+    islamic = {
+        education.member_id for education in db.query(Education).all()
+        if education.category == EducationCategory.ISLAMIC
+    }
+    for member in members:
+        if member.date_of_death is None:
+            age = (today - member.date_of_birth).days // 365
+            pyramid[member.gender.value][min(max(age, 0), OLDEST_AGE_BAND) // AGE_BAND_YEARS] += 1
+        if member.date_of_conversion is not None:
+            cohort = cohorts[member.date_of_conversion.year]
+            cohort["members"] += 1
+            cohort[member.gender.value] += 1
+            cohort["living"] += member.date_of_death is None
+            cohort["married"] += member.marital_status == MaritalStatus.MARRIED
+            cohort["with_islamic_education"] += member.id in islamic
+            ages_at_conversion[member.date_of_conversion.year].append(
+                (member.date_of_conversion - member.date_of_birth).days // 365
+            )
+        if member.salary is not None:
+            annual = member.salary * (1 if (member.salary_period or "monthly") == "yearly" else 12)
+            salaries["all"].append(annual)
+            salaries[member.gender.value].append(annual)
+
+    transitions = Counter()
+    state = {}
+    events = db.query(LifeEvent).order_by(LifeEvent.member_id, LifeEvent.event_date, LifeEvent.id).all()
+    for event in events:
+        if event.event_type not in (EventType.MARRIAGE, EventType.DIVORCE):
+            continue
+        new_state = "married" if event.event_type == EventType.MARRIAGE else "divorced"
+        transitions[(event.event_date.year, state.get(event.member_id, "single"), new_state)] += 1
+        state[event.member_id] = new_state
+
+    return {
+        "pyramid": {gender: dict(counts) for gender, counts in pyramid.items()},
+        "cohorts": {year: {key: n for key, n in counts.items() if n} for year, counts in cohorts.items()},
+        "median_ages": {year: statistics.median(ages) for year, ages in ages_at_conversion.items()},
+        "salaries": {key: np.percentile(values, SALARY_PERCENTILES).tolist() for key, values in salaries.items()},
+        "transitions": dict(transitions),
+    }
+
+
+def columnar_reports(frame, today: date) -> dict:
+    from app.services import cohorts
+
+    pyramid = cohorts.age_pyramid(frame, today)
+    conversion = cohorts.conversion_cohorts(frame)
+    salaries = cohorts.salary_percentiles(frame)
+    return {
+        "pyramid": {
+            gender: {band: count for band, count in enumerate(pyramid[gender]) if count}
+            for gender in cohorts.GENDERS
+        },
+        "cohorts": {
+            row["year"]: {
+                key: value for key, value in row.items()
+                if key not in ("year", "median_age_at_conversion") and value
+            }
+            for row in conversion
+        },
+        "median_ages": {row["year"]: row["median_age_at_conversion"] for row in conversion},
+        "salaries": {
+            key: list(summary["percentiles"].values())
+            for key, summary in salaries.items() if key != "period" and summary["count"]
+        },
+        "transitions": {
+            (row["year"], row["from"], row["to"]): row["count"] for row in cohorts.marital_transitions(frame)
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=100_000)
+    parser.add_argument("--events-per-member", type=float, default=2.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.chdir(workdir)
+
+    from app.db.base import Base, SessionLocal, engine
+    from app.models import Education, LifeEvent, Member
+    from app.services import cohorts
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    members, events, educations = [], [], []
+    for i in range(args.members):
+        born = date(1930, 1, 1) + timedelta(days=rng.randrange(365 * 90))
+        converted = born + timedelta(days=rng.randrange(365 * 15, 365 * 40)) if rng.random() < 0.4 else None
+        members.append({
+            "id": i + 1,
+            "muslim_name": f"Member {i}",
+            "legal_name": f"Member {i}",
+            "gender": rng.choice(("male", "female")),
+            "date_of_birth": born,
+            "date_of_conversion": converted if converted and converted < date(2025, 1, 1) else None,
+            "date_of_death": born + timedelta(days=365 * 70) if rng.random() < 0.05 else None,
+            "marital_status": rng.choice(("SINGLE", "MARRIED", "DIVORCED", "WIDOWED", None)),
+            "salary": rng.randrange(50, 500) * 1000.0 if rng.random() < 0.6 else None,
+            "salary_period": rng.choice(("monthly", "yearly", None)),
+        })
+        for _ in range(int(args.events_per_member) + (rng.random() < args.events_per_member % 1)):
+            events.append({
+                "member_id": i + 1,
+                "event_type": rng.choice(EVENT_TYPES),
+                "event_date": born + timedelta(days=rng.randrange(365 * 18, 365 * 60)),
+            })
+        if rng.random() < 0.3:
+            educations.append({
+                "member_id": i + 1,
+                "education_type": rng.choice(("HIFZ", "BACHELORS")),
+                "category": rng.choice(("ISLAMIC", "FORMAL")),
+                "degree_name": "Degree",
+                "institution": "Institute",
+            })
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        for table, rows in ((Member.__table__, members), (LifeEvent.__table__, events), (Education.__table__, educations)):
+            for offset in range(0, len(rows), 50_000):
+                connection.execute(table.insert(), rows[offset:offset + 50_000])
+    print(
+        f"seeded {len(members)} members, {len(events)} life events, {len(educations)} educations "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    del members, events, educations
+
+    today = date(2025, 6, 1)
+    timings = defaultdict(list)
+    for _ in range(args.runs):
+        db = SessionLocal()
+        start = time.perf_counter()
+        expected = per_object_reports(db, today)
+        timings["per-object loops"].append(time.perf_counter() - start)
+        db.close()
+
+        db = SessionLocal()
+        cohorts._cache.clear()
+        start = time.perf_counter()
+        actual = columnar_reports(cohorts.get_frame(db), today)
+        timings["columnar, cold cache"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        columnar_reports(cohorts.get_frame(db), today)
+        timings["columnar, cached frame"].append(time.perf_counter() - start)
+        db.close()
+        assert actual == expected, "columnar reports differ from the per-object loops"
+
+    baseline = statistics.median(timings["per-object loops"])
+    print(f"{'method':<24} {'median s':>9} {'speedup':>8}")
+    for method, seconds in timings.items():
+        median = statistics.median(seconds)
+        print(f"{method:<24} {median:>9.3f} {baseline / median:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Time the batch duplicate search over a large members table.
+
+Seeds a throwaway SQLite database with synthetic members, a share of which are
+re-entered copies with misspelt names, a reformatted phone number or no phone
+at all. Then runs ``find_duplicates`` and reports the time per phase and how
+many of the planted duplicates were found.
+
+Usage (from the backend directory):
+    python -m benchmarks.dedupe --members 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+FIRST_NAMES = [
+    "Muhammad", "Ahmad", "Ali", "Omar", "Yusuf", "Ibrahim", "Ismail", "Hassan", "Hussein", "Bilal",
+    "Khalid", "Hamza", "Idris", "Musa", "Isa", "Aisha", "Fatima", "Khadija", "Maryam", "Zainab",
+    "Amina", "Hafsa", "Safiya", "Ruqayyah", "Sumayyah", "John", "Michael", "David", "Andre", "Marcus",
+    "Kevin", "Dwayne", "Shanice", "Kimberly", "Tanya", "Nicole", "Simone", "Latoya", "Camille", "Ricardo",
+]
+LAST_NAMES = [
+    "Brown", "Williams", "Campbell", "Smith", "Johnson", "Thompson", "Clarke", "Reid", "Wright", "Stewart",
+    "Morgan", "Walker", "Robinson", "Grant", "Bailey", "Henry", "Francis", "Gordon", "Lewis", "Edwards",
+    "Khan", "Ali", "Rahman", "Hussain", "Abdullah", "Mohammed", "Ahmed", "Shah", "Malik", "Chin",
+]
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    chars = list(name)
+    position = rng.randrange(1, len(chars))
+    operation = rng.choice(("swap", "drop", "double", "vowel"))
+    if operation == "swap" and position < len(chars) - 1:
+        chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    elif operation == "drop":
+        del chars[position]
+    elif operation == "double":
+        chars.insert(position, chars[position])
+    elif chars[position] in "aeiou":
+        chars[position] = rng.choice("aeiouy")
+    return "".join(chars)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=1_000_000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.chdir(workdir)
+
+    from app.db.base import Base, SessionLocal, engine
+    from app.models import Member
+    from app.services import dedupe
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    originals = int(args.members / (1 + args.duplicate_rate))
+    rows = []
+    for i in range(originals):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        rows.append({
+            "id": i + 1,
+            "muslim_name": f"{rng.choice(FIRST_NAMES[:25])} {last}",
+            "legal_name": f"{first} {rng.choice(FIRST_NAMES)} {last}",
+            "gender": "male" if i % 2 else "female",
+            "date_of_birth": date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 65)),
+            "phone_number": f"876-{rng.randrange(200, 999)}-{rng.randrange(10000):04d}" if rng.random() < 0.8 else None,
+        })
+    planted = set()
+    for i in range(originals, args.members):
+        source = rows[rng.randrange(originals)]
+        phone = source["phone_number"]
+        rows.append({
+            **source,
+            "id": i + 1,
+            "muslim_name": misspell(source["muslim_name"], rng),
+            "legal_name": misspell(source["legal_name"], rng) if rng.random() < 0.5 else source["legal_name"],
+            "phone_number": rng.choice((phone, phone.replace("-", "") if phone else None, None)),
+        })
+        planted.add((source["id"], i + 1))
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        for offset in range(0, len(rows), 50_000):
+            connection.execute(Member.__table__.insert(), rows[offset:offset + 50_000])
+    print(f"seeded {len(rows)} members ({len(planted)} planted duplicates) in {time.perf_counter() - start:.1f}s")
+    del rows
+
+    db = SessionLocal()
+    timings = {}
+    start = time.perf_counter()
+    rows = dedupe.member_rows(db)
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame = dedupe.MemberFrame(rows)
+    timings["features"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    left, right, skipped = dedupe.candidate_pairs(frame)
+    timings["blocking"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = dedupe.score_pairs(frame, left, right)
+    timings["scoring"] = time.perf_counter() - start
+    db.close()
+
+    from app.core.config import settings
+    keep = scores >= settings.DEDUPE_THRESHOLD
+    found = set(zip(frame.ids[left[keep]].tolist(), frame.ids[right[keep]].tolist()))
+    for phase, seconds in timings.items():
+        print(f"{phase:<10} {seconds:>8.1f}s")
+    print(f"{'total':<10} {sum(timings.values()):>8.1f}s")
+    print(
+        f"{len(left)} candidate pairs ({len(left) / len(frame):.1f} per member), {skipped} oversized blocks skipped; "
+        f"{keep.sum()} pairs >= {settings.DEDUPE_THRESHOLD}, "
+        f"{len(found & planted)}/{len(planted)} planted duplicates found"
+    )
+
+
+if __name__ == "__main__":
+    main()
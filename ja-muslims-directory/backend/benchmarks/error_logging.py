@@ -0,0 +1,134 @@
+"""
+Throughput of the 422 error path with the old print() handler and with the
+queued logging of ``app.core.logs``.
+
+Both modes send invalid member payloads concurrently through the ASGI app
+(in-process, no network) and write their log output to a sink that takes
+``--sink-ms`` per write, like a slow terminal, a full pipe or a busy log
+shipper:
+
+    print   the old handler: reads the body and prints it, the URL and the
+            errors to stdout from the event loop
+    queue   the current handler: one queued, sampled record per error
+
+Usage (from the backend directory):
+    python -m benchmarks.error_logging --requests 2000 --concurrency 50 --sink-ms 0.5
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+class SlowSink(io.TextIOBase):
+    """A text stream whose every write blocks for ``delay`` seconds."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.writes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        time.sleep(self.delay)
+        return len(text)
+
+
+async def _run(app, headers, requests: int, concurrency: int):
+    import httpx
+    from app.core.config import settings
+
+    payload = {"muslim_name": "Test", "email": "someone@example.com", "phone_number": "876-555-0100"}
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+
+        async def one() -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(f"{settings.API_V1_STR}/members/", json=payload, headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 422, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, statistics.median(timings), statistics.quantiles(timings, n=100)[98]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sink-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.chdir(workdir)
+
+    from fastapi import Request
+    from fastapi.exceptions import RequestValidationError
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+    from app.core import logs
+    from app.core.config import settings
+    from app.db.base import SessionLocal
+    from app.db.init_db import init_db
+    from app.main import app, validation_exception_handler
+
+    db = SessionLocal()
+    init_db(db)
+    db.close()
+    token = TestClient(app).post(
+        f"{settings.API_V1_STR}/auth/login",
+        data={"username": settings.FIRST_SUPERUSER_EMAIL, "password": settings.FIRST_SUPERUSER_PASSWORD},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def print_handler(request: Request, exc: RequestValidationError):
+        # The handler as it was before app.core.logs
+        print(f"Validation error: {exc}")
+        print(f"Request URL: {request.url}")
+        try:
+            body = await request.body()
+            print(f"Request body: {body}")
+        except Exception:
+            print("Could not read request body")
+        print(f"Validation errors: {exc.errors()}")
+        return JSONResponse(status_code=422, content={"detail": exc.errors()})
+
+    print(f"{'mode':<7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'writes':>8}")
+    for mode in ("print", "queue"):
+        sink = SlowSink(args.sink_ms / 1000)
+        logs.stop_logging()
+        if mode == "print":
+            app.exception_handlers[RequestValidationError] = print_handler
+            stdout, sys.stdout = sys.stdout, sink
+        else:
+            app.exception_handlers[RequestValidationError] = validation_exception_handler
+            logs.configure_logging(sink)
+        try:
+            app.middleware_stack = None  # rebuilt with the current exception handlers
+            throughput, p50, p99 = asyncio.run(_run(app, headers, args.requests, args.concurrency))
+        finally:
+            if mode == "print":
+                sys.stdout = stdout
+            else:
+                logs.stop_logging()
+        print(f"{mode:<7} {throughput:>8.0f} {p50:>8.2f} {p99:>8.2f} {sink.writes:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare full list responses with sparse fieldsets (``fields=``).
+
+Seeds a throwaway SQLite database with members and businesses that carry
+realistic ``notes``/``description`` text, then times the list endpoints with
+and without a fieldset and reports payload size and median latency.
+
+Usage (from the backend directory):
+    python -m benchmarks.sparse_fields --members 5000 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.chdir(workdir)
+
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.db.base import SessionLocal
+    from app.db.init_db import init_db
+    from app.main import app
+    from app.models import Business, BusinessCategory, Gender, Member
+
+    db = SessionLocal()
+    init_db(db)
+    notes = "Community notes. " * 60
+    db.bulk_save_objects([
+        Member(
+            muslim_name=f"Member {i}",
+            legal_name=f"Legal Name {i}",
+            gender=Gender.male if i % 2 else Gender.female,
+            date_of_birth=date(1960 + i % 40, 1 + i % 12, 1 + i % 28),
+            phone_number=f"876-555-{i:04d}",
+            present_address="12 Example Road, Kingston",
+            notes=notes,
+        )
+        for i in range(args.members)
+    ])
+    db.bulk_save_objects([
+        Business(
+            name=f"Business {i}",
+            owner_id=1 + i % args.members,
+            category=BusinessCategory.RETAIL,
+            address="1 Market Street",
+            description=notes,
+            notes=notes,
+        )
+        for i in range(args.members // 5)
+    ])
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    token = client.post(
+        f"{settings.API_V1_STR}/auth/login",
+        data={"username": settings.FIRST_SUPERUSER_EMAIL, "password": settings.FIRST_SUPERUSER_PASSWORD},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    cases = [
+        ("members", "/members/", "muslim_name,phone_number"),
+        ("businesses", "/businesses/", "name,phone_number,owner_name"),
+    ]
+    print(f"{'endpoint':<12} {'mode':<7} {'bytes':>10} {'median ms':>10}")
+    for name, path, fields in cases:
+        for mode, params in (("full", {}), ("sparse", {"fields": fields})):
+            params = {**params, "limit": args.limit}
+            timings = []
+            size = 0
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                response = client.get(f"{settings.API_V1_STR}{path}", params=params, headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                size = len(response.content)
+            print(f"{name:<12} {mode:<7} {size:>10} {statistics.median(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
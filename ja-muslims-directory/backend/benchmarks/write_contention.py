@@ -0,0 +1,147 @@
+"""
+Stress concurrent writes against a multi-worker uvicorn on one SQLite file.
+
+For each mode, starts ``uvicorn --workers N`` on a fresh database, then runs
+client processes that each create a member and a life event for it and read
+a page of members, in a loop.
+It reports throughput, error rate and latency per mode:
+
+    baseline   rollback journal, deferred transactions, no retries (the old setup)
+    immediate  WAL + BEGIN IMMEDIATE with jittered retries (the default)
+    queue      immediate + per-process writer queue with group commit
+
+Usage (from the backend directory):
+    python -m benchmarks.write_contention --workers 4 --clients 16 --seconds 15
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+MODES = {
+    "baseline": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_BEGIN_IMMEDIATE": "false",
+        "SQLITE_WRITE_RETRIES": "0",
+    },
+    "immediate": {},
+    "queue": {"SQLITE_WRITER_QUEUE": "true"},
+}
+
+
+def client(base_url: str, email: str, password: str, deadline: float) -> dict:
+    ok = errors = 0
+    latencies = []
+    with httpx.Client(base_url=base_url, timeout=60) as http:
+        token = http.post("/auth/login", data={"username": email, "password": password}).json()["access_token"]
+        http.headers["Authorization"] = f"Bearer {token}"
+        i = 0
+        while time.time() < deadline:
+            i += 1
+            start = time.perf_counter()
+            try:
+                member = http.post("/members/", json={
+                    "muslim_name": f"Stress {os.getpid()} {i}",
+                    "legal_name": f"Stress Test {i}",
+                    "gender": "male",
+                    "date_of_birth": "1990-01-01",
+                })
+                if member.status_code != 200:
+                    errors += 1
+                    continue
+                event = http.post("/life-events/", json={
+                    "member_id": member.json()["id"],
+                    "event_type": "conversion",
+                    "event_date": "2020-01-01",
+                })
+                if event.status_code != 200:
+                    errors += 1
+                    continue
+                if http.get("/members/", params={"limit": 50}).status_code != 200:
+                    errors += 1
+                    continue
+                ok += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+            except httpx.HTTPError:
+                errors += 1
+    return {"ok": ok, "errors": errors, "latencies": latencies}
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    from app.core.config import settings
+
+    workdir = tempfile.mkdtemp()
+    env = {
+        **os.environ, **MODES[mode],
+        "DATABASE_URL": f"sqlite:///{workdir}/stress.db",
+        # All clients log in from 127.0.0.1; measure the database, not the login rate limit
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    subprocess.run([sys.executable, "-m", "app.db.init_db"], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}{settings.API_V1_STR}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{args.port}/")
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        deadline = time.time() + args.seconds
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.starmap(client, [
+                (base_url, settings.FIRST_SUPERUSER_EMAIL, settings.FIRST_SUPERUSER_PASSWORD, deadline)
+            ] * args.clients)
+    finally:
+        server.terminate()
+        server.wait()
+
+    ok = sum(result["ok"] for result in results)
+    errors = sum(result["errors"] for result in results)
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    return {
+        "ok": ok,
+        "errors": errors,
+        "throughput": ok / args.seconds,
+        "error_rate": errors / max(ok + errors, 1),
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    print(f"{args.workers} uvicorn workers, {args.clients} client processes, {args.seconds:.0f}s per mode")
+    print(f"{'mode':<10} {'ok':>7} {'errors':>7} {'loops/s':>8} {'error %':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in args.modes.split(","):
+        result = run_mode(mode, args)
+        print(
+            f"{mode:<10} {result['ok']:>7} {result['errors']:>7} {result['throughput']:>8.1f} "
+            f"{result['error_rate'] * 100:>8.2f} {result['p50']:>8.1f} {result['p99']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The app reads its settings and creates its directories at import time
+_workdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/test.db")
+os.chdir(_workdir)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.db.base import SessionLocal
+    from app.db.init_db import init_db
+    from app.main import app
+
+    db = SessionLocal()
+    init_db(db)
+    db.close()
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def headers(client):
+    # Issued directly: the login route is rate limited per address, and the tests share one
+    from app.core.config import settings
+    from app.core.security import create_access_token
+    token = create_access_token({"sub": settings.FIRST_SUPERUSER_EMAIL, "tenant": settings.DEFAULT_TENANT})
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,32 @@
+from starlette.datastructures import Headers
+from app.api.admission import rate_limit_client
+from app.core.config import settings
+from app.core.security import create_access_token
+
+LOGIN = f"{settings.API_V1_STR}/auth/login"
+
+
+def test_rotating_bogus_tokens_share_the_login_bucket(client):
+    statuses = [
+        client.post(
+            LOGIN,
+            data={"username": "nobody@example.com", "password": "wrong"},
+            headers={"Authorization": f"Bearer bogus{i}"},
+        ).status_code
+        for i in range(int(settings.RATE_LIMITS["login"][1]) + 5)
+    ]
+    assert 429 in statuses
+
+
+def test_bogus_tokens_are_limited_by_address(client):
+    keys = {
+        rate_limit_client("default", Headers({"authorization": f"Bearer bogus{i}"}), "10.0.0.1") for i in range(10)
+    }
+    assert keys == {"ip:10.0.0.1"}
+
+
+def test_valid_tokens_are_limited_by_user(client):
+    token = create_access_token({"sub": settings.FIRST_SUPERUSER_EMAIL})
+    headers = Headers({"authorization": f"Bearer {token}"})
+    assert rate_limit_client("default", headers, "10.0.0.1") == f"user:{settings.FIRST_SUPERUSER_EMAIL}"
+    assert rate_limit_client("login", headers, "10.0.0.1") == "ip:10.0.0.1"
@@ -0,0 +1,20 @@
+from collections import Counter
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+from app.db.aggregates import apply_count_delta
+
+cells = Table(
+    "cells", MetaData(),
+    Column("year", Integer, primary_key=True),
+    Column("kind", String, primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+
+
+def test_missing_cells_are_only_created_for_positive_deltas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/cells.db")
+    cells.metadata.create_all(engine)
+    with engine.begin() as connection:
+        apply_count_delta(connection, cells, Counter({(2025, "birth"): 2}), Counter({(2026, "birth"): 3}))
+        assert connection.execute(select(cells.c.year, cells.c.kind, cells.c.count)).all() == [(2026, "birth", 3)]
+        apply_count_delta(connection, cells, Counter({(2026, "birth"): 1}), Counter())
+        assert connection.execute(select(cells.c.count)).scalar() == 2
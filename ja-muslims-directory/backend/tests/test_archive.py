@@ -0,0 +1,59 @@
+from datetime import date
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateTable
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.db.sqlite import ensure_autoincrement
+from app.models import Member
+from app.services.archive import archive_members, restore_members
+
+MEMBERS = f"{settings.API_V1_STR}/members/"
+
+
+def _member(client, headers, name: str, **fields) -> dict:
+    body = {"muslim_name": name, "legal_name": name, "gender": "male", "date_of_birth": "1950-01-01", **fields}
+    response = client.post(MEMBERS, json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_archived_ids_are_not_reused(client, headers):
+    _member(client, headers, "Older")
+    archived = _member(client, headers, "Archived", date_of_death="2000-01-01")
+    db = SessionLocal()
+    try:
+        assert archive_members(db, [archived["id"]])["members"] == [archived["id"]]
+        db.commit()
+        created = _member(client, headers, "Newer")
+        assert created["id"] > archived["id"]
+        assert restore_members(db, [archived["id"]]) == [archived["id"]]
+        db.commit()
+        assert db.get(Member, archived["id"]).date_of_death == date(2000, 1, 1)
+    finally:
+        db.close()
+
+
+def test_ensure_autoincrement_rebuilds_old_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    table = Member.__table__
+    # As create_all made it before the models asked for AUTOINCREMENT
+    legacy = str(CreateTable(table).compile(dialect=engine.dialect)).replace(" AUTOINCREMENT", "")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(legacy)
+        connection.exec_driver_sql("CREATE TABLE members_archive (id INTEGER PRIMARY KEY)")
+        connection.exec_driver_sql(
+            "INSERT INTO members (id, muslim_name, legal_name, gender, date_of_birth) "
+            "VALUES (1, 'a', 'a', 'male', '2000-01-01'), (2, 'b', 'b', 'male', '2000-01-01')"
+        )
+        connection.exec_driver_sql("INSERT INTO members_archive (id) VALUES (7)")
+
+    assert ensure_autoincrement(engine, [table]) == ["members"]
+    # The pooled connection keeps SQLite's default
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 0
+    assert ensure_autoincrement(engine, [table]) == []
+    with engine.begin() as connection:
+        assert connection.execute(text("SELECT muslim_name FROM members ORDER BY id")).scalars().all() == ["a", "b"]
+        assert "AUTOINCREMENT" in connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'members'")).scalar()
+        # The next id comes after the archived ones
+        assert connection.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'members'")).scalar() == 7
@@ -0,0 +1,20 @@
+import os
+from app.core.tenancy import _current
+from app.services.directory_snapshots import PrecompressedStaticFiles
+
+
+def test_lookups_stay_in_the_tenant_directory(tmp_path, monkeypatch):
+    for tenant in ("jamaica", "trinidad"):
+        (tmp_path / tenant).mkdir()
+        (tmp_path / tenant / "manifest.json").write_text(tenant)
+    monkeypatch.setattr("app.services.directory_snapshots.tenant_path", lambda root: os.path.join(root, _current.get()))
+    files = PrecompressedStaticFiles(directory=str(tmp_path))
+
+    token = _current.set("jamaica")
+    try:
+        path, stat = files.lookup_path("manifest.json")
+        assert open(path).read() == "jamaica"
+        assert files.lookup_path("../trinidad/manifest.json") == ("", None)
+        assert files.lookup_path("trinidad/manifest.json") == ("", None)
+    finally:
+        _current.reset(token)
@@ -0,0 +1,34 @@
+from sqlalchemy import event
+from app.core.config import settings
+from app.db.tenants import get_database
+
+MASJIDS = f"{settings.API_V1_STR}/masjids/"
+
+
+def test_affiliated_counts_take_one_query(client, headers):
+    ids = []
+    for name in ("Count One", "Count Two", "Count Three"):
+        response = client.post(MASJIDS, json={"name": name, "type": "masjid", "address": "1 Main St", "parish": "St. Ann"}, headers=headers)
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    for name in ("Affiliated A", "Affiliated B"):
+        body = {"muslim_name": name, "legal_name": name, "gender": "male", "date_of_birth": "1990-01-01", "masjid_id": ids[0]}
+        assert client.post(f"{settings.API_V1_STR}/members/", json=body, headers=headers).status_code == 200
+
+    counts = []
+    engine = get_database(settings.DEFAULT_TENANT).engine
+
+    def count_queries(conn, cursor, statement, *args) -> None:
+        if "count(" in statement.lower():
+            counts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_queries)
+    try:
+        for fields in (None, "id,affiliated_members_count"):
+            counts.clear()
+            params = {"search": "Count "} if fields is None else {"search": "Count ", "fields": fields}
+            rows = client.get(MASJIDS, params=params, headers=headers).json()
+            assert {row["id"]: row["affiliated_members_count"] for row in rows} == {ids[0]: 2, ids[1]: 0, ids[2]: 0}
+            assert len(counts) == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", count_queries)
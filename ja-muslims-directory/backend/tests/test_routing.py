@@ -0,0 +1,35 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from app.db.routing import ReplicaRouter
+
+
+def _database(path, updated_at: datetime):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE table_versions (table_name VARCHAR PRIMARY KEY, updated_at DATETIME)")
+        connection.exec_driver_sql(
+            "INSERT INTO table_versions VALUES ('members', ?)", (updated_at.isoformat(sep=" "),)
+        )
+    return engine
+
+
+def test_reads_after_a_write_skip_replicas_without_it(tmp_path):
+    now = datetime.utcnow()
+    primary = _database(tmp_path / "primary.db", now)
+    replica = _database(tmp_path / "replica.db", now - timedelta(seconds=5))
+    router = ReplicaRouter(primary, [replica], check_interval=60, max_lag=30, sticky_seconds=10)
+
+    assert router.pick() is replica
+    # A write that began after the replica's newest change (as any worker's cookie reports it)
+    assert router.pick(now - timedelta(seconds=1)) is None
+    assert router.pick(now - timedelta(seconds=10)) is replica
+
+
+def test_last_write_cookie_lasts_the_sticky_window(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/primary.db")
+    router = ReplicaRouter(engine, [engine], check_interval=60, max_lag=30, sticky_seconds=10)
+    assert router.read_after(str(time.time() - 1)) is not None
+    assert router.read_after(str(time.time() - 11)) is None
+    assert router.read_after("not a time") is None
+    assert ReplicaRouter(engine, [], 60, 30, 10).read_after(str(time.time())) is None
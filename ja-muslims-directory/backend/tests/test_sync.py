@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.db.sync import purge_tombstones
+
+MEMBERS = f"{settings.API_V1_STR}/members"
+
+
+def test_tokens_older_than_purged_tombstones_must_resync(client, headers):
+    body = {"muslim_name": "Gone", "legal_name": "Gone", "gender": "male", "date_of_birth": "1960-01-01"}
+    member = client.post(f"{MEMBERS}/", json=body, headers=headers).json()
+    since = client.get(f"{MEMBERS}/sync", params={"since": 0, "limit": 5000}, headers=headers).json()["next_since"]
+    assert client.delete(f"{MEMBERS}/{member['id']}", headers=headers).status_code == 200
+    page = client.get(f"{MEMBERS}/sync", params={"since": since}, headers=headers).json()
+    assert page["deleted"] == [member["id"]]
+    stale = since - 1
+
+    db = SessionLocal()
+    try:
+        assert purge_tombstones(db, datetime.utcnow() + timedelta(seconds=1))["members"] >= 1
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get(f"{MEMBERS}/sync", params={"since": stale}, headers=headers)
+    assert response.status_code == 410
+    assert client.get(f"{MEMBERS}/sync", params={"since": page["next_since"]}, headers=headers).status_code == 200
+    assert client.get(f"{MEMBERS}/sync", params={"since": 0}, headers=headers).status_code == 200
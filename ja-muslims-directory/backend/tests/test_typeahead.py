@@ -0,0 +1,35 @@
+import time
+from app.core.config import settings
+from app.db.tenants import get_database
+from app.services.typeahead import TypeaheadIndex, _entry, get_index
+
+TYPEAHEAD = f"{settings.API_V1_STR}/search/typeahead"
+
+
+def test_type_filter_is_not_crowded_out_by_other_types():
+    index = TypeaheadIndex()
+    index.apply([("member", i, _entry(f"Ahmed {i}", None, [f"Ahmed {i}"])) for i in range(300)])
+    index.apply([("masjid", 1, _entry("Al-Falah Masjid", "Kingston", ["Al-Falah Masjid"]))])
+    assert [match["name"] for match in index.search("a", ["masjid"])] == ["Al-Falah Masjid"]
+
+
+def test_writes_from_elsewhere_are_picked_up(client, headers):
+    client.get(TYPEAHEAD, params={"q": "x"}, headers=headers)
+    # As another worker would: unseen by this worker's session events
+    with get_database(settings.DEFAULT_TENANT).engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO masjids (name, type, address, parish) VALUES ('Zubair Masjid', 'MASJID', 'Main St', 'St. Ann')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO table_versions (table_name, version, updated_at) VALUES ('masjids', 1000, CURRENT_TIMESTAMP) "
+            "ON CONFLICT (table_name) DO UPDATE SET version = version + 1000"
+        )
+    # The first lookup notices the new version and rebuilds in the background
+    client.get(TYPEAHEAD, params={"q": "zub"}, headers=headers)
+    index = get_index()
+    for _ in range(100):
+        if [match["name"] for match in index.search("zub")] == ["Zubair Masjid"]:
+            break
+        time.sleep(0.05)
+    response = client.get(TYPEAHEAD, params={"q": "zub"}, headers=headers)
+    assert [match["name"] for match in response.json()] == ["Zubair Masjid"]
@@ -0,0 +1,18 @@
+from app.db.base import SessionLocal
+from app.db.versioning import get_table_versions
+from app.models import Masjid
+from app.models.masjid import MasjidType
+
+
+def test_versions_are_bumped_after_the_commit(client):
+    db = SessionLocal()
+    try:
+        before, _ = get_table_versions(db, ["masjids"])["masjids"]
+        db.add(Masjid(name="Versioned", type=MasjidType.MASJID, address="1 Main St", parish="St. Ann"))
+        db.flush()
+        # Not even the writer's own transaction has touched the counter row
+        assert get_table_versions(db, ["masjids"])["masjids"][0] == before
+        db.commit()
+        assert get_table_versions(db, ["masjids"])["masjids"][0] == before + 1
+    finally:
+        db.close()
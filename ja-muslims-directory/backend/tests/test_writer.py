@@ -0,0 +1,16 @@
+from app.core import logs
+from app.core.config import settings
+from app.core.tenancy import current_tenant
+from app.db.tenants import get_database
+from app.db.writer import WriterQueue
+
+
+def test_writer_thread_carries_the_tenant_but_not_the_request(client):
+    database = get_database(settings.DEFAULT_TENANT)
+    writer = WriterQueue(settings.DEFAULT_TENANT, database.sessionmaker, max_batch=1, max_wait=0)
+    token = logs._request_id.set("first-request")
+    try:
+        seen = writer.submit(lambda session: (current_tenant().slug, logs.current_request_id()))
+    finally:
+        logs._request_id.reset(token)
+    assert seen == (settings.DEFAULT_TENANT, None)
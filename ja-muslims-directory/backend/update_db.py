@@ -1,9 +1,12 @@
 from sqlalchemy import text
-from app.db.base import engine, Base
-from app.models import Business, Restaurant, RestaurantMenu, Masjid, Education  # Import to ensure tables are created
+from app.db.base import engine
+from app.db.schema import ensure_schema
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+# Create all tables, unless the models have not changed since the last run
+if ensure_schema(engine):
+    print("Created missing tables")
+else:
+    print("Schema is current, skipping table creation")
 
 # Add salary_period column to members table
 with engine.connect() as conn:
@@ -57,4 +60,72 @@ with engine.connect() as conn:
         else:
             print(f"Error adding masjid_id column: {e}")
 
+# Never hand out the id of a deleted or archived member, event, education or business again
+from app.db.sqlite import ensure_autoincrement
+from app.models import Business, Education, LifeEvent, Member
+
+try:
+    rebuilt = ensure_autoincrement(engine, [model.__table__ for model in (Member, LifeEvent, Education, Business)])
+    print(f"Rebuilt with AUTOINCREMENT: {', '.join(rebuilt) or 'none needed'}")
+except Exception as e:
+    print(f"Error rebuilding tables with AUTOINCREMENT: {e}")
+
+# Seed the sync change feed with rows that existed before it was introduced
+from app.db.base import SessionLocal
+from app.db.sync import SYNCED_TABLES, backfill_changes
+
+db = SessionLocal()
+try:
+    for table_name in sorted(SYNCED_TABLES):
+        added = backfill_changes(db, table_name)
+        print(f"Added {added} {table_name} rows to the sync change feed")
+    db.commit()
+except Exception as e:
+    db.rollback()
+    print(f"Error backfilling sync change feed: {e}")
+finally:
+    db.close()
+
+# Index existing members for the inline duplicate check
+from app.services.match_keys import rebuild_match_keys
+
+db = SessionLocal()
+try:
+    added = rebuild_match_keys(db)
+    db.commit()
+    print(f"Rebuilt member_match_keys with {added} keys")
+except Exception as e:
+    db.rollback()
+    print(f"Error rebuilding member_match_keys: {e}")
+finally:
+    db.close()
+
+# Count existing life events and conversions for the trend endpoints
+from app.services.rollups import rebuild_rollups
+
+db = SessionLocal()
+try:
+    rows = rebuild_rollups(db)
+    db.commit()
+    print(f"Rebuilt event_rollups with {rows} rows")
+except Exception as e:
+    db.rollback()
+    print(f"Error rebuilding event_rollups: {e}")
+finally:
+    db.close()
+
+# Count existing members into the demographics cube
+from app.services.demographics import rebuild_cube
+
+db = SessionLocal()
+try:
+    cells = rebuild_cube(db)
+    db.commit()
+    print(f"Rebuilt demographic_cube with {cells} cells")
+except Exception as e:
+    db.rollback()
+    print(f"Error rebuilding demographic_cube: {e}")
+finally:
+    db.close()
+
 print("Database update complete!")
\ No newline at end of file
@@ -3,7 +3,8 @@
 import { useEffect, useState } from 'react';
 import DashboardLayout from '@/components/layout/dashboard-layout';
 import { Users, UserCheck, UserX, TrendingUp, Building2, Award, Heart } from 'lucide-react';
-import api from '@/lib/api';
+import Cookies from 'js-cookie';
+import api, { API_URL } from '@/lib/api';
 import { DashboardAnalytics } from '@/types';
 
 export default function DashboardPage() {
@@ -14,6 +15,22 @@ export default function DashboardPage() {
     fetchAnalytics();
   }, []);
 
+  // Live updates: the server pushes a snapshot, then only the changed keys
+  useEffect(() => {
+    const token = Cookies.get('access_token');
+    if (!token) return;
+    const source = new EventSource(
+      `${API_URL}/analytics/dashboard/stream?access_token=${encodeURIComponent(token)}`
+    );
+    const apply = (event: MessageEvent) => {
+      const data = JSON.parse(event.data);
+      setAnalytics((current) => (current ? { ...current, ...data } : data));
+    };
+    source.addEventListener('snapshot', apply);
+    source.addEventListener('delta', apply);
+    return () => source.close();
+  }, []);
+
   const fetchAnalytics = async () => {
     try {
       const response = await api.get('/analytics/dashboard');
@@ -1,10 +1,13 @@
-import axios from 'axios';
+import axios, { InternalAxiosRequestConfig } from 'axios';
 import Cookies from 'js-cookie';
 
-const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
+export const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
 
 const api = axios.create({
   baseURL: API_URL,
+  // The API is on another origin; without this the browser drops its last_write
+  // cookie and reads after a write can hit a replica that has not caught up
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },
@@ -23,11 +26,45 @@ api.interceptors.request.use(
   }
 );
 
+// One refresh at a time: concurrent 401s wait for the same rotation
+let refreshing: Promise<string | null> | null = null;
+
+const refreshAccessToken = (): Promise<string | null> => {
+  if (!refreshing) {
+    const refreshToken = Cookies.get('refresh_token');
+    refreshing = (refreshToken
+      ? axios
+          .post(`${API_URL}/auth/refresh`, { refresh_token: refreshToken })
+          .then((response) => {
+            const { access_token, refresh_token } = response.data;
+            Cookies.set('access_token', access_token, { expires: 1 });
+            Cookies.set('refresh_token', refresh_token, { expires: 30 });
+            return access_token as string;
+          })
+          .catch(() => null)
+      : Promise.resolve(null)
+    ).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
 api.interceptors.response.use(
   (response) => response,
   async (error) => {
+    const request = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
+    if (error.response?.status === 401 && request && !request._retried && !request.url?.startsWith('/auth/')) {
+      request._retried = true;
+      const token = await refreshAccessToken();
+      if (token) {
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      }
+    }
     if (error.response?.status === 401) {
       Cookies.remove('access_token');
+      Cookies.remove('refresh_token');
       window.location.href = '/login';
     }
     return Promise.reject(error);
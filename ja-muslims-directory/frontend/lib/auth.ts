@@ -28,14 +28,28 @@ export const useAuth = create<AuthStore>((set) => ({
       },
     });
 
-    const { access_token } = response.data;
+    const { access_token, refresh_token } = response.data;
     Cookies.set('access_token', access_token, { expires: 1 });
+    Cookies.set('refresh_token', refresh_token, { expires: 30 });
 
     await useAuth.getState().checkAuth();
   },
 
   logout: () => {
+    // Read before the cookies are cleared: the request interceptor runs on a later microtask
+    const accessToken = Cookies.get('access_token');
+    const refreshToken = Cookies.get('refresh_token');
+    if (refreshToken) {
+      api
+        .post(
+          '/auth/logout',
+          { refresh_token: refreshToken },
+          accessToken ? { headers: { Authorization: `Bearer ${accessToken}` } } : undefined
+        )
+        .catch(() => {});
+    }
     Cookies.remove('access_token');
+    Cookies.remove('refresh_token');
     set({ user: null, isAuthenticated: false });
   },
 